@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 17:55
+@Auth: Zhang Hongxing
+@File: benchmark_queries.py
+@Note: 对各业务查询计时并记录执行计划，在迁移索引前后各运行一次以对比
+用法：
+    python -m Mysql.benchmark_queries before
+    python -m Mysql.migrate_indexes
+    python -m Mysql.benchmark_queries after
+"""
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import select, func, text
+
+from Mysql.db_config import DB_PARAMS
+from src.data_storage.database import Database
+from src.data_storage.keyword_store import get_month_range
+from src.data_storage.models import News, Keywords, KeywordTerm, KeywordOccurrence, MonthlyKeywordCount, Cloud, Summary
+from src.data_storage.queries import (
+    news_months_query,
+    last_pub_time_query,
+    news_in_range_query,
+    news_page_query
+)
+
+BENCHMARK_DIR = './utils/benchmark'
+REPEAT = 5
+
+
+def pick_sample(session):
+    """
+    从数据库中挑选有代表性的查询参数：最新月份、该月新闻最多的分区、出现次数最多的关键词
+    """
+    last_pub_time = session.execute(last_pub_time_query()).scalar()
+    start_time, end_time = get_month_range(last_pub_time.year, last_pub_time.month)
+    category = session.execute(
+        select(News.category)
+        .where(News.pub_time >= start_time, News.pub_time < end_time)
+        .group_by(News.category)
+        .order_by(func.count().desc())
+        .limit(1)
+    ).scalar()
+    algorithm = session.execute(select(Keywords.algorithm).limit(1)).scalar() or "jieba提供的TF-IDF"
+    keyword_id = session.execute(
+        select(MonthlyKeywordCount.keyword_id).order_by(MonthlyKeywordCount.count.desc()).limit(1)
+    ).scalar()
+    return start_time, end_time, category, algorithm, keyword_id
+
+
+def build_queries(session):
+    """
+    :return: {查询名称: select 语句}，与各业务代码中的查询形状一致
+    """
+    start_time, end_time, category, algorithm, keyword_id = pick_sample(session)
+    news_ids = session.execute(
+        select(KeywordOccurrence.news_id).where(KeywordOccurrence.keyword_id == keyword_id).limit(5000)
+    ).scalars().all() if keyword_id else []
+    return {
+        "CrawlService.get_existing_times": news_months_query(),
+        "CrawlService.get_last_record_pub_time": last_pub_time_query(),
+        "KeywordService.existing_keywords_count": (
+            select(func.count(Keywords.id))
+            .join(News, News.id == Keywords.news_id)
+            .where(News.pub_time >= start_time, News.pub_time < end_time, News.is_delete == 0,
+                   Keywords.algorithm == algorithm, Keywords.is_delete == 0)
+        ),
+        "KeywordService.news_in_month": news_in_range_query(start_time, end_time, category,
+                                                            (News.id, News.title)),
+        "keyword_store.get_top_keywords": (
+            select(KeywordTerm.word, func.sum(MonthlyKeywordCount.count))
+            .join(KeywordTerm, KeywordTerm.id == MonthlyKeywordCount.keyword_id)
+            .where(MonthlyKeywordCount.year == start_time.year, MonthlyKeywordCount.month == start_time.month,
+                   MonthlyKeywordCount.algorithm == algorithm)
+            .group_by(KeywordTerm.id, KeywordTerm.word)
+            .order_by(func.sum(MonthlyKeywordCount.count).desc())
+            .limit(50)
+        ),
+        "keyword_store.find_postings": (
+            select(KeywordOccurrence.news_id, KeywordOccurrence.pub_time, func.max(KeywordOccurrence.weight))
+            .where(KeywordOccurrence.keyword_id == keyword_id, KeywordOccurrence.is_delete == 0,
+                   KeywordOccurrence.pub_time >= start_time, KeywordOccurrence.pub_time < end_time)
+            .group_by(KeywordOccurrence.pub_time, KeywordOccurrence.news_id)
+        ),
+        "NewsService.news_candidates": news_in_range_query(start_time, end_time, category, (News.id, News.pub_time))
+        .where(News.id.in_(news_ids[:1000] or [0])),
+        "NewsService.news_page": news_page_query(news_ids[:50] or [0], limit=50, summary_length=151,
+                                                 time_range=(start_time, end_time)),
+        "DataDeleter.keywords_news_ids": news_in_range_query(start_time, end_time).where(
+            News.keywords.any(Keywords.algorithm == algorithm)),
+        "MonKeyWordsViews.cloud_lookup": select(Cloud.id).where(
+            Cloud.year == start_time.year, Cloud.month == start_time.month, Cloud.category == category,
+            Cloud.algorithm == algorithm, Cloud.is_delete == 0).limit(1),
+        "MonKeyWordsViews.summary_lookup": select(Summary.id).where(
+            Summary.year == start_time.year, Summary.month == start_time.month, Summary.category == category,
+            Summary.algorithm == algorithm, Summary.keyword == "", Summary.keywords_num == 50,
+            Summary.is_delete == 0).limit(1),
+    }
+
+
+def explain(session, query):
+    """
+    :return: 执行计划中每张表使用的索引与预估扫描行数
+    """
+    compiled = query.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True})
+    rows = session.execute(text(f"EXPLAIN {compiled}")).mappings().all()
+    return [f"{row['table']}:{row['key'] or 'ALL'}:{row['rows']}" for row in rows]
+
+
+def run_benchmark(db):
+    """
+    :return: {查询名称: {"ms": 中位耗时, "plan": 执行计划}}
+    """
+    results = {}
+    with db.get_session() as session:
+        for name, query in build_queries(session).items():
+            timings = []
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                session.execute(query).all()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[name] = {"ms": round(timings[len(timings) // 2], 2), "plan": explain(session, query)}
+            print(f"{name}: {results[name]['ms']} ms  {' '.join(results[name]['plan'])}")
+    return results
+
+
+def compare(before, after):
+    print(f"\n{'查询':<45}{'迁移前(ms)':>12}{'迁移后(ms)':>12}{'加速比':>10}")
+    for name, result in after.items():
+        if name not in before:
+            continue
+        speedup = before[name]["ms"] / result["ms"] if result["ms"] else float('inf')
+        print(f"{name:<45}{before[name]['ms']:>12}{result['ms']:>12}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    label = sys.argv[1] if len(sys.argv) > 1 else "after"
+    if not os.path.exists(BENCHMARK_DIR):
+        os.makedirs(BENCHMARK_DIR)
+    results = run_benchmark(Database(DB_PARAMS))
+    with open(os.path.join(BENCHMARK_DIR, f"{label}.json"), 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    before_path = os.path.join(BENCHMARK_DIR, "before.json")
+    if label != "before" and os.path.exists(before_path):
+        with open(before_path, 'r', encoding='utf-8') as f:
+            compare(json.load(f), results)
@@ -5,12 +5,20 @@
 @File: delete_data.py
 @Note:
 """
-from datetime import datetime
-
 from Mysql.db_config import DB_PARAMS
 from Redis.redis_config import get_redis_cluster_client
 from src.data_storage.database import Database
-from src.data_storage.models import Summary, Cloud, Keywords, News
+from src.data_storage.keyword_store import refresh_monthly_counts, find_news_ids, find_live_keywords, get_month_range
+from src.data_storage.posting_index import default_posting_index
+from src.data_storage.models import Keywords, News
+from src.text_processing.doc_freq_store import DocFreqStore
+from src.data_storage.queries import (
+    news_in_range_query,
+    soft_delete_news,
+    soft_delete_keywords,
+    soft_delete_cloud,
+    soft_delete_summary
+)
 
 # 创建 Redis 集群客户端连接
 redis_client = get_redis_cluster_client()
@@ -21,6 +29,7 @@ class DataDeleterWithDatabase:
         self.db = Database(db_params)
         self.session = self.db.get_session()
         self.redis_client = redis_client
+        self.doc_freq_store = DocFreqStore()
 
     def _get_news_key_parts(self, cache_key):
         parts = cache_key.split(":")
@@ -56,33 +65,33 @@ class DataDeleterWithDatabase:
             return parts[1], parts[2], parts[3], parts[4], parts[5], parts[6]
         return None
 
+    def get_live_keywords(self, year, month, max_occurrence_id=None):
+        """
+        :param max_occurrence_id: 只看 id 不超过该值的关键词出现记录，为空时不限
+        :return: 该月仍有未删除新闻的关键词集合
+        """
+        pub_time_start, pub_time_end = get_month_range(year, month)
+        return find_live_keywords(self.session, pub_time_start, pub_time_end, max_occurrence_id)
+
     def mark_news_as_deleted(self, year, month, category=None, keyword=None):
         try:
-            from calendar import monthrange
-            last_day = monthrange(year, month)[1]
-            pub_time_start = f"{year}-{month}-01 00:00:00"
-            pub_time_end = f"{year}-{month}-{last_day} 23:59:59"
-            pub_time_start = datetime.strptime(pub_time_start, "%Y-%m-%d %H:%M:%S")
-            pub_time_end = datetime.strptime(pub_time_end, "%Y-%m-%d %H:%M:%S")
-            # 查询数据库中符合条件的新闻数据
-            query = self.session.query(News).filter(News.pub_time >= pub_time_start, News.pub_time <= pub_time_end,
-                                                    News.is_delete == 0)
-            if category:
-                query = query.filter(News.category == category)
+            pub_time_start, pub_time_end = get_month_range(year, month)
+            news_ids_with_keyword = None
             if keyword:
-                keyword_query = self.session.query(Keywords).filter(Keywords.keywords.contains(keyword))
-                news_ids_with_keyword = [kw.news_id for kw in keyword_query.all()]
-                if news_ids_with_keyword:
-                    query = query.filter(News.id.in_(news_ids_with_keyword))
-                else:
+                # 通过倒排索引查询本月包含关键词的新闻
+                news_ids_with_keyword = find_news_ids(self.session, keyword, pub_time_start, pub_time_end)
+                if not news_ids_with_keyword:
                     print(f"没有找到包含关键词 '{keyword}' 的新闻数据。")
                     return False
-            news_list = query.all()
-            if news_list:
-                for news in news_list:
-                    news.is_delete = 1
+            # 单条 UPDATE 批量标记，不加载新闻
+            count = soft_delete_news(self.session, pub_time_start, pub_time_end, category, news_ids_with_keyword)
+            if count:
+                refresh_monthly_counts(self.session, year, month)
                 self.session.commit()
-                print(f"共标记了 {len(news_list)} 条新闻数据为删除。")
+                default_posting_index.build_month(self.session, year, month)
+                # 被删除的新闻不再计入 IDF
+                self.doc_freq_store.rebuild_month(self.db, year, month)
+                print(f"共标记了 {count} 条新闻数据为删除。")
                 return True
             else:
                 print(f"数据库中未找到符合条件的新闻数据。")
@@ -94,29 +103,20 @@ class DataDeleterWithDatabase:
 
     def mark_keywords_as_deleted(self, year, month, algorithm, keywords_num):
         try:
-            from calendar import monthrange
-            last_day = monthrange(year, month)[1]
-            pub_time_start = f"{year}-{month}-01 00:00:00"
-            pub_time_end = f"{year}-{month}-{last_day} 23:59:59"
-            pub_time_start = datetime.strptime(pub_time_start, "%Y-%m-%d %H:%M:%S")
-            pub_time_end = datetime.strptime(pub_time_end, "%Y-%m-%d %H:%M:%S")
-            news_query = self.session.query(News).filter(News.pub_time >= pub_time_start, News.pub_time <= pub_time_end,
-                                                         News.is_delete == 0)
+            pub_time_start, pub_time_end = get_month_range(year, month)
+            news_query = news_in_range_query(pub_time_start, pub_time_end)
             if algorithm:
-                news_query = news_query.filter(News.keywords.any(Keywords.algorithm == algorithm))
+                news_query = news_query.where(News.keywords.any(Keywords.algorithm == algorithm))
             if keywords_num:
-                news_query = news_query.filter(News.keywords.any(Keywords.keywords_num == keywords_num))
-            news_list = news_query.all()
-            if news_list:
-                news_ids = [news.id for news in news_list]
-                keywords_query = self.session.query(Keywords).filter(Keywords.news_id.in_(news_ids),
-                                                                     Keywords.is_delete == 0)
-                keywords_list = keywords_query.all()
-                if keywords_list:
-                    for keyword in keywords_list:
-                        keyword.is_delete = 1
+                news_query = news_query.where(News.keywords.any(Keywords.keywords_num == keywords_num))
+            news_ids = self.session.execute(news_query).scalars().all()
+            if news_ids:
+                count = soft_delete_keywords(self.session, news_ids)
+                if count:
+                    refresh_monthly_counts(self.session, year, month)
                     self.session.commit()
-                    print(f"共标记了 {len(keywords_list)} 条关键词数据为删除。")
+                    default_posting_index.build_month(self.session, year, month)
+                    print(f"共标记了 {count} 条关键词数据为删除。")
                     return True
                 else:
                     print(f"未找到符合条件的关键词数据。")
@@ -131,16 +131,10 @@ class DataDeleterWithDatabase:
 
     def mark_cloud_as_deleted(self, year, month, category, keywords_num, algorithm):
         try:
-            cloud = self.session.query(Cloud).filter(Cloud.year == year, Cloud.month == month,
-                                                     Cloud.category == category,
-                                                     Cloud.keywords_num == keywords_num,
-                                                     Cloud.algorithm == algorithm,
-                                                     Cloud.is_delete == 0
-                                                     ).first()
-            if cloud:
-                cloud.is_delete = 1
+            count = soft_delete_cloud(self.session, year, month, category, keywords_num, algorithm)
+            if count:
                 self.session.commit()
-                print(f"数据库中ID为 {cloud.id} 的云数据已标记为删除。")
+                print(f"数据库中共 {count} 条云数据已标记为删除。")
                 return True
             else:
                 print(f"数据库中未找到符合条件的云数据。")
@@ -152,17 +146,10 @@ class DataDeleterWithDatabase:
 
     def mark_summary_as_deleted(self, year, month, category, keywords_num, keyword, algorithm):
         try:
-            summary = self.session.query(Summary).filter(Summary.year == year, Summary.month == month,
-                                                         Summary.category == category,
-                                                         Summary.keywords_num == keywords_num,
-                                                         Summary.keyword == keyword,
-                                                         Summary.algorithm == algorithm,
-                                                         Summary.is_delete == 0
-                                                         ).first()
-            if summary:
-                summary.is_delete = 1
+            count = soft_delete_summary(self.session, year, month, category, keywords_num, keyword, algorithm)
+            if count:
                 self.session.commit()
-                print(f"数据库中ID为 {summary.id} 的摘要数据已标记为删除。")
+                print(f"数据库中共 {count} 条摘要数据已标记为删除。")
                 return True
             else:
                 print(f"数据库中未找到符合条件的摘要数据。")
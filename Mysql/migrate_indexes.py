@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 17:40
+@Auth: Zhang Hongxing
+@File: migrate_indexes.py
+@Note: 在已有数据库上补建模型中声明的表、列与索引（并修正关键词列的排序规则），无需重新导出导入数据
+"""
+from sqlalchemy import inspect, text, update
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from Mysql.db_config import DB_PARAMS
+from src.data_storage.database import Database
+from src.data_storage.models import Base, News, KeywordOccurrence, KeywordTerm, KEYWORD_COLLATION
+
+
+def add_missing_columns(engine, table, existing_columns):
+    """
+    为已存在的表补充模型中新增的列
+    :return: 新增的列名列表
+    """
+    added = []
+    for column in table.columns:
+        if column.name in existing_columns:
+            continue
+        ddl = CreateColumn(column).compile(dialect=engine.dialect)
+        print(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        added.append(column.name)
+    return added
+
+
+def add_missing_indexes(engine, table, existing_indexes):
+    """
+    创建模型中声明但数据库中不存在的索引。InnoDB 的 CREATE INDEX 为在线 DDL，建索引期间表仍可读写
+    :return: 新建的索引名列表
+    """
+    created = []
+    for index in sorted(table.indexes, key=lambda i: i.name):
+        if index.name in existing_indexes:
+            continue
+        print(CreateIndex(index).compile(dialect=engine.dialect))
+        index.create(engine)
+        created.append(index.name)
+    return created
+
+
+def fill_occurrence_pub_time(engine):
+    """
+    关键词出现表新增 pub_time 列后，从新闻表回填
+    """
+    with engine.begin() as conn:
+        result = conn.execute(
+            update(KeywordOccurrence)
+            .where(KeywordOccurrence.news_id == News.id, KeywordOccurrence.pub_time.is_(None))
+            .values(pub_time=News.pub_time)
+        )
+    print(f"回填了 {result.rowcount} 条关键词出现记录的发布时间")
+
+
+def fix_keyword_collation(engine, inspector):
+    """
+    关键词列改为二进制排序规则，大小写或重音不同的关键词不再冲突。
+    原排序规则下唯一的值在二进制排序规则下必然唯一，修改不会失败
+    :return: 是否修改了排序规则
+    """
+    for column in inspector.get_columns(KeywordTerm.__tablename__):
+        if column['name'] == 'word' and getattr(column['type'], 'collation', None) != KEYWORD_COLLATION:
+            ddl = (f"ALTER TABLE {KeywordTerm.__tablename__} MODIFY word VARCHAR(255) "
+                   f"CHARACTER SET utf8mb4 COLLATE {KEYWORD_COLLATION}")
+            print(ddl)
+            with engine.begin() as conn:
+                conn.execute(text(ddl))
+            return True
+    return False
+
+
+def migrate(db):
+    """
+    补建缺失的表、列与索引，可重复执行
+    :param db: 数据库实例
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing_tables = [table for table in Base.metadata.sorted_tables if table.name not in existing_tables]
+    if missing_tables:
+        print(f"创建缺失的表: {', '.join(table.name for table in missing_tables)}")
+        Base.metadata.create_all(engine, tables=missing_tables)
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        added = add_missing_columns(engine, table, existing_columns)
+        if table.name == KeywordOccurrence.__tablename__ and 'pub_time' in added:
+            fill_occurrence_pub_time(engine)
+        if table.name == KeywordTerm.__tablename__:
+            fix_keyword_collation(engine, inspector)
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        created = add_missing_indexes(engine, table, existing_indexes)
+        print(f"{table.name}: 新增列 {len(added)} 个，新建索引 {len(created)} 个")
+
+
+if __name__ == "__main__":
+    migrate(Database(DB_PARAMS))
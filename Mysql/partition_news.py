@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 18:40
+@Auth: Zhang Hongxing
+@File: partition_news.py
+@Note: 新闻表与关键词出现表按月分区的维护工具
+用法：
+    python -m Mysql.partition_news migrate [最早月份 YYYY-MM] [最晚月份 YYYY-MM]   将已有的表改为按月分区，更早的数据放入 p_old
+    python -m Mysql.partition_news extend YYYY-MM                                为直到该月的月份建好分区
+    python -m Mysql.partition_news purge YYYY-MM                                 删除该月分区以清理该月数据（p_old 不会被删除）
+"""
+import sys
+from datetime import datetime
+
+from Mysql.db_config import DB_PARAMS
+from Redis.delete_key import DataDeleterWithCache
+from Redis.redis_bloom_filter import RedisCountingBloomFilter
+from src.data_storage.database import Database, dispose_engines
+from src.data_storage.keyword_store import find_live_keywords, get_month_range
+from src.data_storage.partitioning import partition_tables, ensure_partitions, drop_month_partitions
+from src.data_storage.posting_index import default_posting_index
+from src.text_processing.doc_freq_store import DocFreqStore
+
+
+def parse_month(value):
+    return datetime.strptime(value, "%Y-%m")
+
+
+def main(args):
+    if not args or args[0] not in ("migrate", "extend", "purge"):
+        print(__doc__)
+        return
+    db = Database(DB_PARAMS)
+    command = args[0]
+    if command == "migrate":
+        first_month = parse_month(args[1]) if len(args) > 1 else None
+        last_month = parse_month(args[2]) if len(args) > 2 else None
+        partition_tables(db.engine, first_month, last_month)
+    elif command == "extend":
+        ensure_partitions(db.engine, parse_month(args[1]))
+    elif command == "purge":
+        month = parse_month(args[1])
+        bloom_filter = RedisCountingBloomFilter(db=db, refresh_interval=0)
+        # 只移除确实加入过过滤器的关键词，即高水位及之前仍有出现记录的关键词
+        high_water_mark = bloom_filter.catch_up()
+        with db.get_session() as session:
+            live_keywords = find_live_keywords(session, *get_month_range(month.year, month.month), high_water_mark)
+        if drop_month_partitions(db.engine, month.year, month.month):
+            # 该月的倒排索引段随之清空，关键词从布隆过滤器中移除
+            with db.get_session() as session:
+                default_posting_index.build_month(session, month.year, month.month)
+            bloom_filter.remove_many(f"news:{month.year}:{month.month:02d}:{word}" for word in live_keywords)
+            DocFreqStore().drop_month(month.year, month.month)
+            # 该月的新闻缓存与所有分页缓存一并清理
+            DataDeleterWithCache().delete_news_from_cache(month.year, month.month)
+    dispose_engines()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2024/12/25 15:30
+@Auth: Zhang Hongxing
+@File: bloom_hash.py
+@Note: 布隆过滤器的哈希与按目标误判率计算大小，过滤器本身见 redis_bloom_filter.py
+"""
+import math
+
+import numpy as np
+import mmh3
+
+MASK64 = (1 << 64) - 1
+
+
+def hash_pairs(items):
+    """
+    每个元素只计算一次 128 位 murmurhash，拆成两个 64 位哈希值，k 个探测位置由双重哈希 h1 + i * h2 得到
+    :param items: 字符串列表
+    :return: (h1, h2) 两个 uint64 数组
+    """
+    hashes = [mmh3.hash128(item, signed=False) for item in items]
+    h1 = np.fromiter((h & MASK64 for h in hashes), dtype=np.uint64, count=len(hashes))
+    h2 = np.fromiter((h >> 64 for h in hashes), dtype=np.uint64, count=len(hashes))
+    return h1, h2
+
+
+def optimal_size(capacity, error_rate):
+    """
+    :return: 容纳 capacity 个元素、误判率为 error_rate 所需的位数，取 8 的倍数，numpy 按字节视图读写时不会越界
+    """
+    bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+    return max(8, int(math.ceil(bits / 8)) * 8)
+
+
+def optimal_hash_count(error_rate):
+    return max(1, int(math.ceil(-math.log2(error_rate))))
+
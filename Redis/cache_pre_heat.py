@@ -5,84 +5,72 @@
 @File: cache_pre_heat.py
 @Note:   
 """
-import json
-import random
 import threading
 import schedule
 import time
-from datetime import datetime
-from sqlalchemy.orm import joinedload
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func
 
 from Mysql.db_config import DB_PARAMS
 from Redis.redis_config import get_redis_cluster_client
 from src.data_storage.database import Database
-from src.data_storage.models import News, Keywords
+from src.data_storage.models import News
+from src.services.news_service import NewsService
+
+# 预热最近几个月的数据
+PREHEAT_MONTHS = 3
 
 
 class CachePreheat:
-    def __init__(self, db_params, refresh_time):
+    def __init__(self, db_params, refresh_time, months=PREHEAT_MONTHS):
         self.db = Database(db_params)
         self.redis_client = get_redis_cluster_client()
+        # 通过 NewsService 查询，写入的正是界面读取的分页缓存
+        self.news_service = NewsService(self.db)
         self.refresh_time = refresh_time
+        self.months = months
 
-    def _reload_and_cache_data_for_keyword(self, keyword, cache_key):
-        try:
-            print(f"开始查询关键词 {keyword} 对应的新闻数据")
-            with self.db.get_session() as session:
-                query = (
-                    session.query(News)
-                    .join(Keywords, News.id == Keywords.news_id)
-                    .filter(Keywords.keywords.like(f"%{keyword}%"))
-                    .options(joinedload(News.keywords))
-                )
-                related_news = query.all()
-                if not related_news:
-                    print(f"未找到关键词 {keyword} 的相关新闻")
-                    result = {"error": "未找到相关新闻"}
-                    self.redis_client.setex(cache_key, 60, json.dumps(result))
-                    return
-                print(f"为关键词 {keyword} 找到 {len(related_news)} 条相关新闻")
-                news_results = [
-                    {
-                        "id": news.id,
-                        "title": news.title,
-                        "summary": self._get_summary(news.body),
-                        "url": news.url,
-                        "pub_time": str(news.pub_time),
-                        "category": news.category,
-                        "keywords": news.keywords[0].keywords if news.keywords else "",
-                    }
-                    for news in related_news
-                ]
-                result = {
-                    "news_results": news_results,
-                    "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "is_delete": 0
-                }
-                random_time = random.randint(0, 3600)
-                self.redis_client.setex(cache_key, 2592000 + random_time, json.dumps(result))
-                print(f"缓存更新成功，关键词 {keyword} 的新闻数据已缓存 1个月+{random_time}秒")
-        except Exception as e:
-            print(f"Error during database connection or query for keyword {keyword}: {e}")
+    def get_preheat_months(self):
+        """
+        :return: 以最新一条新闻所在月份为止的最近 self.months 个月，[(年, 月), ...]
+        """
+        with self.db.get_session() as session:
+            latest = session.query(func.max(News.pub_time)).filter(News.is_delete == 0).scalar()
+        if latest is None:
+            return []
+        return [((latest - relativedelta(months=i)).year, (latest - relativedelta(months=i)).month)
+                for i in range(self.months)]
 
-    def refresh_cache_for_keyword(self, keyword):
-        cache_key = f"news:{keyword}"
-        print(f"检查缓存：{cache_key}")
-        cached_data = self.redis_client.get(cache_key)
-        if cached_data:
-            random_time = random.randint(0, 3600)
-            self.redis_client.expire(cache_key, 2592000 + random_time)
-            print(f"缓存命中，关键词 {keyword} 的新闻数据延长缓存时间为 1个月+{random_time}秒")
+    def refresh_cache_for_keyword(self, keyword, months=None):
+        """
+        按月预热关键词的新闻候选列表与第一页
+        :param keyword: 关键词
+        :param months: [(年, 月), ...]，默认为 get_preheat_months()
+        """
+        if months is None:
+            months = self.get_preheat_months()
+        for year, month in months:
+            self.refresh_cache_for_keyword_month(keyword, year, month)
+
+    def refresh_cache_for_keyword_month(self, keyword, year, month):
+        selected_month = f"{year}-{month:02d}"
+        print(f"预热关键词 {keyword} 在 {selected_month} 的新闻分页缓存")
+        page = self.news_service.preheat_news_page(selected_month, keyword)
+        if page is None:
+            print(f"预热关键词 {keyword} 的新闻数据失败")
+        elif not page["news"]:
+            print(f"未找到关键词 {keyword} 的相关新闻")
         else:
-            print(f"缓存未命中，开始从数据库加载数据")
-            self._reload_and_cache_data_for_keyword(keyword, cache_key)
+            print(f"关键词 {keyword} 共 {page['total']} 条新闻，第一页已缓存")
 
     def refresh_hot_keywords_cache(self):
         print("开始刷新热点关键词缓存")
         hot_keywords = self.get_top_keyword(10)
+        months = self.get_preheat_months()
         for keyword_data in hot_keywords:
             keyword = keyword_data["keyword"]
-            threading.Thread(target=self.refresh_cache_for_keyword, args=(keyword,)).start()
+            threading.Thread(target=self.refresh_cache_for_keyword, args=(keyword, months)).start()
 
     def get_top_keyword(self, n):
         print(f"获取前 {n} 个热点关键词")
@@ -99,9 +87,6 @@ class CachePreheat:
             schedule.run_pending()
             time.sleep(1)
 
-    def _get_summary(self, body):
-        return body[:150] + '...' if len(body) > 150 else body
-
 
 if __name__ == "__main__":
     print("启动缓存预热系统")
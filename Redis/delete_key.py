@@ -5,14 +5,21 @@
 @File: delete_key.py
 @Note: 封装删除操作为类，确保数据库和缓存一致性，支持 Redis 集群
 """
+from Redis.near_cache import publish_invalidation
 from Redis.redis_config import get_redis_cluster_client
 redis_client = get_redis_cluster_client()
+ALL_CATEGORIES = "所有分区"
 
 class DataDeleterWithCache:
     def __init__(self):
         self.redis_client = redis_client # Redis 客户端实例
 
+    def _format_month(self, month):
+        # 写入缓存时月份均为两位（来自 "YYYY-MM"），删除时传入的可能是整数
+        return f"{int(month):02d}"
+
     def _get_news_cache_keys(self, year, month, category=None, keyword=None):
+        month = self._format_month(month)
         keys = []
         if category and keyword:
             keys.append(f"news:{year}:{month}:{keyword}:{category}")
@@ -25,22 +32,46 @@ class DataDeleterWithCache:
         return keys
 
     def _get_keywords_cache_key(self, year, month, algorithm, keywords_num):
+        month = self._format_month(month)
         return f"keywords:{year}:{month}:{algorithm}:{keywords_num}"
 
     def _get_cloud_cache_key(self, year, month, category, keywords_num, algorithm):
+        month = self._format_month(month)
         return f"wordcloud:{year}:{month}:{category}:{keywords_num}:{algorithm}"
 
     def _get_summary_cache_key(self, year, month, category, keywords_num, keyword, algorithm):
+        month = self._format_month(month)
         return f"summary:{year}:{month}:{category}:{keywords_num}:{keyword}:{algorithm}"
 
+    def _get_month_pages_key(self, year, month):
+        # 与 NewsService 写入分页缓存时登记的集合一致
+        return f"news:{year}:{self._format_month(month)}:pages"
+
+    def _get_news_page_cache_keys(self, year, month, category=None):
+        """
+        关键词新闻的分页缓存键："news:year:month:keyword:category:pages"，从该月登记的集合中取出受影响的键。
+        即使只删除含某个关键词的新闻，这些新闻也缓存在其他关键词的分页中，因此不按关键词筛选
+        """
+        keys = self.redis_client.smembers(self._get_month_pages_key(year, month))
+        if category:
+            # 该分区的分页与不限分区的分页受影响，其他分区的不受影响
+            keys = [key for key in keys if key.rsplit(':', 2)[1] in (category, ALL_CATEGORIES)]
+        return sorted(keys)
+
     def delete_news_from_cache(self, year, month, category=None, keyword=None):
         cache_keys = self._get_news_cache_keys(year, month, category, keyword)
+        page_keys = self._get_news_page_cache_keys(year, month, category)
+        cache_keys += page_keys
+        if page_keys:
+            self.redis_client.srem(self._get_month_pages_key(year, month), *page_keys)
         for key in cache_keys:
             result = self.redis_client.delete(key)
             if result:
                 print(f"{key} 的新闻缓存已删除。")
             else:
                 print(f"{key} 的新闻缓存不存在或已被删除。")
+        # 通知所有进程清除本地缓存中的副本
+        publish_invalidation(self.redis_client, cache_keys)
 
     def delete_keywords_from_cache(self, year, month, algorithm, keywords_num):
         cache_key = self._get_keywords_cache_key(year, month, algorithm, keywords_num)
@@ -49,6 +80,7 @@ class DataDeleterWithCache:
             print(f"{cache_key} 的关键词缓存已删除。")
         else:
             print(f"{cache_key} 的关键词缓存不存在或已被删除。")
+        publish_invalidation(self.redis_client, [cache_key])
 
     def delete_cloud_from_cache(self, year, month, category, keywords_num, algorithm):
         cache_key = self._get_cloud_cache_key(year, month, category, keywords_num, algorithm)
@@ -57,6 +89,7 @@ class DataDeleterWithCache:
             print(f"ID为 {cache_key} 的词云图缓存已删除。")
         else:
             print(f"ID为 {cache_key} 的词云图缓存不存在或已被删除。")
+        publish_invalidation(self.redis_client, [cache_key])
 
     def delete_summary_from_cache(self, year, month, category, keywords_num, keyword, algorithm):
         cache_key = self._get_summary_cache_key(year, month, category, keywords_num, keyword, algorithm)
@@ -65,6 +98,7 @@ class DataDeleterWithCache:
             print(f"ID为 {cache_key} 的摘要缓存已删除。")
         else:
             print(f"ID为 {cache_key} 的摘要缓存不存在或已被删除。")
+        publish_invalidation(self.redis_client, [cache_key])
 
 if __name__ == "__main__":
     cache_deleter = DataDeleterWithCache()
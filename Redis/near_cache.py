@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 20:40
+@Auth: Zhang Hongxing
+@File: near_cache.py
+@Note: 两级缓存：进程内按字节数限制大小的 LRU/TTL 缓存位于 Redis 集群之前，重复读取同一个键时不再访问网络；
+删除或更新缓存时通过 Redis 发布订阅通知所有进程清除本地副本
+"""
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from Redis.redis_config import get_redis_cluster_client
+
+# 缓存失效通知的频道
+INVALIDATION_CHANNEL = 'cache:invalidate'
+# 本地缓存的总大小上限（字节）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# 本地副本的最长存活时间（秒），漏收失效通知时最多读到这么久以前的值
+DEFAULT_TTL = 300
+# 单个值超过总大小的 1/MAX_ENTRY_RATIO 时不放入本地缓存，避免一个大值挤掉其他所有条目
+MAX_ENTRY_RATIO = 8
+
+
+class NearCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        """
+        :param max_bytes: 所有值占用内存的上限
+        :param ttl: 条目的默认存活时间（秒）
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # {(键, 哈希字段): (值, 字节数, 过期时间)}，按最近使用顺序排列；字符串键的字段为 None
+        self.entries = OrderedDict()
+        # {键: {哈希字段, ...}}，删除一个键时一并删除它的所有字段
+        self.fields = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, field=None):
+        """
+        :return: 缓存的值，不存在或已过期时返回 None
+        """
+        with self.lock:
+            entry = self.entries.get((key, field))
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._remove((key, field))
+                self.misses += 1
+                return None
+            self.entries.move_to_end((key, field))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, field=None, ttl=None):
+        """
+        :param ttl: 存活时间（秒），不超过默认值
+        """
+        size = sys.getsizeof(value)
+        if size > self.max_bytes // MAX_ENTRY_RATIO:
+            return
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        with self.lock:
+            if (key, field) in self.entries:
+                self._remove((key, field))
+            self.entries[(key, field)] = (value, size, time.monotonic() + ttl)
+            self.fields.setdefault(key, set()).add(field)
+            self.size += size
+            # 超出上限时淘汰最久未使用的条目
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, *keys):
+        with self.lock:
+            for key in keys:
+                for field in self.fields.get(key, set()).copy():
+                    self._remove((key, field))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.fields.clear()
+            self.size = 0
+
+    def _remove(self, entry_key):
+        _, size, _ = self.entries.pop(entry_key)
+        self.size -= size
+        key, field = entry_key
+        fields = self.fields[key]
+        fields.discard(field)
+        if not fields:
+            del self.fields[key]
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def publish_invalidation(redis_client, keys, origin=None):
+    """
+    通知所有进程清除这些键的本地副本
+    :param keys: 键列表，为 None 时清空全部本地缓存
+    :param origin: 发布者标识，发布者自己收到通知时忽略；为空时所有进程（包括发布者）都会清除
+    """
+    redis_client.publish(INVALIDATION_CHANNEL, json.dumps({"origin": origin, "keys": keys}, ensure_ascii=False))
+
+
+class TwoTierCache:
+    def __init__(self, redis_client=None, near_cache=None, subscribe=True):
+        """
+        :param redis_client: Redis 集群客户端
+        :param near_cache: 进程内缓存
+        :param subscribe: 是否订阅失效通知；订阅失败时本地副本仍按存活时间过期
+        """
+        self.redis_client = redis_client or get_redis_cluster_client()
+        self.near_cache = near_cache or NearCache()
+        self.origin = uuid.uuid4().hex
+        self.pubsub_thread = None
+        if subscribe:
+            self._subscribe()
+
+    def _subscribe(self):
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_invalidation})
+            self.pubsub_thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        except Exception as e:
+            print(f"订阅缓存失效通知失败，本地缓存将只按存活时间过期: {e}")
+
+    def _on_invalidation(self, message):
+        data = json.loads(message['data'])
+        if data.get('origin') == self.origin:
+            return
+        if data.get('keys') is None:
+            self.near_cache.clear()
+        else:
+            self.near_cache.invalidate(*data['keys'])
+
+    def get(self, key):
+        value = self.near_cache.get(key)
+        if value is None:
+            value = self.redis_client.get(key)
+            if value is not None:
+                self.near_cache.put(key, value)
+        return value
+
+    def setex(self, key, seconds, value):
+        self.redis_client.setex(key, seconds, value)
+        self.near_cache.put(key, value, ttl=seconds)
+        publish_invalidation(self.redis_client, [key], self.origin)
+
+    def hget(self, key, field):
+        value = self.near_cache.get(key, field)
+        if value is None:
+            value = self.redis_client.hget(key, field)
+            if value is not None:
+                self.near_cache.put(key, value, field)
+        return value
+
+    def hset(self, key, field, value):
+        self.redis_client.hset(key, field, value)
+        self.near_cache.put(key, value, field)
+        publish_invalidation(self.redis_client, [key], self.origin)
+
+    def delete(self, *keys):
+        """
+        :return: Redis 中实际删除的键数
+        """
+        # 集群中的键可能分布在不同节点上，逐个删除
+        deleted = sum(self.redis_client.delete(key) for key in keys)
+        self.near_cache.invalidate(*keys)
+        publish_invalidation(self.redis_client, list(keys), self.origin)
+        return deleted
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_two_tier_cache():
+    """
+    :return: 进程内共享的两级缓存，所有服务共用一份本地缓存与一个订阅线程
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TwoTierCache()
+        return _default_cache
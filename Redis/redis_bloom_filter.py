@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 19:50
+@Auth: Zhang Hongxing
+@File: redis_bloom_filter.py
+@Note: 存放在 Redis 集群中的分块计数布隆过滤器，所有进程共用一份计数器；支持删除元素，
+元素超出容量后叠加容量更大、误判率更低的新一代分片；每个进程在后台线程中定期刷新只记录计数器是否为 0 的本地副本
+"""
+import threading
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import select, func
+
+from Mysql.db_config import DB_PARAMS
+from Redis.bloom_hash import hash_pairs, optimal_size, optimal_hash_count
+from Redis.redis_config import get_redis_cluster_client
+from src.data_storage.database import Database
+from src.data_storage.keyword_store import get_month_range
+from src.data_storage.models import News, KeywordTerm, KeywordOccurrence, MonthlyKeywordCount
+
+BLOOM_KEY_PREFIX = 'bloom:news'
+# 默认的目标误判率
+DEFAULT_ERROR_RATE = 0.01
+# 数据库中没有数据时第一代的容量
+DEFAULT_CAPACITY = 100000
+# 元素超出容量后叠加的每一代容量是上一代的 GROWTH_FACTOR 倍
+GROWTH_FACTOR = 2
+# 每一代的误判率是上一代的 TIGHTENING_RATIO 倍，总误判率不超过 第一代误判率 / (1 - TIGHTENING_RATIO)
+TIGHTENING_RATIO = 0.5
+# 增量加载时每批读取的记录数
+LOAD_BATCH_SIZE = 10000
+# 过滤器参数、各代的参数与元素个数、已加载的最大关键词出现记录 id
+META_KEY = f'{BLOOM_KEY_PREFIX}:meta'
+# meta 的格式版本，与当前版本不同时清空后重新加载
+FILTER_FORMAT = 2
+# 从数据库加载新记录时的锁，同一时间只有一个进程加载；值为持有者的随机令牌，每加载一批续期一次
+LOAD_LOCK_KEY = f'{BLOOM_KEY_PREFIX}:loading'
+LOAD_LOCK_TTL = 60
+# 等待加载锁时的轮询间隔（秒）
+LOAD_LOCK_RETRY_INTERVAL = 0.2
+# 位图拆成的分片数，分片分布在集群的不同节点上
+DEFAULT_SHARD_COUNT = 64
+# 本地副本的刷新间隔（秒），为 0 时不启动刷新线程、不保留本地副本，每次查询都访问 Redis
+DEFAULT_REFRESH_INTERVAL = 60
+# 每个元素的 k 个计数器都落在同一分片内，误判率略高于标准布隆过滤器，多分配 10% 的计数器作补偿
+BLOCK_OVERHEAD = 1.1
+# 每个计数器 4 位，计到 15 后饱和，饱和的计数器不再减少，避免误删其他元素
+COUNTER_BITS = 4
+COUNTER_MAX = (1 << COUNTER_BITS) - 1
+
+# 只在 meta 不存在时写入过滤器的公共参数，多个进程同时创建时以先写入的为准
+INIT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], unpack(ARGV))
+end
+return 1
+"""
+
+# 当前代数等于 ARGV[1] 时才新增一代，多个进程同时发现当前代已满时只新增一次
+GROW_SCRIPT = """
+local generation = tonumber(redis.call('HGET', KEYS[1], 'generations') or '0')
+if generation == tonumber(ARGV[1]) then
+    redis.call('HSET', KEYS[1], 'shard_size:' .. generation, ARGV[2], 'hash_count:' .. generation, ARGV[3],
+               'capacity:' .. generation, ARGV[4])
+    generation = generation + 1
+    redis.call('HSET', KEYS[1], 'generations', generation)
+end
+return generation
+"""
+
+# 所有计数器都大于 0 时才减一（饱和的除外）。计数器都大于 0 不代表元素加入过：从未加入的元素可能
+# 恰好落在其他元素的计数器上，删除它会误减这些计数器造成漏判，因此只能删除确实加入过的元素（见 catch_up）
+REMOVE_SCRIPT = """
+for i = 1, #ARGV do
+    if redis.call('BITFIELD', KEYS[1], 'GET', 'u4', '#' .. ARGV[i])[1] == 0 then
+        return 0
+    end
+end
+for i = 1, #ARGV do
+    if redis.call('BITFIELD', KEYS[1], 'GET', 'u4', '#' .. ARGV[i])[1] < 15 then
+        redis.call('BITFIELD', KEYS[1], 'INCRBY', 'u4', '#' .. ARGV[i], -1)
+    end
+end
+return 1
+"""
+
+# 令牌与锁的值相同时才续期/释放，锁过期后被其他进程取得时不会误删或误续对方的锁
+EXTEND_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def estimate_capacity(db):
+    """
+    以数据库中 (年, 月, 关键词) 的组合数估计元素个数，每个组合对应一个新闻键
+    """
+    with db.get_session() as session:
+        months = select(MonthlyKeywordCount.year, MonthlyKeywordCount.month,
+                        MonthlyKeywordCount.keyword_id).distinct().subquery()
+        count = session.execute(select(func.count()).select_from(months)).scalar()
+    return max(DEFAULT_CAPACITY, count or 0)
+
+
+def iter_new_key_batches(session, high_water_mark):
+    """
+    按 id 顺序分批读取 high_water_mark 之后的关键词出现记录，只保留此前没有未删除出现记录的 (年, 月, 关键词)，
+    保证计数布隆过滤器中每个新闻键只加入一次
+    :return: 生成器，每批产生 (新增的新闻键列表, 本批最大记录 id, 本批记录数)
+    """
+    while True:
+        rows = session.execute(
+            select(KeywordOccurrence.id, KeywordOccurrence.keyword_id, KeywordOccurrence.pub_time, KeywordTerm.word)
+            .join(KeywordTerm, KeywordTerm.id == KeywordOccurrence.keyword_id)
+            .join(News, News.id == KeywordOccurrence.news_id)
+            .where(KeywordOccurrence.id > high_water_mark, KeywordOccurrence.is_delete == 0, News.is_delete == 0)
+            .order_by(KeywordOccurrence.id)
+            .limit(LOAD_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        months = {
+            (keyword_id, pub_time.year, pub_time.month): word
+            for _, keyword_id, pub_time, word in rows if pub_time and word
+        }
+        existing = find_existing_months(session, months, high_water_mark)
+        keys = [f"news:{year}:{month:02d}:{word}" for (keyword_id, year, month), word in months.items()
+                if (keyword_id, year, month) not in existing]
+        high_water_mark = rows[-1].id
+        yield keys, high_water_mark, len(rows)
+
+
+def find_existing_months(session, months, high_water_mark):
+    """
+    :param months: {(关键词id, 年, 月), ...}
+    :return: 其中在 high_water_mark 及之前已有未删除出现记录的组合
+    """
+    if not months:
+        return set()
+    first_year, first_month = min((year, month) for _, year, month in months)
+    last_year, last_month = max((year, month) for _, year, month in months)
+    rows = session.execute(
+        select(KeywordOccurrence.keyword_id, func.year(KeywordOccurrence.pub_time),
+               func.month(KeywordOccurrence.pub_time)).distinct()
+        .join(News, News.id == KeywordOccurrence.news_id)
+        .where(KeywordOccurrence.keyword_id.in_({keyword_id for keyword_id, _, _ in months}),
+               KeywordOccurrence.id <= high_water_mark,
+               KeywordOccurrence.is_delete == 0, News.is_delete == 0,
+               KeywordOccurrence.pub_time >= get_month_range(first_year, first_month)[0],
+               KeywordOccurrence.pub_time < get_month_range(last_year, last_month)[1])
+    ).all()
+    return {tuple(row) for row in rows} & set(months)
+
+
+class RedisCountingBloomFilter:
+    def __init__(self, capacity=None, error_rate=DEFAULT_ERROR_RATE, db=None, redis_client=None,
+                 shard_count=DEFAULT_SHARD_COUNT, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        """
+        :param capacity: 第一代预计的元素个数，默认按数据库中的关键词月份数估计；Redis 中已有过滤器时沿用其参数
+        :param error_rate: 各代合计的目标误判率
+        :param db: 数据库实例，默认按 DB_PARAMS 获取共享连接池
+        :param redis_client: 不解码返回值的 Redis 集群客户端，计数器以二进制读取
+        :param shard_count: 每一代的分片数
+        :param refresh_interval: 本地副本的刷新间隔（秒），后台线程刷新时同时加载数据库中的新记录
+        """
+        self.redis_client = redis_client or get_redis_cluster_client(decode_responses=False)
+        self.db = db or Database(DB_PARAMS)
+        self.refresh_interval = refresh_interval
+        self.refresh_lock = threading.Lock()
+        self.refresh_event = threading.Event()
+        self.closed = False
+        # 每一代一个 (分片数, 每片字节数) 的 uint8 数组，每位对应一个计数器是否非 0
+        self.local_bits = None
+        self.generations = []
+        self._init_meta(capacity, error_rate, shard_count)
+        if refresh_interval:
+            # 首次刷新也在后台进行，刷新完成前查询直接访问 Redis
+            threading.Thread(target=self._refresh_loop, daemon=True).start()
+        else:
+            self.refresh()
+
+    def _init_meta(self, capacity, error_rate, shard_count):
+        meta = self._get_meta()
+        if meta and int(meta.get('format', 1)) != FILTER_FORMAT:
+            # 旧版本的分片无法转换为当前格式，清空后从数据库重新加载
+            print("Redis 中的布隆过滤器为旧格式，清空后重新加载")
+            old_shard_count = int(meta['shard_count'])
+            self.redis_client.delete(*[f"{BLOOM_KEY_PREFIX}:shard:{shard}" for shard in range(old_shard_count)])
+            self.redis_client.delete(META_KEY)
+            meta = {}
+        if not meta:
+            capacity = capacity or estimate_capacity(self.db)
+            self.redis_client.execute_command('EVAL', INIT_SCRIPT, 1, META_KEY,
+                                              'format', FILTER_FORMAT, 'shard_count', shard_count,
+                                              'counter_bits', COUNTER_BITS, 'capacity', capacity,
+                                              'error_rate', error_rate)
+            meta = self._get_meta()
+        self.shard_count = int(meta['shard_count'])
+        self.capacity = int(meta['capacity'])
+        self.error_rate = float(meta['error_rate'])
+        if not int(meta.get('generations', 0)):
+            self._grow(0)
+        else:
+            self._load_generations(meta)
+
+    def _get_meta(self):
+        return {key.decode(): value.decode() for key, value in self.redis_client.hgetall(META_KEY).items()}
+
+    def _load_generations(self, meta):
+        self.generations = [
+            {
+                'shard_size': int(meta[f'shard_size:{generation}']),
+                'hash_count': int(meta[f'hash_count:{generation}']),
+                'capacity': int(meta[f'capacity:{generation}']),
+            }
+            for generation in range(int(meta['generations']))
+        ]
+
+    def _grow(self, generation):
+        """
+        新增第 generation 代：容量为第一代的 GROWTH_FACTOR ** generation 倍，误判率为 TIGHTENING_RATIO ** generation 倍，
+        第一代的误判率取目标误判率的 (1 - TIGHTENING_RATIO) 倍，各代合计不超过目标误判率
+        """
+        capacity = self.capacity * GROWTH_FACTOR ** generation
+        error_rate = self.error_rate * (1 - TIGHTENING_RATIO) * TIGHTENING_RATIO ** generation
+        shard_size = optimal_size(capacity * BLOCK_OVERHEAD / self.shard_count, error_rate)
+        created = self.redis_client.execute_command('EVAL', GROW_SCRIPT, 1, META_KEY, generation, shard_size,
+                                                    optimal_hash_count(error_rate), capacity)
+        if int(created) == generation + 1:
+            print(f"布隆过滤器新增第 {generation + 1} 代：容量 {capacity}，{self.shard_count} 个分片，"
+                  f"每片 {shard_size} 个计数器")
+        self._load_generations(self._get_meta())
+
+    def _shard_key(self, generation, shard):
+        return f"{BLOOM_KEY_PREFIX}:{generation}:shard:{shard}"
+
+    @property
+    def count(self):
+        return int(self.redis_client.hget(META_KEY, 'count') or 0)
+
+    def _locate(self, hashes, params):
+        """
+        :param hashes: hash_pairs 返回的 (h1, h2)
+        :param params: 某一代的参数
+        :return: (每个元素所在的分片 uint64[n], 分片内的计数器下标 uint64[n, k])
+        """
+        h1, h2 = hashes
+        shards = (h1 >> np.uint64(32)) % np.uint64(self.shard_count)
+        probes = np.arange(params['hash_count'], dtype=np.uint64)
+        offsets = (h1[:, None] + probes[None, :] * h2[:, None]) % np.uint64(params['shard_size'])
+        return shards, offsets
+
+    def add(self, item):
+        return self.add_many([item]) > 0
+
+    def check(self, item):
+        return bool(self.check_many([item])[0])
+
+    def remove(self, item):
+        return self.remove_many([item]) > 0
+
+    def _active_generation(self):
+        """
+        :return: 接收新元素的一代，即最新一代；其元素个数达到容量时先新增一代
+        """
+        generation = len(self.generations) - 1
+        count = int(self.redis_client.hget(META_KEY, f'count:{generation}') or 0)
+        if count >= self.generations[generation]['capacity']:
+            self._grow(generation + 1)
+            generation = len(self.generations) - 1
+        return generation
+
+    def add_many(self, items):
+        """
+        批量加入元素，每个元素的 k 个计数器由一条 BITFIELD 命令加一，所有命令通过一个流水线发送。
+        计数过滤器要求同一元素只加入一次，删除时才能恰好抵消
+        :param items: 字符串列表
+        :return: 加入的元素个数
+        """
+        items = list(items)
+        if not items:
+            return 0
+        generation = self._active_generation()
+        shards, offsets = self._locate(hash_pairs(items), self.generations[generation])
+        pipe = self.redis_client.pipeline()
+        for shard, row in zip(shards.tolist(), offsets.tolist()):
+            pipe.execute_command('BITFIELD', self._shard_key(generation, shard), 'OVERFLOW', 'SAT',
+                                 *[arg for offset in row for arg in ('INCRBY', 'u4', f"#{offset}", 1)])
+        pipe.execute()
+        self.redis_client.hincrby(META_KEY, f'count:{generation}', len(items))
+        self.redis_client.hincrby(META_KEY, 'count', len(items))
+        local_bits = self.local_bits
+        if local_bits is not None and generation < len(local_bits):
+            # 本进程新加入的元素立即在本地副本中可见
+            rows = np.broadcast_to(shards[:, None], offsets.shape)
+            np.bitwise_or.at(local_bits[generation], (rows, offsets >> np.uint64(3)), self._bit_masks(offsets))
+        return len(items)
+
+    def remove_many(self, items):
+        """
+        批量删除元素，先读取各代的计数器确定元素所在的一代，再通过 Lua 脚本在分片内原子地减少计数器。
+        元素同时出现在多代中时无法确定是哪一代加入的（其余为误判），保留不删，只会多一次误判。
+        调用方须保证元素确实加入过，删除从未加入的元素会误减其他元素的计数器，见 catch_up
+        :param items: 字符串列表
+        :return: 删除的元素个数（过滤器中不存在的元素不计）
+        """
+        items = list(items)
+        if not items:
+            return 0
+        located, counters = self._get_counters(hash_pairs(items))
+        present = np.stack([(generation_counters > 0).all(axis=1) for generation_counters in counters])
+        pipe = self.redis_client.pipeline()
+        removing = []
+        for index in np.flatnonzero(present.sum(axis=0) == 1).tolist():
+            generation = int(np.argmax(present[:, index]))
+            shards, offsets = located[generation]
+            pipe.execute_command('EVAL', REMOVE_SCRIPT, 1, self._shard_key(generation, int(shards[index])),
+                                 *offsets[index].tolist())
+            removing.append(generation)
+        removed = 0
+        for generation, result in zip(removing, pipe.execute()):
+            if result:
+                self.redis_client.hincrby(META_KEY, f'count:{generation}', -1)
+                removed += 1
+        if removed:
+            self.redis_client.hincrby(META_KEY, 'count', -removed)
+            # 提前刷新本地副本，刷新前被删除的元素只会造成误判
+            self.refresh_event.set()
+        return removed
+
+    def check_many(self, items):
+        """
+        先查本地副本，本地未命中（或还没有本地副本）的元素再读取 Redis 中的计数器：每个元素在每一代的 k 个计数器
+        由一条 BITFIELD GET 读取，所有命令通过一个流水线发送。本地副本只会漏掉刷新后其他进程新加入的元素，
+        命中的结果无需再确认
+        :param items: 字符串列表
+        :return: bool 数组，False 表示一定不存在
+        """
+        items = list(items)
+        if not items:
+            return np.zeros(0, dtype=bool)
+        h1, h2 = hash_pairs(items)
+        found = np.zeros(len(items), dtype=bool)
+        local_bits, generations = self.local_bits, self.generations
+        if local_bits is not None:
+            for bits, params in zip(local_bits, generations):
+                shards, offsets = self._locate((h1, h2), params)
+                bytes_at = bits[shards[:, None], offsets >> np.uint64(3)]
+                found |= (bytes_at & self._bit_masks(offsets)).astype(bool).all(axis=1)
+        missed = np.flatnonzero(~found)
+        if missed.size:
+            _, counters = self._get_counters((h1[missed], h2[missed]))
+            found[missed] = np.any([(generation_counters > 0).all(axis=1) for generation_counters in counters],
+                                   axis=0)
+        return found
+
+    def _get_counters(self, hashes):
+        """
+        通过一个流水线读取元素在每一代的 k 个计数器
+        :return: (每一代的 _locate 结果, 每一代形状为 (n, k) 的计数器数组)
+        """
+        generations = self.generations
+        located = [self._locate(hashes, params) for params in generations]
+        pipe = self.redis_client.pipeline()
+        for generation, (shards, offsets) in enumerate(located):
+            for shard, row in zip(shards.tolist(), offsets.tolist()):
+                pipe.execute_command('BITFIELD', self._shard_key(generation, shard),
+                                     *[arg for offset in row for arg in ('GET', 'u4', f"#{offset}")])
+        results = pipe.execute()
+        size = len(hashes[0])
+        counters = [
+            np.asarray(results[generation * size:(generation + 1) * size], dtype=np.uint8)
+            .reshape(size, params['hash_count'])
+            for generation, params in enumerate(generations)
+        ]
+        return located, counters
+
+    def _bit_masks(self, offsets):
+        # 本地副本按 np.packbits 的大端序存放，计数器 #i 对应第 i // 8 个字节的第 7 - i % 8 位
+        return np.right_shift(np.uint8(0x80), (offsets & np.uint64(7)).astype(np.uint8))
+
+    def _refresh_loop(self):
+        while not self.closed:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"刷新布隆过滤器失败: {e}")
+            self.refresh_event.wait(self.refresh_interval)
+            self.refresh_event.clear()
+
+    def close(self):
+        """
+        停止后台刷新线程
+        """
+        self.closed = True
+        self.refresh_event.set()
+
+    def refresh(self):
+        """
+        加载数据库中的新记录，再从 Redis 读取各代的参数与全部分片更新本地副本
+        """
+        with self.refresh_lock:
+            self.load_data_from_db()
+            self._load_generations(self._get_meta())
+            if self.refresh_interval:
+                self.local_bits = [self._fetch_shards(generation, params)
+                                   for generation, params in enumerate(self.generations)]
+
+    def _fetch_shards(self, generation, params):
+        """
+        :return: 形状为 (分片数, 每片字节数) 的 uint8 数组，只记录每个计数器是否非 0
+        """
+        pipe = self.redis_client.pipeline()
+        for shard in range(self.shard_count):
+            pipe.get(self._shard_key(generation, shard))
+        local_bits = np.zeros((self.shard_count, params['shard_size'] // 8), dtype=np.uint8)
+        for shard, data in enumerate(pipe.execute()):
+            if data:
+                # Redis 只保存到最后一个非零的字节，其余部分视为 0；每个字节存两个 4 位计数器，高 4 位在前
+                counters = np.frombuffer(data, dtype=np.uint8)
+                nonzero = np.stack([(counters >> 4) > 0, (counters & 0x0F) > 0], axis=1).ravel()
+                packed = np.packbits(nonzero)
+                local_bits[shard, :len(packed)] = packed
+        return local_bits
+
+    @property
+    def high_water_mark(self):
+        return int(self.redis_client.hget(META_KEY, 'high_water_mark') or 0)
+
+    def catch_up(self):
+        """
+        阻塞等待加载锁，将数据库中的新记录全部加入过滤器。高水位及之前的未删除出现记录对应的新闻键都已加入，
+        删除元素前据此只删除确实加入过的新闻键
+        :return: 加载后的高水位
+        """
+        self.load_data_from_db(wait=True)
+        return self.high_water_mark
+
+    def load_data_from_db(self, wait=False):
+        """
+        将高水位之后新增的 (年, 月, 关键词) 加入过滤器，高水位保存在 Redis 中，所有进程共用
+        :param wait: 其他进程正在加载时是否等待其完成后再加载
+        :return: 读取的记录数，不等待且其他进程正在加载时为 0
+        """
+        token = uuid.uuid4().hex.encode()
+        while not self.redis_client.set(LOAD_LOCK_KEY, token, ex=LOAD_LOCK_TTL, nx=True):
+            if not wait:
+                return 0
+            time.sleep(LOAD_LOCK_RETRY_INTERVAL)
+        loaded = 0
+        try:
+            high_water_mark = self.high_water_mark
+            with self.db.get_session() as session:
+                for keys, high_water_mark, count in iter_new_key_batches(session, high_water_mark):
+                    self.add_many(keys)
+                    if not self.redis_client.execute_command('EVAL', EXTEND_LOCK_SCRIPT, 1, LOAD_LOCK_KEY, token,
+                                                             LOAD_LOCK_TTL * 1000):
+                        # 锁已过期并被其他进程取得，由对方继续加载；本批已加入的键至多重复一次，只会造成误判
+                        print("布隆过滤器的加载锁已过期，停止加载")
+                        break
+                    self.redis_client.hset(META_KEY, 'high_water_mark', high_water_mark)
+                    loaded += count
+        finally:
+            self.redis_client.execute_command('EVAL', RELEASE_LOCK_SCRIPT, 1, LOAD_LOCK_KEY, token)
+        if loaded:
+            print(f"布隆过滤器新增加载 {loaded} 条关键词出现记录，共 {self.count} 个元素")
+        return loaded
+
+    def estimated_error_rate(self):
+        """
+        :return: 按各代各分片当前非零计数器的比例估计的误判率，元素在任一代中误判即为误判
+        """
+        local_bits = self.local_bits
+        if local_bits is None:
+            local_bits = [self._fetch_shards(generation, params) for generation, params in enumerate(self.generations)]
+        passed = 1.0
+        for bits, params in zip(local_bits, self.generations):
+            fill = np.unpackbits(bits, axis=1).sum(axis=1) / params['shard_size']
+            passed *= 1 - float(np.mean(fill ** params['hash_count']))
+        return 1 - passed
+
+
+if __name__ == "__main__":
+    bloom_filter = RedisCountingBloomFilter()
+    test_key = "news:2024:12:知识讲座"
+    if bloom_filter.check(test_key):
+        print(f"Key '{test_key}' 可能存在。")
+    else:
+        print(f"Key '{test_key}' 不存在。")
+    print(f"共 {bloom_filter.count} 个元素，当前估计误判率: {bloom_filter.estimated_error_rate():.4%}")
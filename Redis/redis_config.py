@@ -15,10 +15,13 @@ REDIS_NODES = [
 ]
 
 
-def get_redis_cluster_client():
+def get_redis_cluster_client(decode_responses=True):
+    """
+    :param decode_responses: 是否将返回值解码为字符串，读取位图等二进制数据时传 False
+    """
     return RedisCluster(
         startup_nodes=REDIS_NODES,
-        decode_responses=True,
+        decode_responses=decode_responses,
     )
 
 
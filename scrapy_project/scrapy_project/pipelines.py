@@ -13,9 +13,9 @@
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.orm import scoped_session
 
+from src.data_storage.database import Database
 from src.data_storage.models import News
 
 
@@ -31,11 +31,11 @@ class NewsPipeline:
         return cls(db_params)
 
     def open_spider(self, spider):
-        self.db = scoped_session(sessionmaker(bind=create_engine(
-            f"mysql+pymysql://{self.db_params['user']}:{self.db_params['password']}@{self.db_params['host']}:{self.db_params['port']}/{self.db_params['database']}")))
+        # 与界面、服务共用进程内的连接池，不再为爬虫单独创建引擎
+        self.db = scoped_session(Database(self.db_params).Session)
 
     def close_spider(self, spider):
-        self.db.close()
+        self.db.remove()
 
     def process_item(self, item, spider):
         news = News(
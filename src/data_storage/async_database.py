@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 19:10
+@Auth: Zhang Hongxing
+@File: async_database.py
+@Note: 基于 SQLAlchemy 异步引擎与 aiomysql 的数据库封装，多个关键词、月份的查询可在同一事件循环中并发执行
+"""
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.data_storage.database import TimedQueuePool, get_database_url, get_pool_params, pool_status
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """
+    异步引擎使用的连接池，同样记录借出等待时间
+    """
+
+
+class AsyncDatabase:
+    def __init__(self, db_params):
+        """
+        连接在首次使用它的事件循环中建立，同一实例应只在一个长期运行的事件循环中使用
+        :param db_params: 与 Database 相同的连接参数，连接池配置也相同
+        """
+        self.engine = create_async_engine(get_database_url(db_params, driver="aiomysql"),
+                                          poolclass=TimedAsyncQueuePool, **get_pool_params(db_params))
+        # 提交后不让对象过期，避免会话关闭后访问属性时再次触发查询
+        self.Session = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    def get_session(self):
+        return self.Session()
+
+    async def run_sync(self, fn, *args, **kwargs):
+        """
+        在异步会话中执行以同步会话为第一个参数的函数，已有的查询代码无需改写即可通过异步驱动执行
+        :param fn: 形如 fn(session, *args, **kwargs) 的函数
+        :return: fn 的返回值
+        """
+        async with self.Session() as session:
+            return await session.run_sync(fn, *args, **kwargs)
+
+    def get_pool_stats(self):
+        return pool_status(self.engine.sync_engine)
+
+    async def dispose_connection(self):
+        await self.engine.dispose()
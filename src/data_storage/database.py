@@ -5,23 +5,185 @@
 @File: database.py
 @Note:   
 """
+import threading
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from src.data_storage.models import Base
+from src.data_storage.partitioning import partition_tables
+
+# 连接池默认配置，可在 db_params 中用同名键覆盖
+DEFAULT_POOL_PARAMS = {
+    'pool_size': 10,  # 常驻连接数
+    'max_overflow': 20,  # 高峰时可额外创建的连接数
+    'pool_timeout': 30,  # 连接全部借出时等待归还的最长秒数
+    'pool_recycle': 3600,  # 连接存活超过该秒数后重建，避免被 MySQL wait_timeout 断开
+    'pool_pre_ping': True,  # 借出前先 ping，自动替换已断开的连接
+}
+
+# 进程内共享的引擎：{(连接地址, 连接池配置): 引擎}
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+class PoolStats:
+    """
+    连接池借出次数与等待时间的累计统计，连接池重建（dispose）后继续累计
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+
+    def record(self, elapsed, timed_out=False):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_time += elapsed
+            self.max_wait_time = max(self.max_wait_time, elapsed)
+            if timed_out:
+                self.timeouts += 1
+
+
+class TimedQueuePool(QueuePool):
+    """
+    记录每次借出连接等待时间的 QueuePool
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            # 只有等待超过 pool_timeout 才计为超时，建立连接失败等错误不计入
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def get_pool_params(db_params):
+    return {key: db_params.get(key, value) for key, value in DEFAULT_POOL_PARAMS.items()}
+
+
+def get_database_url(db_params, driver="pymysql"):
+    return (f"mysql+{driver}://{db_params['user']}:{db_params['password']}@{db_params['host']}:{db_params['port']}"
+            f"/{db_params['database']}?charset={db_params.get('charset', 'utf8mb4')}")
+
+
+def get_engine(db_params):
+    """
+    获取进程内共享的引擎，连接地址与连接池配置相同的调用方共用同一个连接池
+    :param db_params: 数据库连接参数，可包含 DEFAULT_POOL_PARAMS 中的连接池配置
+    :return: 引擎
+    """
+    url = get_database_url(db_params)
+    pool_params = get_pool_params(db_params)
+    key = (url, tuple(sorted(pool_params.items())))
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(url, poolclass=TimedQueuePool, **pool_params)
+            _engines[key] = engine
+        return engine
+
+
+def pool_status(engine):
+    """
+    :return: 连接池当前状态与累计的借出等待统计
+    """
+    pool = engine.pool
+    stats = pool.stats
+    with stats.lock:
+        checkouts, wait_time = stats.checkouts, stats.wait_time
+        max_wait_time, timeouts = stats.max_wait_time, stats.timeouts
+    return {
+        "database": engine.url.render_as_string(hide_password=True),
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": checkouts,
+        "timeouts": timeouts,
+        "avg_wait_ms": round(wait_time / checkouts * 1000, 3) if checkouts else 0.0,
+        "max_wait_ms": round(max_wait_time * 1000, 3),
+    }
+
+
+def get_pool_stats():
+    """
+    :return: 进程内所有共享引擎的连接池统计列表
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+    return [pool_status(engine) for engine in engines]
+
+
+def dispose_engines():
+    """
+    关闭进程内所有共享引擎的连接池，只在进程退出前调用
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        print(f"连接池统计: {pool_status(engine)}")
+        engine.dispose()
 
 
 class Database:
     def __init__(self, db_params):
-        self.engine = create_engine(
-            f"mysql+pymysql://{db_params['user']}:{db_params['password']}@{db_params['host']}:{db_params['port']}/{db_params['database']}")
+        self.db_params = db_params
+        self.engine = get_engine(db_params)
         self.Session = sessionmaker(bind=self.engine)
+        self.async_db = None
 
-    def create_tables(self):
+    def create_tables(self, partition_by_month=False, first_month=None, last_month=None):
+        """
+        创建尚不存在的表
+        :param partition_by_month: 是否将新闻表与关键词出现表按 pub_time 月份分区
+        :param first_month: 第一个分区的月份，默认为最早的新闻月份
+        :param last_month: 最后一个按月分区的月份，默认为下个月
+        """
         Base.metadata.create_all(self.engine)
+        if partition_by_month:
+            partition_tables(self.engine, first_month, last_month)
 
     def get_session(self):
         return self.Session()
 
+    def get_async_database(self):
+        """
+        获取同一数据库的异步版本，首次调用时创建，供各服务的 *_async 方法使用
+        :return: AsyncDatabase 实例
+        """
+        if self.async_db is None:
+            # 异步驱动只在用到异步接口时才需要安装
+            from src.data_storage.async_database import AsyncDatabase
+            self.async_db = AsyncDatabase(self.db_params)
+        return self.async_db
+
+    def get_pool_stats(self):
+        return pool_status(self.engine)
+
     def dispose_connection(self):
-        self.engine.dispose()
+        """
+        引擎由进程内各组件共享，这里只输出连接池统计，不关闭连接池，其他组件的连接不受影响；
+        进程退出前调用 dispose_engines 关闭所有连接池
+        """
+        print(f"连接池统计: {self.get_pool_stats()}")
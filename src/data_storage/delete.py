@@ -8,15 +8,22 @@
 from Mysql.db_config import DB_PARAMS
 from Mysql.delete_data import DataDeleterWithDatabase
 from Redis.delete_key import DataDeleterWithCache
+from Redis.redis_bloom_filter import RedisCountingBloomFilter
 
 
 class DataDeleter:
     def __init__(self, db_params):
         self.cache_deleter = DataDeleterWithCache()
         self.db_deleter = DataDeleterWithDatabase(db_params)
+        # 只写不查，不需要本地副本
+        self.bloom_filter = RedisCountingBloomFilter(db=self.db_deleter.db, refresh_interval=0)
 
     def delete_data(self, year, month, category=None, keyword=None, algorithm=None, keywords_num=None):
         try:
+            # 记录删除前该月仍有新闻的关键词，删除后不再有新闻的关键词需要从布隆过滤器中移除。
+            # 只能移除确实加入过过滤器的关键词：先等加载完数据库中的新记录，只看高水位及之前的出现记录
+            high_water_mark = self.bloom_filter.catch_up()
+            live_keywords = self.db_deleter.get_live_keywords(year, month, high_water_mark)
             # 删除数据库中的数据
             if self.db_deleter.mark_news_as_deleted(year, month, category, keyword):
                 print(f"数据库中新闻数据删除成功。")
@@ -26,6 +33,11 @@ class DataDeleter:
                 print(f"数据库中词云数据删除成功。")
             if self.db_deleter.mark_summary_as_deleted(year, month, category, keywords_num, keyword, algorithm):
                 print(f"数据库中摘要数据删除成功。")
+            removed_keywords = live_keywords - self.db_deleter.get_live_keywords(year, month)
+            if removed_keywords:
+                removed = self.bloom_filter.remove_many(
+                    f"news:{year}:{int(month):02d}:{word}" for word in removed_keywords)
+                print(f"布隆过滤器中移除了 {removed} 个关键词。")
             # 删除缓存中的数据
             self.cache_deleter.delete_news_from_cache(year, month, category, keyword)
             self.cache_deleter.delete_keywords_from_cache(year, month, algorithm, keywords_num)
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 15:30
+@Auth: Zhang Hongxing
+@File: keyword_store.py
+@Note: 关键词规范化存储：关键词出现表与按月汇总的关键词计数表
+"""
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import insert, select, delete, func, literal
+
+from src.data_storage.models import News, Keywords, KeywordTerm, KeywordOccurrence, MonthlyKeywordCount
+
+# IN 查询每批的参数个数
+CHUNK_SIZE = 1000
+
+
+def parse_keywords(keywords):
+    """
+    解析 "关键词:权重" 格式的列表
+    :param keywords: ["关键词:权重", ...]
+    :return: [(关键词, 权重), ...]
+    """
+    pairs = []
+    for item in keywords:
+        word, _, weight = item.strip().rpartition(':')
+        if not word:
+            continue
+        try:
+            pairs.append((word, float(weight)))
+        except ValueError:
+            print(f"无法解析关键词权重: {item}")
+    return pairs
+
+
+def get_month_range(year, month):
+    start_time = datetime(int(year), int(month), 1)
+    return start_time, start_time + relativedelta(months=1)
+
+
+def get_or_create_keyword_ids(session, words):
+    """
+    获取关键词的 id，不存在的关键词批量插入
+    :param session: 数据库会话
+    :param words: 关键词集合
+    :return: {关键词: id}
+    """
+    words = list(set(words))
+    keyword_ids = {}
+    for i in range(0, len(words), CHUNK_SIZE):
+        chunk = words[i:i + CHUNK_SIZE]
+        rows = session.execute(select(KeywordTerm.word, KeywordTerm.id).where(KeywordTerm.word.in_(chunk)))
+        keyword_ids.update({word: keyword_id for word, keyword_id in rows})
+    missing = [word for word in words if word not in keyword_ids]
+    if missing:
+        session.execute(insert(KeywordTerm).prefix_with('IGNORE'), [{"word": word} for word in missing])
+        for i in range(0, len(missing), CHUNK_SIZE):
+            chunk = missing[i:i + CHUNK_SIZE]
+            rows = session.execute(select(KeywordTerm.word, KeywordTerm.id).where(KeywordTerm.word.in_(chunk)))
+            keyword_ids.update({word: keyword_id for word, keyword_id in rows})
+    return keyword_ids
+
+
+def save_occurrences(session, news_ids, all_keywords, algorithm):
+    """
+    将每篇新闻的关键词写入关键词出现表
+    :param session: 数据库会话
+    :param news_ids: 新闻 id 列表
+    :param all_keywords: 与新闻顺序一致的 "关键词:权重" 列表的列表
+    :param algorithm: 算法名称
+    """
+    parsed = [parse_keywords(keywords) for keywords in all_keywords]
+    keyword_ids = get_or_create_keyword_ids(session, (word for pairs in parsed for word, _ in pairs))
+    # 倒排记录中冗余保存新闻发布时间，按月查询时无需回表；分区表中 pub_time 也是分区键，插入时必须给出
+    unique_ids = list(set(news_ids))
+    pub_times = {}
+    for i in range(0, len(unique_ids), CHUNK_SIZE):
+        rows = session.execute(select(News.id, News.pub_time).where(News.id.in_(unique_ids[i:i + CHUNK_SIZE])))
+        pub_times.update({news_id: pub_time for news_id, pub_time in rows})
+    occurrences = [
+        {
+            "news_id": news_id,
+            "keyword_id": keyword_ids[word],
+            "pub_time": pub_times.get(news_id),
+            "weight": weight,
+            "algorithm": algorithm
+        }
+        for news_id, pairs in zip(news_ids, parsed)
+        for word, weight in pairs
+        if word in keyword_ids
+    ]
+    dropped = sum(len(pairs) for pairs in parsed) - len(occurrences)
+    if dropped:
+        # 关键词列的排序规则不是二进制时会发生，见 Mysql/migrate_indexes.py
+        print(f"有 {dropped} 条关键词出现记录找不到对应的关键词，未能保存")
+    if occurrences:
+        session.bulk_insert_mappings(KeywordOccurrence, occurrences)
+
+
+def save_keywords(session, news_list, all_keywords, algorithm, year, month):
+    """
+    保存一个月的关键词提取结果：原有的 Keywords 文本、关键词出现表，并刷新月度汇总
+    :param session: 数据库会话
+    :param news_list: 新闻列表
+    :param all_keywords: 与新闻顺序一致的 "关键词:权重" 列表的列表
+    :param algorithm: 算法名称
+    :param year: 年
+    :param month: 月
+    """
+    session.bulk_insert_mappings(Keywords, [
+        {
+            "news_id": news.id,
+            "algorithm": algorithm,
+            "keywords": ", ".join(keywords),
+            "keywords_num": len(keywords)
+        }
+        for news, keywords in zip(news_list, all_keywords)
+    ])
+    save_occurrences(session, [news.id for news in news_list], all_keywords, algorithm)
+    refresh_monthly_counts(session, year, month, algorithm)
+
+
+def refresh_monthly_counts(session, year, month, algorithm=None):
+    """
+    根据关键词出现表重新计算某月（某算法）各分区的关键词计数
+    :param session: 数据库会话
+    :param year: 年
+    :param month: 月
+    :param algorithm: 算法名称，为空时刷新该月所有算法
+    """
+    start_time, end_time = get_month_range(year, month)
+    delete_stmt = delete(MonthlyKeywordCount).where(
+        MonthlyKeywordCount.year == int(year),
+        MonthlyKeywordCount.month == int(month)
+    )
+    count_query = (
+        select(
+            literal(int(year)), literal(int(month)), News.category, KeywordOccurrence.algorithm,
+            KeywordOccurrence.keyword_id, func.count(func.distinct(KeywordOccurrence.news_id))
+        )
+        .join(News, News.id == KeywordOccurrence.news_id)
+        .where(
+            News.pub_time >= start_time,
+            News.pub_time < end_time,
+            News.is_delete == 0,
+            KeywordOccurrence.is_delete == 0
+        )
+        .group_by(News.category, KeywordOccurrence.algorithm, KeywordOccurrence.keyword_id)
+    )
+    if algorithm:
+        delete_stmt = delete_stmt.where(MonthlyKeywordCount.algorithm == algorithm)
+        count_query = count_query.where(KeywordOccurrence.algorithm == algorithm)
+    session.execute(delete_stmt)
+    session.execute(insert(MonthlyKeywordCount).from_select(
+        ['year', 'month', 'category', 'algorithm', 'keyword_id', 'count'], count_query))
+
+
+def get_top_keywords(session, year, month, category, algorithm, top_k):
+    """
+    从月度汇总表中查询出现次数最多的关键词
+    :param session: 数据库会话
+    :param year: 年
+    :param month: 月
+    :param category: 分区，"所有分区" 或为空时汇总所有分区
+    :param algorithm: 算法名称
+    :param top_k: 选择前 K 个关键词
+    :return: ["关键词:次数", ...]
+    """
+    total = func.sum(MonthlyKeywordCount.count)
+    query = (
+        select(KeywordTerm.word, total)
+        .join(KeywordTerm, KeywordTerm.id == MonthlyKeywordCount.keyword_id)
+        .where(
+            MonthlyKeywordCount.year == int(year),
+            MonthlyKeywordCount.month == int(month),
+            MonthlyKeywordCount.algorithm == algorithm
+        )
+        .group_by(KeywordTerm.id, KeywordTerm.word)
+        .order_by(total.desc())
+        .limit(top_k)
+    )
+    if category and category != "所有分区":
+        query = query.where(MonthlyKeywordCount.category == category.strip())
+    return [f"{word}:{int(count)}" for word, count in session.execute(query)]
+
+
+def find_postings(session, keyword, start_time=None, end_time=None):
+    """
+    通过倒排索引查询包含关键词的新闻，同一新闻有多个算法的结果时取最大权重
+    :param session: 数据库会话
+    :param keyword: 关键词（精确匹配）
+    :param start_time: 发布时间下界（包含），为空时不限
+    :param end_time: 发布时间上界（不包含），为空时不限
+    :return: [(新闻id, 发布时间, 权重), ...]，按发布时间排序
+    """
+    keyword_id = session.execute(select(KeywordTerm.id).where(KeywordTerm.word == keyword)).scalar()
+    if keyword_id is None:
+        return []
+    query = (
+        select(KeywordOccurrence.news_id, KeywordOccurrence.pub_time, func.max(KeywordOccurrence.weight))
+        .where(KeywordOccurrence.keyword_id == keyword_id, KeywordOccurrence.is_delete == 0)
+        .group_by(KeywordOccurrence.pub_time, KeywordOccurrence.news_id)
+        .order_by(KeywordOccurrence.pub_time, KeywordOccurrence.news_id)
+    )
+    if start_time is not None:
+        query = query.where(KeywordOccurrence.pub_time >= start_time)
+    if end_time is not None:
+        query = query.where(KeywordOccurrence.pub_time < end_time)
+    return session.execute(query).all()
+
+
+def find_news_ids(session, keyword, start_time=None, end_time=None):
+    """
+    通过倒排索引查询包含关键词的新闻 id
+    :return: 新闻 id 列表
+    """
+    return [news_id for news_id, _, _ in find_postings(session, keyword, start_time, end_time)]
+
+
+def find_live_keywords(session, start_time, end_time, max_occurrence_id=None):
+    """
+    查询一段时间内仍有未删除出现记录、且所在新闻未删除的关键词
+    :param start_time: 发布时间下界（包含）
+    :param end_time: 发布时间上界（不包含）
+    :param max_occurrence_id: 只看 id 不超过该值的出现记录，为空时不限
+    :return: 关键词集合
+    """
+    query = (
+        select(KeywordTerm.word).distinct()
+        .join(KeywordOccurrence, KeywordOccurrence.keyword_id == KeywordTerm.id)
+        .join(News, News.id == KeywordOccurrence.news_id)
+        .where(KeywordOccurrence.pub_time >= start_time, KeywordOccurrence.pub_time < end_time,
+               KeywordOccurrence.is_delete == 0, News.is_delete == 0)
+    )
+    if max_occurrence_id is not None:
+        query = query.where(KeywordOccurrence.id <= max_occurrence_id)
+    return set(session.execute(query).scalars().all())
+
+
+def backfill_month(session, year, month, algorithm=None):
+    """
+    将某月尚未规范化的 Keywords 文本解析进关键词出现表，并刷新月度汇总
+    :param session: 数据库会话
+    :param year: 年
+    :param month: 月
+    :param algorithm: 算法名称，为空时处理所有算法
+    :return: 解析的 Keywords 记录数
+    """
+    start_time, end_time = get_month_range(year, month)
+    existing = (
+        select(KeywordOccurrence.id)
+        .where(KeywordOccurrence.news_id == Keywords.news_id, KeywordOccurrence.algorithm == Keywords.algorithm)
+        .exists()
+    )
+    query = (
+        select(Keywords.news_id, Keywords.algorithm, Keywords.keywords)
+        .join(News, News.id == Keywords.news_id)
+        .where(
+            News.pub_time >= start_time,
+            News.pub_time < end_time,
+            Keywords.is_delete == 0,
+            ~existing
+        )
+    )
+    if algorithm:
+        query = query.where(Keywords.algorithm == algorithm)
+    rows = session.execute(query).all()
+    by_algorithm = {}
+    for news_id, row_algorithm, keywords in rows:
+        news_ids, all_keywords = by_algorithm.setdefault(row_algorithm, ([], []))
+        news_ids.append(news_id)
+        all_keywords.append(keywords.split(", ") if keywords else [])
+    for row_algorithm, (news_ids, all_keywords) in by_algorithm.items():
+        save_occurrences(session, news_ids, all_keywords, row_algorithm)
+    refresh_monthly_counts(session, year, month, algorithm)
+    return len(rows)
+
+
+def backfill_all(db):
+    """
+    将数据库中所有月份已有的 Keywords 文本解析进关键词出现表（升级后运行一次）
+    :param db: 数据库实例
+    """
+    with db.get_session() as session:
+        months = session.execute(
+            select(func.year(News.pub_time), func.month(News.pub_time))
+            .join(Keywords, Keywords.news_id == News.id)
+            .distinct()
+        ).all()
+    for year, month in sorted(months):
+        with db.get_session() as session:
+            count = backfill_month(session, year, month)
+            session.commit()
+        print(f"{year}-{month:02d} 解析了 {count} 条关键词记录")
+
+
+if __name__ == "__main__":
+    from Mysql.db_config import DB_PARAMS
+    from src.data_storage.database import Database
+
+    db = Database(DB_PARAMS)
+    # 创建尚不存在的关键词出现表、月度汇总表
+    db.create_tables()
+    backfill_all(db)
+    # 为所有月份生成倒排索引段文件
+    from src.data_storage.posting_index import default_posting_index
+    default_posting_index.build_all(db)
@@ -1,24 +1,36 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, TIMESTAMP, ForeignKey, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 
 Base = declarative_base()
+KEYWORD_COLLATION = 'utf8mb4_bin'
 
 class News(Base):
     __tablename__ = 'news'
+    __table_args__ = (
+        # 按月份范围查询（可带 is_delete 过滤）、最新发布时间
+        Index('ix_news_pub_time', 'pub_time', 'is_delete'),
+        # 按分区 + 月份范围查询
+        Index('ix_news_category_pub_time', 'category', 'pub_time'),
+    )
 
     id = Column(Integer, primary_key=True)
     url = Column(String(255))
     category = Column(String(255))
     title = Column(String(255))
     pub_time = Column(DateTime)
-    body = Column(Text)
+    # 正文只在访问时加载，需要正文的查询用 undefer(News.body) 一次性读取
+    body = deferred(Column(Text))
     created_at = Column(TIMESTAMP, default=func.now())
     is_delete = Column(Integer, default=0)
 
 class Keywords(Base):
     __tablename__ = 'keywords'
+    __table_args__ = (
+        # 新闻 -> 关键词（按算法）的连接与删除
+        Index('ix_keywords_news_id_algorithm', 'news_id', 'algorithm', 'is_delete'),
+    )
 
     id = Column(Integer, primary_key=True)
     news_id = Column(Integer, ForeignKey('news.id'))
@@ -31,6 +43,10 @@ class Keywords(Base):
 
 class Cloud(Base):
     __tablename__ = 'cloud'
+    __table_args__ = (
+        Index('ix_cloud_lookup', 'year', 'month', 'category', 'algorithm', 'keywords_num',
+              mysql_length={'category': 64, 'algorithm': 64}),
+    )
 
     id = Column(Integer, primary_key=True)
     year = Column(Integer)
@@ -44,6 +60,11 @@ class Cloud(Base):
 
 class Summary(Base):
     __tablename__ = 'summary'
+    __table_args__ = (
+        # 多个 varchar(255) 列超过 InnoDB 索引长度上限，只索引前缀
+        Index('ix_summary_lookup', 'year', 'month', 'category', 'keyword', 'algorithm', 'keywords_num',
+              mysql_length={'category': 64, 'keyword': 64, 'algorithm': 64}),
+    )
 
     id = Column(Integer, primary_key=True)
     year = Column(Integer)
@@ -55,3 +76,43 @@ class Summary(Base):
     summary = Column(Text)
     created_at = Column(TIMESTAMP, default=func.now())
     is_delete = Column(Integer, default=0)
+
+class KeywordTerm(Base):
+    __tablename__ = 'keyword_term'
+
+    id = Column(Integer, primary_key=True)
+    # 二进制排序规则：默认排序规则不区分大小写与重音，"AI" 与 "ai" 会被当作同一个关键词
+    word = Column(String(255, collation=KEYWORD_COLLATION), unique=True)
+    created_at = Column(TIMESTAMP, default=func.now())
+
+class KeywordOccurrence(Base):
+    __tablename__ = 'keyword_occurrence'
+    __table_args__ = (
+        # 倒排索引：关键词 -> (新闻发布时间, 新闻id, 权重) 的有序列表
+        Index('ix_keyword_occurrence_posting', 'keyword_id', 'pub_time', 'news_id', 'weight'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    news_id = Column(Integer, ForeignKey('news.id'), index=True)
+    keyword_id = Column(Integer, ForeignKey('keyword_term.id'))
+    pub_time = Column(DateTime)
+    weight = Column(Float)
+    algorithm = Column(String(255))
+    created_at = Column(TIMESTAMP, default=func.now())
+    is_delete = Column(Integer, default=0)
+    keyword = relationship("KeywordTerm")
+
+class MonthlyKeywordCount(Base):
+    __tablename__ = 'monthly_keyword_count'
+    __table_args__ = (
+        Index('ix_monthly_keyword_count_month', 'year', 'month', 'algorithm', 'category', 'count'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    year = Column(Integer)
+    month = Column(Integer)
+    category = Column(String(255))
+    algorithm = Column(String(255))
+    keyword_id = Column(Integer, ForeignKey('keyword_term.id'))
+    count = Column(Integer)
+    keyword = relationship("KeywordTerm")
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 18:20
+@Auth: Zhang Hongxing
+@File: partitioning.py
+@Note: 新闻表与关键词出现表按发布时间月份做 RANGE 分区，按月查询只访问一个分区，清理数据时直接删除分区
+"""
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import text
+
+# 按 pub_time 分区的表
+PARTITIONED_TABLES = ('news', 'keyword_occurrence')
+# 兜底分区，新月份的分区从中拆分出来
+MAX_PARTITION = 'pmax'
+# 第一个按月分区之前的所有数据（包括回填为 1970-01-01 的空发布时间），清理月份时不会删除
+OLD_PARTITION = 'p_old'
+
+# 分区键不能为 NULL，分区前先回填
+FILL_NULL_PUB_TIME = {
+    'news': "UPDATE news SET pub_time = COALESCE(created_at, '1970-01-01') WHERE pub_time IS NULL",
+    'keyword_occurrence': (
+        "UPDATE keyword_occurrence o LEFT JOIN news n ON n.id = o.news_id "
+        "SET o.pub_time = COALESCE(n.pub_time, o.created_at, '1970-01-01') WHERE o.pub_time IS NULL"
+    ),
+}
+
+
+def month_start(time):
+    return datetime(time.year, time.month, 1)
+
+
+def partition_name(month):
+    return f"p{month.year}{month.month:02d}"
+
+
+def iter_months(first_month, last_month):
+    month = month_start(first_month)
+    while month <= month_start(last_month):
+        yield month
+        month += relativedelta(months=1)
+
+
+def month_partition_definition(month):
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{month + relativedelta(months=1):%Y-%m-%d}')"
+
+
+def old_partition_definition(first_month):
+    return f"PARTITION {OLD_PARTITION} VALUES LESS THAN ('{month_start(first_month):%Y-%m-%d}')"
+
+
+def max_partition_definition():
+    return f"PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE)"
+
+
+def partition_definitions(months):
+    """
+    :param months: 每个分区对应月份的第一天
+    :return: 分区定义列表，第一个为更早数据的分区，最后一个为兜底分区
+    """
+    months = list(months)
+    definitions = [old_partition_definition(months[0])]
+    definitions += [month_partition_definition(month) for month in months]
+    definitions.append(max_partition_definition())
+    return definitions
+
+
+def get_monthly_partitions(partitions):
+    """
+    :return: 按月分区的分区名列表，不含更早数据的分区与兜底分区
+    """
+    return [name for name in partitions if name not in (OLD_PARTITION, MAX_PARTITION)]
+
+
+def get_partitions(conn, table):
+    """
+    :return: 表的分区名列表（按分区顺序），未分区时为空列表
+    """
+    rows = conn.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {"table": table})
+    return [name for name, in rows]
+
+
+def drop_foreign_keys(conn, table):
+    """
+    InnoDB 分区表不支持外键，删除表上以及引用该表的外键
+    """
+    rows = conn.execute(text(
+        "SELECT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND (TABLE_NAME = :table OR REFERENCED_TABLE_NAME = :table)"
+    ), {"table": table}).all()
+    for owner, constraint in rows:
+        print(f"删除外键 {owner}.{constraint}")
+        conn.execute(text(f"ALTER TABLE {owner} DROP FOREIGN KEY {constraint}"))
+
+
+def partition_table(conn, table, first_month, last_month):
+    """
+    将已有的表改为按 pub_time 月份分区：pub_time 改为非空并加入主键，再按月份 RANGE COLUMNS 分区
+    :param conn: 数据库连接
+    :param table: 表名
+    :param first_month: 第一个按月分区的月份，更早的数据落在 OLD_PARTITION
+    :param last_month: 最后一个按月分区的月份，更晚的数据落在兜底分区
+    """
+    partitions = get_partitions(conn, table)
+    if partitions:
+        split_old_partition(conn, table, partitions)
+        return
+    drop_foreign_keys(conn, table)
+    conn.execute(text(FILL_NULL_PUB_TIME[table]))
+    # 分区键必须是每个唯一键（包括主键）的一部分
+    conn.execute(text(
+        f"ALTER TABLE {table} MODIFY pub_time DATETIME NOT NULL, "
+        f"DROP PRIMARY KEY, ADD PRIMARY KEY (id, pub_time)"
+    ))
+    definitions = partition_definitions(iter_months(first_month, last_month))
+    print(f"{table} 按月分区，共 {len(definitions)} 个分区")
+    conn.execute(text(
+        f"ALTER TABLE {table} PARTITION BY RANGE COLUMNS(pub_time) ({', '.join(definitions)})"
+    ))
+
+
+def split_old_partition(conn, table, partitions):
+    """
+    早期的分区方式没有 OLD_PARTITION，更早的数据落在第一个按月分区中，清理该月会一并删除。
+    将第一个按月分区拆分为 OLD_PARTITION 与该月分区
+    """
+    monthly = get_monthly_partitions(partitions)
+    if OLD_PARTITION in partitions or not monthly:
+        print(f"{table} 已经分区，跳过")
+        return
+    first_month = datetime.strptime(monthly[0], "p%Y%m")
+    print(f"{table} 从 {monthly[0]} 中拆分出 {OLD_PARTITION}")
+    conn.execute(text(
+        f"ALTER TABLE {table} REORGANIZE PARTITION {monthly[0]} INTO "
+        f"({old_partition_definition(first_month)}, {month_partition_definition(first_month)})"
+    ))
+
+
+def partition_tables(engine, first_month=None, last_month=None):
+    """
+    对 PARTITIONED_TABLES 中的表按月分区，可重复执行
+    :param engine: 数据库引擎
+    :param first_month: 第一个分区的月份，默认为最早的新闻月份
+    :param last_month: 最后一个按月分区的月份，默认为下个月
+    """
+    with engine.begin() as conn:
+        if first_month is None:
+            first_month = conn.execute(text("SELECT MIN(pub_time) FROM news")).scalar() or datetime.now()
+        if last_month is None:
+            last_month = datetime.now() + relativedelta(months=1)
+        for table in PARTITIONED_TABLES:
+            partition_table(conn, table, first_month, last_month)
+
+
+def ensure_partitions(engine, until):
+    """
+    从兜底分区中拆分出直到 until 所在月份的分区，新抓取的新闻写入前调用；表未分区时不做任何事
+    :param engine: 数据库引擎
+    :param until: 需要有独立分区的最晚时间
+    """
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            partitions = get_partitions(conn, table)
+            monthly = get_monthly_partitions(partitions)
+            if not monthly:
+                continue
+            last_month = datetime.strptime(monthly[-1], "p%Y%m")
+            new_months = list(iter_months(last_month + relativedelta(months=1), until))
+            if not new_months:
+                continue
+            print(f"{table} 新增分区: {', '.join(partition_name(month) for month in new_months)}")
+            definitions = [month_partition_definition(month) for month in new_months]
+            definitions.append(max_partition_definition())
+            conn.execute(text(
+                f"ALTER TABLE {table} REORGANIZE PARTITION {MAX_PARTITION} INTO ({', '.join(definitions)})"
+            ))
+
+
+def drop_month_partitions(engine, year, month):
+    """
+    直接删除某月的分区以清理该月的新闻与关键词出现记录，比逐行删除快得多。
+    Keywords 文本表与月度汇总表未分区，其中该月的数据先按条件删除。
+    OLD_PARTITION 中是更早的全部数据，不会被删除；还没有拆分出 OLD_PARTITION 的表拒绝清理
+    :return: 是否删除了分区
+    """
+    month = datetime(int(year), int(month), 1)
+    name = partition_name(month)
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            partitions = get_partitions(conn, table)
+            if partitions and OLD_PARTITION not in partitions:
+                print(f"{table} 的第一个按月分区中还有更早的数据，请先执行 migrate 拆分出 {OLD_PARTITION}")
+                return False
+        if name not in get_monthly_partitions(get_partitions(conn, 'news')):
+            print(f"news 没有分区 {name}")
+            return False
+        conn.execute(text(
+            "DELETE k FROM keywords k JOIN news n ON n.id = k.news_id "
+            "WHERE n.pub_time >= :start_time AND n.pub_time < :end_time"
+        ), {"start_time": month, "end_time": month + relativedelta(months=1)})
+        conn.execute(text("DELETE FROM monthly_keyword_count WHERE year = :year AND month = :month"),
+                     {"year": month.year, "month": month.month})
+        for table in PARTITIONED_TABLES:
+            if name in get_partitions(conn, table):
+                conn.execute(text(f"ALTER TABLE {table} DROP PARTITION {name}"))
+                print(f"{table} 已删除分区 {name}")
+    return True
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 16:20
+@Auth: Zhang Hongxing
+@File: posting_index.py
+@Note: 按月分段的只读倒排索引文件，通过 mmap 零拷贝读取“关键词 -> 新闻”的倒排列表
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+from sqlalchemy import select, func
+
+from src.data_storage.keyword_store import get_month_range
+from src.data_storage.models import News, KeywordTerm, KeywordOccurrence, MonthlyKeywordCount
+
+POSTING_INDEX_DIR = './utils/posting_index'
+SEGMENT_MAGIC = b'MKPI'
+SEGMENT_VERSION = 2
+# 段文件头：魔数、格式版本、关键词数、倒排记录数、建段时数据库中该月数据的版本
+SEGMENT_HEADER = struct.Struct('<4sIIIq')
+# 两次比较段与数据库版本的最小间隔（秒）
+DEFAULT_CHECK_INTERVAL = 30
+
+
+def get_month_version(session, year, month):
+    """
+    数据库中某月倒排数据的版本。关键词提取、删除与回填都会按月重算月度汇总表，重算后行 id 随之增长，
+    因此该月汇总行的最大 id 可以判断段文件是否落后于数据库；走 (year, month) 索引，查询代价很小
+    :return: 版本号，该月没有汇总数据时为 0
+    """
+    return session.execute(
+        select(func.max(MonthlyKeywordCount.id))
+        .where(MonthlyKeywordCount.year == int(year), MonthlyKeywordCount.month == int(month))
+    ).scalar() or 0
+
+
+def write_segment(path, postings, data_version=0):
+    """
+    写入一个月的段文件。布局（均为小端、4 字节对齐）：
+    文件头 | 关键词id int32[T] | 词偏移 uint32[T+1] | 倒排偏移 uint32[T+1]
+    | 新闻id差值 uint32[P] | 权重 float32[P] | UTF-8 关键词
+    :param path: 段文件路径
+    :param postings: [(关键词, 关键词id, 新闻id, 权重), ...]
+    :param data_version: 读取 postings 前数据库中该月数据的版本（见 get_month_version）
+    """
+    # 关键词按 UTF-8 字节序排序以便二分查找，同一关键词内按新闻 id 升序以便差值编码
+    postings = sorted(postings, key=lambda p: (p[0].encode('utf-8'), p[2]))
+    words = []
+    keyword_ids = []
+    posting_offsets = []
+    for i, (word, keyword_id, _, _) in enumerate(postings):
+        if not words or words[-1] != word:
+            words.append(word)
+            keyword_ids.append(keyword_id)
+            posting_offsets.append(i)
+    posting_offsets.append(len(postings))
+    encoded_words = [word.encode('utf-8') for word in words]
+    term_offsets = np.zeros(len(words) + 1, dtype='<u4')
+    term_offsets[1:] = np.cumsum([len(word) for word in encoded_words], dtype=np.int64)
+
+    news_ids = np.fromiter((p[2] for p in postings), dtype=np.int64, count=len(postings))
+    deltas = news_ids.copy()
+    # 每个关键词的第一个新闻 id 存原值，之后存与前一个的差值
+    deltas[1:] -= news_ids[:-1]
+    starts = np.asarray(posting_offsets[:-1], dtype=np.int64)
+    deltas[starts] = news_ids[starts]
+    weights = np.fromiter((p[3] or 0.0 for p in postings), dtype='<f4', count=len(postings))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, len(words), len(postings), data_version))
+        f.write(np.asarray(keyword_ids, dtype='<i4').tobytes())
+        f.write(term_offsets.tobytes())
+        f.write(np.asarray(posting_offsets, dtype='<u4').tobytes())
+        f.write(deltas.astype('<u4').tobytes())
+        f.write(weights.tobytes())
+        f.write(b''.join(encoded_words))
+    # 先写临时文件再替换，读者不会看到写了一半的段
+    os.replace(tmp_path, path)
+
+
+class _Terms:
+    """
+    段内关键词的只读序列，供 bisect 二分查找，只解码被访问到的关键词
+    """
+
+    def __init__(self, buffer, term_offsets, base):
+        self.buffer = buffer
+        self.term_offsets = term_offsets
+        self.base = base
+
+    def __len__(self):
+        return len(self.term_offsets) - 1
+
+    def __getitem__(self, i):
+        return self.buffer[self.base + int(self.term_offsets[i]):self.base + int(self.term_offsets[i + 1])]
+
+
+class PostingSegment:
+    def __init__(self, path):
+        """
+        以 mmap 方式打开一个月的段文件，数组均为映射内存上的视图，不复制数据
+        :param path: 段文件路径
+        """
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mmap) < SEGMENT_HEADER.size:
+            self.mmap.close()
+            raise ValueError(f"无法识别的倒排索引段文件: {path}")
+        magic, version, num_terms, num_postings, self.data_version = SEGMENT_HEADER.unpack_from(self.mmap, 0)
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            self.mmap.close()
+            raise ValueError(f"无法识别的倒排索引段文件: {path}")
+        offset = SEGMENT_HEADER.size
+        self.keyword_ids = np.frombuffer(self.mmap, dtype='<i4', count=num_terms, offset=offset)
+        offset += num_terms * 4
+        self.term_offsets = np.frombuffer(self.mmap, dtype='<u4', count=num_terms + 1, offset=offset)
+        offset += (num_terms + 1) * 4
+        self.posting_offsets = np.frombuffer(self.mmap, dtype='<u4', count=num_terms + 1, offset=offset)
+        offset += (num_terms + 1) * 4
+        self.deltas = np.frombuffer(self.mmap, dtype='<u4', count=num_postings, offset=offset)
+        offset += num_postings * 4
+        self.weights = np.frombuffer(self.mmap, dtype='<f4', count=num_postings, offset=offset)
+        offset += num_postings * 4
+        self.terms = _Terms(self.mmap, self.term_offsets, offset)
+
+    def find(self, keyword):
+        """
+        查询关键词的倒排列表
+        :param keyword: 关键词
+        :return: (新闻id数组, 权重数组)，按新闻 id 升序；关键词不存在时为空数组
+        """
+        encoded = keyword.encode('utf-8')
+        i = bisect_left(self.terms, encoded)
+        if i >= len(self.terms) or self.terms[i] != encoded:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        start, end = int(self.posting_offsets[i]), int(self.posting_offsets[i + 1])
+        news_ids = np.cumsum(self.deltas[start:end], dtype=np.int64)
+        return news_ids, self.weights[start:end]
+
+    def close(self):
+        # 先释放对映射内存的引用，mmap 才能关闭
+        self.keyword_ids = self.term_offsets = self.posting_offsets = self.deltas = self.weights = None
+        self.terms = None
+        self.mmap.close()
+
+
+class PostingIndex:
+    def __init__(self, index_dir=POSTING_INDEX_DIR, check_interval=DEFAULT_CHECK_INTERVAL):
+        """
+        按月分段的倒排索引：每个月一个段文件，由关键词提取与删除流程重建；
+        段文件是每台机器本地的，其他机器写入数据库后，查询时按版本发现并重建
+        :param index_dir: 段文件目录
+        :param check_interval: 两次比较段与数据库版本的最小间隔（秒）
+        """
+        self.index_dir = index_dir
+        self.check_interval = check_interval
+        self.segments = {}
+        # 段文件路径 -> 上次与数据库比较版本的时间
+        self.checked_at = {}
+        self.lock = threading.Lock()
+
+    def _get_segment_path(self, year, month):
+        return os.path.join(self.index_dir, f"{int(year)}-{int(month):02d}.seg")
+
+    def _close_segment(self, path):
+        segment = self.segments.pop(path, None)
+        if segment:
+            try:
+                segment.close()
+            except BufferError:
+                # 仍有调用方持有视图，交给垃圾回收关闭
+                pass
+
+    def get_segment(self, year, month):
+        """
+        获取某月的段，段文件被重建后自动重新映射
+        :return: PostingSegment，段文件不存在或是旧格式时返回 None
+        """
+        path = self._get_segment_path(year, month)
+        with self.lock:
+            if not os.path.exists(path):
+                self._close_segment(path)
+                return None
+            segment = self.segments.get(path)
+            if segment is None or segment.mtime != os.path.getmtime(path):
+                self._close_segment(path)
+                try:
+                    segment = PostingSegment(path)
+                except ValueError as e:
+                    print(e)
+                    return None
+                self.segments[path] = segment
+            return segment
+
+    def get_fresh_segment(self, session, year, month):
+        """
+        获取与数据库一致的段：每隔 check_interval 秒比较一次段文件头中的版本与数据库中的版本，
+        段落后于数据库或是旧格式时重建
+        :return: PostingSegment，该月还没有段文件时返回 None
+        """
+        path = self._get_segment_path(year, month)
+        if not os.path.exists(path):
+            return None
+        now = time.time()
+        if now - self.checked_at.get(path, 0) < self.check_interval:
+            segment = self.get_segment(year, month)
+            if segment is not None:
+                return segment
+        # 先记录检查时间，重建期间其他线程继续使用现有的段
+        self.checked_at[path] = now
+        segment = self.get_segment(year, month)
+        if segment is not None and segment.data_version == get_month_version(session, year, month):
+            return segment
+        print(f"{int(year)}-{int(month):02d} 倒排索引段落后于数据库，开始重建")
+        self.build_month(session, year, month)
+        return self.get_segment(year, month)
+
+    def lookup(self, year, month, keyword, session=None):
+        """
+        查询某月包含关键词的新闻，按权重降序
+        :param year: 年
+        :param month: 月
+        :param keyword: 关键词
+        :param session: 数据库会话，提供时先确认段与数据库一致（见 get_fresh_segment）
+        :return: (新闻id数组, 权重数组)；该月还没有段文件时返回 None，由调用方回退到数据库
+        """
+        if session is not None:
+            segment = self.get_fresh_segment(session, year, month)
+        else:
+            segment = self.get_segment(year, month)
+        if segment is None:
+            return None
+        news_ids, weights = segment.find(keyword)
+        order = np.argsort(-weights, kind='stable')
+        return news_ids[order], weights[order]
+
+    def build_month(self, session, year, month):
+        """
+        根据关键词出现表重建某月的段文件，同一新闻有多个算法的结果时取最大权重
+        :param session: 数据库会话
+        :param year: 年
+        :param month: 月
+        :return: 写入的倒排记录数
+        """
+        start_time, end_time = get_month_range(year, month)
+        # 先读版本再读数据，读取期间有新的写入时下次检查仍会发现
+        data_version = get_month_version(session, year, month)
+        rows = session.execute(
+            select(KeywordTerm.word, KeywordOccurrence.keyword_id, KeywordOccurrence.news_id,
+                   func.max(KeywordOccurrence.weight))
+            .join(KeywordTerm, KeywordTerm.id == KeywordOccurrence.keyword_id)
+            .join(News, News.id == KeywordOccurrence.news_id)
+            .where(
+                KeywordOccurrence.pub_time >= start_time,
+                KeywordOccurrence.pub_time < end_time,
+                KeywordOccurrence.is_delete == 0,
+                News.is_delete == 0
+            )
+            .group_by(KeywordOccurrence.keyword_id, KeywordTerm.word, KeywordOccurrence.news_id)
+        ).all()
+        if not os.path.exists(self.index_dir):
+            os.makedirs(self.index_dir)
+        path = self._get_segment_path(year, month)
+        with self.lock:
+            # Windows 下被映射的文件不能替换，先关闭本进程的映射
+            self._close_segment(path)
+            write_segment(path, rows, data_version)
+        self.checked_at[path] = time.time()
+        print(f"{int(year)}-{int(month):02d} 倒排索引重建完成，共 {len(rows)} 条记录")
+        return len(rows)
+
+    def build_all(self, db):
+        """
+        为关键词出现表中的所有月份重建段文件
+        :param db: 数据库实例
+        """
+        with db.get_session() as session:
+            months = session.execute(
+                select(func.year(KeywordOccurrence.pub_time), func.month(KeywordOccurrence.pub_time))
+                .where(KeywordOccurrence.pub_time.isnot(None))
+                .distinct()
+            ).all()
+            for year, month in sorted(months):
+                self.build_month(session, year, month)
+
+
+# 进程内共享同一组映射，重建时才能先关闭旧映射
+default_posting_index = PostingIndex()
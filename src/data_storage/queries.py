@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 17:10
+@Auth: Zhang Hongxing
+@File: queries.py
+@Note: 可复用的按列投影查询与批量软删除语句，列表类查询不读取新闻正文
+"""
+from sqlalchemy import select, update, func
+
+from src.data_storage.models import News, Keywords, KeywordOccurrence, Cloud, Summary
+
+
+def news_months_query():
+    """
+    数据库中存在新闻的月份，由数据库完成去重
+    :return: select 语句，每行为 (年, 月)
+    """
+    return (
+        select(func.year(News.pub_time), func.month(News.pub_time))
+        .where(News.pub_time.isnot(None))
+        .distinct()
+    )
+
+
+def last_pub_time_query():
+    """
+    最新一条新闻的发布时间
+    :return: select 语句
+    """
+    return select(func.max(News.pub_time))
+
+
+def news_in_range_query(start_time, end_time, category=None, columns=(News.id,), include_deleted=False):
+    """
+    某时间范围内的新闻
+    :param start_time: 发布时间下界（包含）
+    :param end_time: 发布时间上界（不包含）
+    :param category: 分区，"所有分区" 或为空时不限
+    :param columns: 查询的列
+    :param include_deleted: 是否包含已删除的新闻
+    :return: select 语句
+    """
+    query = select(*columns).where(News.pub_time >= start_time, News.pub_time < end_time)
+    if not include_deleted:
+        query = query.where(News.is_delete == 0)
+    if category and category != "所有分区":
+        query = query.where(News.category == category.strip())
+    return query
+
+
+def news_page_query(news_ids, limit=50, summary_length=None, time_range=None):
+    """
+    按 (发布时间, id) 倒序读取一页新闻，页内的新闻 id 由缓存的候选列表确定
+    :param news_ids: 本页的新闻 id 列表
+    :param limit: 最多返回的条数
+    :param summary_length: 不为空时额外查询正文前 summary_length 个字符，列名为 body_prefix
+    :param time_range: 候选新闻所在的 (开始时间, 结束时间)，给出时新闻表按月分区后只访问对应分区
+    :return: select 语句
+    """
+    columns = [News.id, News.title, News.url, News.pub_time, News.category]
+    if summary_length:
+        columns.append(func.substr(News.body, 1, summary_length).label("body_prefix"))
+    query = select(*columns).where(News.id.in_(news_ids), News.is_delete == 0)
+    if time_range:
+        query = query.where(News.pub_time >= time_range[0], News.pub_time < time_range[1])
+    return query.order_by(News.pub_time.desc(), News.id.desc()).limit(limit)
+
+
+def get_keyword_names(session, news_ids, top_k=10):
+    """
+    读取新闻的前 top_k 个关键词（每篇新闻取最早写入的一条关键词记录）
+    :param session: 数据库会话
+    :param news_ids: 新闻 id 列表
+    :param top_k: 每篇新闻的关键词个数
+    :return: {新闻id: "关键词, 关键词, ..."}
+    """
+    if not news_ids:
+        return {}
+    rows = session.execute(
+        select(Keywords.news_id, Keywords.keywords)
+        .where(Keywords.news_id.in_(news_ids), Keywords.is_delete == 0)
+        .order_by(Keywords.id)
+    )
+    keyword_names = {}
+    for news_id, keywords in rows:
+        if news_id not in keyword_names and keywords:
+            keyword_names[news_id] = ", ".join(item.split(':')[0].strip() for item in keywords.split(',')[:top_k])
+    return keyword_names
+
+
+def count_query(query):
+    """
+    统计查询结果的条数，不读取任何列
+    :return: select 语句
+    """
+    return select(func.count()).select_from(query.order_by(None).limit(None).subquery())
+
+
+def soft_delete_news(session, start_time, end_time, category=None, news_ids=None):
+    """
+    批量将新闻标记为删除，单条 UPDATE 完成，不加载新闻
+    :param news_ids: 不为空时只删除这些新闻
+    :return: 标记的新闻条数
+    """
+    stmt = update(News).where(News.pub_time >= start_time, News.pub_time < end_time, News.is_delete == 0)
+    if category:
+        stmt = stmt.where(News.category == category)
+    if news_ids is not None:
+        stmt = stmt.where(News.id.in_(news_ids))
+    return session.execute(stmt.values(is_delete=1).execution_options(synchronize_session=False)).rowcount
+
+
+def soft_delete_keywords(session, news_ids):
+    """
+    批量将新闻的关键词文本与关键词出现记录标记为删除
+    :return: 标记的 Keywords 记录条数
+    """
+    count = session.execute(
+        update(Keywords)
+        .where(Keywords.news_id.in_(news_ids), Keywords.is_delete == 0)
+        .values(is_delete=1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.execute(
+        update(KeywordOccurrence)
+        .where(KeywordOccurrence.news_id.in_(news_ids), KeywordOccurrence.is_delete == 0)
+        .values(is_delete=1)
+        .execution_options(synchronize_session=False)
+    )
+    return count
+
+
+def soft_delete_cloud(session, year, month, category, keywords_num, algorithm):
+    """
+    :return: 标记的词云记录条数
+    """
+    return session.execute(
+        update(Cloud)
+        .where(Cloud.year == year, Cloud.month == month, Cloud.category == category,
+               Cloud.keywords_num == keywords_num, Cloud.algorithm == algorithm, Cloud.is_delete == 0)
+        .values(is_delete=1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def soft_delete_summary(session, year, month, category, keywords_num, keyword, algorithm):
+    """
+    :return: 标记的摘要记录条数
+    """
+    return session.execute(
+        update(Summary)
+        .where(Summary.year == year, Summary.month == month, Summary.category == category,
+               Summary.keywords_num == keywords_num, Summary.keyword == keyword,
+               Summary.algorithm == algorithm, Summary.is_delete == 0)
+        .values(is_delete=1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
@@ -7,10 +7,10 @@
 """
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import desc
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
-from ..data_storage.models import News
+from ..data_storage.partitioning import ensure_partitions
+from ..data_storage.queries import news_months_query, last_pub_time_query
 from scrapy_project.spiders.news_spider import NewsSpider
 
 
@@ -21,27 +21,55 @@ class CrawlService:
     def get_existing_times(self):
         try:
             with self.db.get_session() as session:
-                existing_times = session.query(News.pub_time).distinct().all()
-                unique_times = set(time.strftime("%Y-%m") for time, in existing_times)
-                return sorted(list(unique_times), reverse=True)
+                # 由数据库按月去重，不再读取每条新闻的发布时间
+                months = session.execute(news_months_query()).all()
+                return [f"{year}-{month:02d}" for year, month in sorted(months, reverse=True)]
+        except Exception as e:
+            print(f"Error during database connection: {e}")
+            return []
+
+    async def get_existing_times_async(self):
+        try:
+            async with self.db.get_async_database().get_session() as session:
+                months = (await session.execute(news_months_query())).all()
+                return [f"{year}-{month:02d}" for year, month in sorted(months, reverse=True)]
         except Exception as e:
             print(f"Error during database connection: {e}")
             return []
 
     def get_last_record_pub_time(self):
-        default_pub_time = datetime.now() - relativedelta(months=1)
-        default_pub_time = default_pub_time.replace(year=2021, month=1, day=1)
+        default_pub_time = self._get_default_pub_time()
         try:
             with self.db.get_session() as session:
-                last_record = session.query(News).order_by(desc(News.pub_time)).first()
-                print(f"最新的一条新闻时间为: {last_record.pub_time}")
-                return last_record.pub_time if last_record else default_pub_time
+                last_pub_time = session.execute(last_pub_time_query()).scalar()
+                print(f"最新的一条新闻时间为: {last_pub_time}")
+                return last_pub_time if last_pub_time else default_pub_time
         except Exception as e:
             print(f"Error during database connection: {e}")
             return default_pub_time
 
+    async def get_last_record_pub_time_async(self):
+        default_pub_time = self._get_default_pub_time()
+        try:
+            async with self.db.get_async_database().get_session() as session:
+                last_pub_time = (await session.execute(last_pub_time_query())).scalar()
+                print(f"最新的一条新闻时间为: {last_pub_time}")
+                return last_pub_time if last_pub_time else default_pub_time
+        except Exception as e:
+            print(f"Error during database connection: {e}")
+            return default_pub_time
+
+    def _get_default_pub_time(self):
+        default_pub_time = datetime.now() - relativedelta(months=1)
+        return default_pub_time.replace(year=2021, month=1, day=1)
+
     def start_crawler(self, new_start_time, new_end_time):
+        """
+        启动爬虫。Scrapy 的 reactor 只能在主线程中运行，因此没有异步版本
+        """
         try:
+            # 新闻表按月分区时，先为抓取范围内的月份建好分区
+            ensure_partitions(self.db.engine, new_end_time)
             process = CrawlerProcess(get_project_settings())
             spider_args = {'new_start_time': new_start_time, 'new_end_time': new_end_time}
             process.crawl(NewsSpider, **spider_args)
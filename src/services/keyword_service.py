@@ -1,38 +1,60 @@
+import asyncio
 import random
 
 import redis
 import json
 from datetime import datetime
+from types import SimpleNamespace
 from dateutil.relativedelta import relativedelta
-from sqlalchemy.orm import joinedload
+from sqlalchemy import func
+from sqlalchemy.orm import undefer
 
-from Redis.redis_config import get_redis_cluster_client
+from Redis.near_cache import get_two_tier_cache
 from ..text_processing.keyword_extraction import (
-    tfidf_extract_keywords,
+    tfidf_extract_keywords_all,
     remove_rubbish_words,
-    get_mon_keywords_with_count_list, jieba_tfidf_extract_keywords, pagerank_extract_keywords, lda_extract_keywords
+    get_mon_keywords_with_count_list,
+    batch_tokenize,
+    jieba_tfidf_extract_keywords_from_tokens,
+    pagerank_extract_keywords_from_tokens,
+    lda_extract_keywords_by_corpus,
+    get_corpus_version
 )
+from ..text_processing.doc_freq_store import DocFreqStore
+from ..text_processing.token_store import TokenStore, cut_tokenize, posseg_tokenize
+from ..data_storage.keyword_store import save_keywords, get_top_keywords, backfill_month
 from ..data_storage.models import News, Keywords
+from ..data_storage.posting_index import default_posting_index
 
 
 class KeywordService:
-    def __init__(self, db):
+    def __init__(self, db, bloom_filter=None):
+        """
+        :param db: 数据库实例
+        :param bloom_filter: 新闻键的布隆过滤器，提取出新关键词后立即加入，使其新闻可以马上查询
+        """
         self.db = db
-        self.redis_client = get_redis_cluster_client()
+        self.bloom_filter = bloom_filter
+        self.cache = get_two_tier_cache()
+        self.doc_freq_store = DocFreqStore()
+        self.body_token_store = TokenStore(field='body', tokenizer='posseg')
+        # jieba 的 extract_tags 按 jieba.cut 统计词频，与带词性的分词结果不完全一致
+        self.body_cut_token_store = TokenStore(field='body', tokenizer='cut')
+        self.title_token_store = TokenStore(field='title', tokenizer='cut')
 
     def fetch_keywords_by_time(self, selected_month, selected_category, keywords_num=50, algorithm="tf-idf"):
+        """
+        获取某月的关键词统计
+        :return: (本次新提取的 "关键词:权重" 列表，未重新提取时为空, 出现次数最多的 "关键词:次数" 列表)
+        """
         print(f"选择的算法是: {algorithm}")
         cache_key = f"keywords:{selected_month[:4]}:{selected_month[5:7]}:{algorithm}:{keywords_num}"
         print(f"关键词缓存键: {cache_key}")
         # 检查缓存
-        cached_data = self.redis_client.get(cache_key)
+        cached_data = self.cache.get(cache_key)
         if cached_data:
             # print(f"-----从缓存中获取关键词数据-----")
-            cached_result = json.loads(cached_data)
-            mon_keywords_list_with_weight = cached_result['keywords_with_weight']
-            mon_keywords_list_with_count = get_mon_keywords_with_count_list(cached_result['keywords_with_weight'],
-                                                                            keywords_num)
-            return mon_keywords_list_with_weight, mon_keywords_list_with_count
+            return self._parse_cached_keywords(cached_data, keywords_num)
         print(f"-----缓存未命中，开始从数据库查询并计算关键词------")
 
         try:
@@ -40,38 +62,20 @@ class KeywordService:
                 # 计算时间范围
                 start_time = datetime.strptime(selected_month, "%Y-%m")
                 end_time = start_time + relativedelta(months=1)
-                last_day_of_month = end_time - relativedelta(days=1)
-                # 查询符合条件的关键词数据
-                query = session.query(Keywords).join(News, News.id == Keywords.news_id).filter(
-                    News.pub_time >= start_time,
-                    News.pub_time < end_time,
-                    News.is_delete == 0,
-                    Keywords.created_at >= last_day_of_month,
-                    Keywords.is_delete == 0
-                )
-                if selected_category and selected_category != "所有分区":
-                    query = query.filter(News.category.ilike(selected_category.strip()))
-                existing_keywords = query.all()
-
-                if existing_keywords and len(existing_keywords) > keywords_num:
-                    print(
-                        f"找到数据库中已存在的关键词数据，且数据量{len(existing_keywords)}大于{keywords_num}，直接返回数据")
+                mon_keywords_list_with_count = self._get_existing_keywords(session, start_time, selected_category,
+                                                                           algorithm, keywords_num)
+                if mon_keywords_list_with_count is not None:
                     mon_keywords_list_with_weight = []
-                    for keyword_entry in existing_keywords:
-                        mon_keywords_list_with_weight.extend(keyword_entry.keywords.split(", "))
-                    mon_keywords_list_with_count = get_mon_keywords_with_count_list(mon_keywords_list_with_weight,
-                                                                                    keywords_num)
                 else:
-                    print(
-                        f"找不到数据库中已存在的关键词数据，或数据量{len(existing_keywords)}小于{keywords_num}，重新提取关键词")
+                    print(f"找不到数据库中已存在的关键词数据，或数据量小于{keywords_num}，重新提取关键词")
                     # 尝试从缓存中获取新闻数据
                     print(selected_category)
                     news_cache_key = f"news:{selected_month[:4]}:{selected_month[5:7]}:{selected_category}"
                     print(f"新闻缓存键: {news_cache_key}")
-                    news_cached_data = self.redis_client.get(news_cache_key)
+                    news_cached_data = self.cache.get(news_cache_key)
                     if news_cached_data:
                         print(f"-----从缓存中获取新闻数据-----")
-                        news_in_selected_month = json.loads(news_cached_data)
+                        news_in_selected_month = [SimpleNamespace(**news) for news in json.loads(news_cached_data)]
                     else:
                         query = session.query(News).filter(
                             News.pub_time >= start_time,
@@ -80,9 +84,8 @@ class KeywordService:
                         )
                         if selected_category and selected_category != "所有分区":
                             query = query.filter(News.category == selected_category)
-                        mon_keywords_list_with_weight = []
-                        idx = 0
-                        news_in_selected_month = query.options(joinedload(News.keywords)).all()
+                        # 提取关键词需要正文，这里一次性读取，不加载关键词文本
+                        news_in_selected_month = query.options(undefer(News.body)).all()
                         # 将新闻数据转换为符合格式并写入缓存
                         news_data = [
                             {
@@ -98,46 +101,132 @@ class KeywordService:
                             for news in news_in_selected_month
                         ]
                         # 设置1个月的过期时间
-                        self.redis_client.setex(news_cache_key, 2592000 + random.randint(0, 3600), json.dumps(news_data))
+                        self.cache.setex(news_cache_key, 2592000 + random.randint(0, 3600), json.dumps(news_data))
                         print(f"新闻数据写入缓存成功！")
 
-                    # 遍历新闻，提取关键词
-                    for news in news_in_selected_month:
-                        if algorithm == "jieba提供的TF-IDF":
-                            keywords = jieba_tfidf_extract_keywords(news.body, keywords_num)
-                        elif algorithm == "自行编写的TF-IDF（要等较长时间）":
-                            keywords = tfidf_extract_keywords(keywords_num, idx, news_in_selected_month)
-                        elif algorithm == "PageRank":
-                            keywords = pagerank_extract_keywords(news.body, keywords_num)
+                    # 自行编写的TF-IDF在整个月的语料上一次性计算
+                    if algorithm == "自行编写的TF-IDF（要等较长时间）":
+                        # 文档频率只对新抓取的新闻增量更新，IDF 直接读取持久化的统计
+                        self.doc_freq_store.update_from_db(self.db, start_time.year, start_time.month)
+                        corpus_stats = self.doc_freq_store.merge([(start_time.year, start_time.month)])
+                        title_tokens = self.title_token_store.get_or_tokenize(
+                            [(news.id, news.title) for news in news_in_selected_month],
+                            lambda texts: batch_tokenize(texts, cut_tokenize))
+                        all_keywords = tfidf_extract_keywords_all(keywords_num, news_in_selected_month,
+                                                                  corpus_stats, title_tokens)
+                    elif algorithm == "jieba提供的TF-IDF":
+                        body_tokens = self.body_cut_token_store.get_or_tokenize(
+                            [(news.id, news.body) for news in news_in_selected_month],
+                            lambda texts: batch_tokenize(texts, cut_tokenize))
+                        all_keywords = jieba_tfidf_extract_keywords_from_tokens(body_tokens, keywords_num)
+                    else:
+                        # 正文分词结果按新闻id持久化，切换算法或关键词个数时不再重新分词
+                        body_tokens = self.body_token_store.get_or_tokenize(
+                            [(news.id, news.body) for news in news_in_selected_month],
+                            lambda texts: batch_tokenize(texts, posseg_tokenize))
+                        if algorithm == "PageRank":
+                            all_keywords = pagerank_extract_keywords_from_tokens(body_tokens, keywords_num)
                         elif algorithm == "LDA":
-                            keywords = lda_extract_keywords(news.body, keywords_num)
+                            # 同一月份、分区共享一个训练好的LDA模型，新闻增删后重新训练
+                            all_keywords = lda_extract_keywords_by_corpus(
+                                [news.body for news in news_in_selected_month], keywords_num,
+                                f"{selected_month}_{selected_category}", tokenized_docs=body_tokens,
+                                corpus_version=get_corpus_version([news.id for news in news_in_selected_month]))
                         else:
                             raise ValueError("不存在这种算法！")
-
-                        # 保存关键词到 Keywords 表
-                        keyword_entry = Keywords(
-                            news_id=news.id,
-                            algorithm=algorithm,
-                            keywords=", ".join(keywords),
-                            keywords_num=len(keywords)
-                        )
-                        session.add(keyword_entry)
-                        mon_keywords_list_with_weight.extend(keywords)
-                        idx += 1
+                    # 批量保存关键词，同时维护关键词出现表与月度汇总
+                    save_keywords(session, news_in_selected_month, all_keywords, algorithm,
+                                  start_time.year, start_time.month)
+                    mon_keywords_list_with_weight = [keyword for keywords in all_keywords for keyword in keywords]
                     session.commit()
+                    if self.bloom_filter is not None:
+                        # 将新的 (年, 月, 关键词) 加入布隆过滤器，否则要等过滤器下次刷新后才能查到这些关键词的新闻
+                        self.bloom_filter.load_data_from_db(wait=True)
+                    # 重建该月的倒排索引段文件
+                    default_posting_index.build_month(session, start_time.year, start_time.month)
                     # 获取关键词的统计信息
-                    mon_keywords_list_with_count = get_mon_keywords_with_count_list(mon_keywords_list_with_weight,
-                                                                                    keywords_num)
-                # 将结果写入缓存
-                cache_data = {
-                    "keywords_with_weight": mon_keywords_list_with_weight,
-                    "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "is_delete": 0
-                }
-                # 设置1天的过期时间
-                self.redis_client.setex(cache_key, 86400, json.dumps(cache_data))
-                print(f"关键词数据写入缓存成功！")
+                    mon_keywords_list_with_count = get_top_keywords(session, start_time.year, start_time.month,
+                                                                    selected_category, algorithm, keywords_num)
+                self._cache_keywords(cache_key, mon_keywords_list_with_count)
                 return mon_keywords_list_with_weight, mon_keywords_list_with_count
         except Exception as e:
             print(f"Error during database connection or text processing: {e}")
             return [], []
+
+    async def fetch_keywords_by_time_async(self, selected_month, selected_category, keywords_num=50,
+                                           algorithm="tf-idf"):
+        """
+        fetch_keywords_by_time 的异步版本。缓存与数据库中已有的统计通过异步引擎读取；
+        需要重新提取关键词时，分词与提取属于 CPU 密集计算，交给线程池中的同步实现，不阻塞事件循环
+        :return: 同 fetch_keywords_by_time
+        """
+        cache_key = f"keywords:{selected_month[:4]}:{selected_month[5:7]}:{algorithm}:{keywords_num}"
+        cached_data = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached_data:
+            return self._parse_cached_keywords(cached_data, keywords_num)
+        try:
+            start_time = datetime.strptime(selected_month, "%Y-%m")
+            mon_keywords_list_with_count = await self.db.get_async_database().run_sync(
+                self._get_existing_keywords, start_time, selected_category, algorithm, keywords_num)
+            if mon_keywords_list_with_count is not None:
+                await asyncio.to_thread(self._cache_keywords, cache_key, mon_keywords_list_with_count)
+                return [], mon_keywords_list_with_count
+        except Exception as e:
+            print(f"Error during database connection or text processing: {e}")
+            return [], []
+        return await asyncio.to_thread(self.fetch_keywords_by_time, selected_month, selected_category,
+                                       keywords_num, algorithm)
+
+    def _parse_cached_keywords(self, cached_data, keywords_num):
+        cached_result = json.loads(cached_data)
+        if 'keywords_with_count' in cached_result:
+            return [], cached_result['keywords_with_count'][:keywords_num]
+        mon_keywords_list_with_weight = cached_result['keywords_with_weight']
+        mon_keywords_list_with_count = get_mon_keywords_with_count_list(cached_result['keywords_with_weight'],
+                                                                        keywords_num)
+        return mon_keywords_list_with_weight, mon_keywords_list_with_count
+
+    def _get_existing_keywords(self, session, start_time, selected_category, algorithm, keywords_num):
+        """
+        读取数据库中已提取的关键词统计
+        :param start_time: 月份第一天
+        :return: 出现次数最多的 "关键词:次数" 列表；已有的关键词数据不足 keywords_num 条时返回 None，需要重新提取
+        """
+        end_time = start_time + relativedelta(months=1)
+        last_day_of_month = end_time - relativedelta(days=1)
+        # 统计符合条件的关键词数据条数
+        query = session.query(func.count(Keywords.id)).join(News, News.id == Keywords.news_id).filter(
+            News.pub_time >= start_time,
+            News.pub_time < end_time,
+            News.is_delete == 0,
+            Keywords.algorithm == algorithm,
+            Keywords.created_at >= last_day_of_month,
+            Keywords.is_delete == 0
+        )
+        if selected_category and selected_category != "所有分区":
+            query = query.filter(News.category.ilike(selected_category.strip()))
+        existing_keywords_count = query.scalar()
+        if existing_keywords_count <= keywords_num:
+            return None
+        print(f"找到数据库中已存在的关键词数据，且数据量{existing_keywords_count}大于{keywords_num}，直接返回数据")
+        mon_keywords_list_with_count = get_top_keywords(session, start_time.year, start_time.month,
+                                                        selected_category, algorithm, keywords_num)
+        if not mon_keywords_list_with_count:
+            # 旧数据只有 Keywords 文本，先解析进关键词出现表
+            backfill_month(session, start_time.year, start_time.month, algorithm)
+            session.commit()
+            default_posting_index.build_month(session, start_time.year, start_time.month)
+            mon_keywords_list_with_count = get_top_keywords(session, start_time.year, start_time.month,
+                                                            selected_category, algorithm, keywords_num)
+        return mon_keywords_list_with_count
+
+    def _cache_keywords(self, cache_key, mon_keywords_list_with_count):
+        # 将结果写入缓存
+        cache_data = {
+            "keywords_with_count": mon_keywords_list_with_count,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "is_delete": 0
+        }
+        # 设置1天的过期时间
+        self.cache.setex(cache_key, 86400, json.dumps(cache_data))
+        print(f"关键词数据写入缓存成功！")
@@ -5,245 +5,425 @@
 @File: news_service.py
 @Note: Updated to support multi-table structure
 """
+import asyncio
 import json
-import re
+import time
 from datetime import datetime
 
+import numpy as np
+
 from PyQt5.QtWidgets import QMessageBox
 from dateutil.relativedelta import relativedelta
-from sqlalchemy.orm import joinedload
-from Redis.bloom_filter import BloomFilter
+from Redis.redis_bloom_filter import RedisCountingBloomFilter, DEFAULT_ERROR_RATE
+from Redis.near_cache import get_two_tier_cache
 from Redis.redis_config import get_redis_cluster_client
-from ..data_storage.models import News, Keywords
+from ..data_storage.keyword_store import find_postings, CHUNK_SIZE
+from ..data_storage.models import News
+from ..data_storage.posting_index import default_posting_index
+from ..data_storage.queries import news_page_query, news_in_range_query, get_keyword_names
+
+# 每页新闻条数
+NEWS_PAGE_SIZE = 50
+# 摘要长度，只从数据库读取正文的前 SUMMARY_LENGTH + 1 个字符
+SUMMARY_LENGTH = 150
+# 分页缓存的过期时间（1个月）
+NEWS_PAGE_CACHE_TTL = 2592000
+# 分页缓存哈希中保存候选新闻列表的字段，与 "每页条数:游标" 形式的分页字段不会冲突
+CANDIDATES_FIELD = "candidates"
+
+
+def get_month_pages_key(year, month):
+    """
+    记录某月所有分页缓存哈希键的集合，按月份或分区删除数据时据此找到需要清理的分页缓存
+    """
+    return f"news:{year}:{int(month):02d}:pages"
+
+
+def pack_records(records):
+    """
+    将字典列表按列打包，字段名只保存一次
+    :param records: 字段相同的字典列表
+    :return: {字段: [值, ...]}
+    """
+    fields = list(records[0]) if records else []
+    return {field: [record[field] for record in records] for field in fields}
+
+
+def unpack_records(columns):
+    """
+    pack_records 的逆操作，兼容旧版本缓存的字典列表
+    :return: 字典列表
+    """
+    if isinstance(columns, list):
+        return columns
+    fields = list(columns)
+    return [dict(zip(fields, values)) for values in zip(*columns.values())]
+
+
+def normalize_weights(weights):
+    """
+    将权重线性归一化到 [0, 1)
+    :param weights: 权重数组
+    :return: 归一化后的 float64 数组
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if not weights.size:
+        return weights
+    min_value = weights.min()
+    return (weights - min_value) / (weights.max() - min_value + 0.00001)
+
+
+def dumps_compact(data):
+    # 中文不转义、去掉多余空白，缓存体积约为默认 json.dumps 的一半
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
 
 
 class NewsService:
-    def __init__(self, db, bloom_filter_size=100000, hash_count=5):
+    def __init__(self, db, bloom_capacity=None, bloom_error_rate=DEFAULT_ERROR_RATE):
         """
         初始化新闻管理器
-        :param redis_client: Redis 客户端实例
         :param db: 数据库实例
-        :param bloom_filter_size: 布隆过滤器大小
-        :param hash_count: 哈希函数数量
+        :param bloom_capacity: 布隆过滤器预计的元素个数，默认按数据库中的关键词月份数估计
+        :param bloom_error_rate: 布隆过滤器的目标误判率，位数组大小与哈希数据此自动计算
         """
         self.redis_client = get_redis_cluster_client()
+        # 分页缓存先查进程内缓存，再查 Redis
+        self.cache = get_two_tier_cache()
         self.db = db
-        self.bloom_filter = BloomFilter(bloom_filter_size, hash_count)
+        # 计数布隆过滤器存放在 Redis 中，所有进程共用；由数据库中的关键词出现记录维护，删除数据时同步移除
+        self.bloom_filter = RedisCountingBloomFilter(bloom_capacity, bloom_error_rate, db=db)
 
     def get_news_list(self, selected_month, keyword):
-        # keyword = "不存在的hhh"
+        """
+        查询某月包含关键词的全部新闻（逐页读取）
+        :param selected_month: 月份，格式为 "YYYY-MM"
+        :param keyword: 关键词
+        :return: 按发布时间倒序的新闻字典列表，未找到时为空列表，出错时为 None
+        """
+        news_records = []
+        for page in self.iter_news_pages(selected_month, keyword):
+            if page is None:
+                return None
+            news_records.extend(page["news"])
+        return news_records
+
+    async def get_news_list_async(self, selected_month, keyword):
+        """
+        get_news_list 的异步版本
+        """
+        news_records = []
+        async for page in self.iter_news_pages_async(selected_month, keyword):
+            if page is None:
+                return None
+            news_records.extend(page["news"])
+        return news_records
+
+    def iter_news_pages(self, selected_month, keyword, selected_category="所有分区", page_size=NEWS_PAGE_SIZE):
+        """
+        逐页读取某月包含关键词的新闻
+        :return: 生成器，每次产生 get_news_page 的一页结果，出错时产生 None 后结束
+        """
+        cursor = None
+        while True:
+            page = self.get_news_page(selected_month, keyword, selected_category, cursor, page_size)
+            yield page
+            if page is None or not page["next_cursor"]:
+                return
+            cursor = page["next_cursor"]
+
+    async def iter_news_pages_async(self, selected_month, keyword, selected_category="所有分区",
+                                    page_size=NEWS_PAGE_SIZE):
+        """
+        iter_news_pages 的异步版本
+        """
+        cursor = None
+        while True:
+            page = await self.get_news_page_async(selected_month, keyword, selected_category, cursor, page_size)
+            yield page
+            if page is None or not page["next_cursor"]:
+                return
+            cursor = page["next_cursor"]
+
+    def get_news_page(self, selected_month, keyword, selected_category="所有分区", cursor=None,
+                      page_size=NEWS_PAGE_SIZE):
+        """
+        按发布时间倒序分页查询某月包含关键词的新闻，每页单独缓存
+        :param selected_month: 月份，格式为 "YYYY-MM"
+        :param keyword: 关键词
+        :param selected_category: 分区，"所有分区" 表示不限分区
+        :param cursor: 上一页返回的 next_cursor，为空时查询第一页
+        :param page_size: 每页新闻条数
+        :return: {"news": 新闻字典列表, "total": 总条数, "next_cursor": 下一页游标或 None}，出错时返回 None
+        """
         try:
-            cache_key = f"news:{selected_month[:4]}:{selected_month[5:7]}:{keyword}"
-            print(f"新闻缓存键: {cache_key}")
+            bloom_key, pages_key, page_field = self._page_keys(selected_month, keyword, selected_category, cursor,
+                                                               page_size)
             # 检查布隆过滤器
-            if not self.bloom_filter.check(cache_key):
+            if not self.bloom_filter.check(bloom_key):
                 print("-----布隆过滤器未命中，直接返回-----")
-                print("未找到相关新闻")
-                return "未找到相关新闻", "未找到相关新闻"
-            print("-----布隆过滤器命中，继续查询缓存-----")
-            # 获取缓存数据
-            cached_data = self.redis_client.get(cache_key)
-            if cached_data:
+                return {"news": [], "total": 0, "next_cursor": None}
+            page = self._get_cached_page(pages_key, page_field)
+            if page:
                 print("-----从缓存中获取新闻数据-----")
-                cached_data = json.loads(cached_data)
-                processed_news_text = cached_data["processed_news_text"]
-                original_news_text = cached_data["original_news_text"]
-                return processed_news_text, original_news_text
-            else:
-                print("-----缓存未命中，开始从数据库查询新闻-----")
+                return page
+            print("-----缓存未命中，开始从数据库查询新闻-----")
+            lock_key, lock_acquired, page = self._acquire_page_lock(pages_key, page_field)
+            if page:
+                return page
+            try:
                 with self.db.get_session() as session:
-                    start_date = datetime.strptime(selected_month, "%Y-%m")
-                    end_date = start_date + relativedelta(months=1)
-                    # 查询符合条件的新闻和关键词
-                    related_news = (
-                        session.query(News)
-                        .join(Keywords, News.id == Keywords.news_id)
-                        .filter(
-                            News.pub_time >= start_date,
-                            News.pub_time < end_date,
-                            News.is_delete == 0,
-                            Keywords.keywords.op('REGEXP')(fr'\b{re.escape(keyword)}\b')
-                        )
-                        .all()
-                    )
-                    if not related_news:
-                        print("未找到相关新闻")
-                        return "未找到相关新闻", "未找到相关新闻"
-                    news_with_values = []
-                    for news in related_news:
-                        # 获取关键词权重
-                        keyword_value_pairs = [
-                            pair.strip() for pair in news.keywords[0].keywords.split(',')
-                        ]
-                        values_dict = {
-                            pair.split(':')[0]: float(pair.split(':')[1]) for pair in keyword_value_pairs
-                        }
-                        value = values_dict.get(keyword, 0.0)
-                        news_with_values.append((news, value))
-
-                    # 按权重排序并归一化
-                    news_with_values.sort(key=lambda x: x[1], reverse=True)
-                    values = [value for (_, value) in news_with_values]
-                    max_value = values[0] if values else 1
-                    min_value = values[-1] if values else 0
-                    normalized_news_with_values = [
-                        (_, (value - min_value) / (max_value - min_value + 0.00001))
-                        for (_, value) in news_with_values
-                    ]
-                    news_with_values = normalized_news_with_values
-
-                    # 按发布时间排序
-                    news_with_values.sort(key=lambda x: x[0].pub_time, reverse=True)
-
-                    # 构建返回结果
-                    processed_news_text = (
-                        f'<p style="font-size: 25px; text-align: center; font-family: 微软雅黑;">'
-                        f"<h3>关键词【{keyword}】在【{selected_month.split('-')[0]}】年"
-                        f"【{selected_month.split('-')[1]}】月份的相关新闻共有{len(news_with_values)}条"
-                        f"（按关键词相关指数排序）</h3></p>"
-                    )
-                    original_news_text = ""
-
-                    for idx, (news, value) in enumerate(news_with_values, start=1):
-                        value = round(value, 3)
-                        pub_time = news.pub_time.strftime("%Y-%m-%d %H:%M:%S")
-                        category = news.category if news.category else '未知分区'
-                        processed_news_text += f"""
-                            <div style="margin-bottom: 20px; font-size: 22px;">
-                                <p style="font-size: 28px; text-align: center; font-family: 微软雅黑;">
-                                    <a href="{news.url}" style="color: #1E90FF; text-decoration: none;">{news.title}</a>
-                                </p>
-                                <p><strong>发布时间：</strong>{str(pub_time).split(' ')[0]}</p>
-                                <p><strong>分区：</strong>{category}</p>
-                                <p><strong>重要指数：</strong>{value}</p>
-                                <p style="font-size: 22px; font-family: 微软雅黑; color: #333333;">{self._get_summary(news.body)}</p>
-                            </div>
-                        """
-                        original_news_text += str(idx) + '. ' + news.title
-                    result = {
-                        "processed_news_text": processed_news_text,
-                        "original_news_text": original_news_text,
-                        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "is_delete": 0
-                    }
-                    # 缓存1个月
-                    self.redis_client.setex(cache_key, 2592000, json.dumps(result))
-                    # 添加到布隆过滤器
-                    self.bloom_filter.add(cache_key)
-                    return processed_news_text, original_news_text
+                    candidates = self._get_cached_candidates(pages_key)
+                    if candidates is None:
+                        candidates = self._query_candidates(session, selected_month, keyword, selected_category)
+                        self._cache_candidates(pages_key, candidates)
+                    page = self._query_news_page(session, selected_month, candidates, cursor, page_size)
+                self._cache_page(pages_key, page_field, page)
+                return page
+            finally:
+                if lock_acquired:
+                    # 释放锁
+                    self.redis_client.delete(lock_key)
         except Exception as e:
             print(f"Error during database connection or query: {e}")
-            return "查询时出现错误"
+            return None
 
-    def search_news_by_keyword(self, keyword, selected_month, selected_category):
+    async def get_news_page_async(self, selected_month, keyword, selected_category="所有分区", cursor=None,
+                                  page_size=NEWS_PAGE_SIZE):
         """
-        根据关键词在当前月份范围内搜索新闻
+        get_news_page 的异步版本：数据库查询走异步引擎，Redis 的同步调用放到线程池中执行，不阻塞事件循环
+        :return: 同 get_news_page
         """
         try:
-            if selected_month != "请选择月份":
-                start_date = datetime.strptime(selected_month, "%Y-%m")
-                end_date = start_date + relativedelta(months=1)
-
-            # 获取缓存数据
-            cache_key = f"news:{selected_month[:4]}:{selected_month[5:7]}:{keyword}:{selected_category}"
-            print(f"新闻缓存键: {cache_key}")
-            cached_data = self.redis_client.get(cache_key)
-
-            if cached_data:
-                print("-----从缓存中获取新闻数据-----")
-                cached_data = json.loads(cached_data)
-                if "error" in cached_data:
-                    print(cached_data["error"])
-                    return None
-                news_results = cached_data["news_results"]
-                print(f"找到相关新闻{len(news_results)}条")
-                # 增加热点新闻点击量
-                self._increment_click_for_keyword(keyword)
-                print(f"关键词：{keyword} 热度：{self.redis_client.zscore('keyword_click_rank', keyword)}")
-                return news_results
-            else:
-                print("-----缓存未命中，开始从数据库查询新闻-----")
-                # 获取分布式锁，设置过期时间10秒防止死锁
-                lock_key = f"lock:{cache_key}"
-                lock_acquired = self.redis_client.set(lock_key, "locked", ex=10, nx=True)
-                if not lock_acquired:
-                    print("-----缓存未命中，且锁被其他请求占用，等待中-----")
-                    # 如果没有获得锁，等待一段时间后重新检查缓存
-                    while not self.redis_client.get(lock_key):
-                        cached_data = self.redis_client.get(cache_key)
-                        if cached_data:
-                            print("-----缓存重新命中，返回缓存数据-----")
-                            cached_data = json.loads(cached_data)
-                            if "error" in cached_data:
-                                print(cached_data["error"])
-                                return None
-                            news_results = cached_data["news_results"]
-                            print(f"找到相关新闻{len(news_results)}条")
-                            # 增加热点新闻点击量
-                            self._increment_click_for_keyword(keyword)
-                            print(f"关键词：{keyword} 热度：{self.redis_client.zscore('keyword_click_rank', keyword)}")
-                            return news_results
-                else:
-                    # 如果获得了锁，查询数据库并更新缓存
-                    try:
-                        with self.db.get_session() as session:
-                            # 查询符合条件的新闻和关键词
-                            query = (
-                                session.query(News)
-                                .join(Keywords, News.id == Keywords.news_id)
-                                .filter(
-                                    News.pub_time >= start_date,
-                                    News.pub_time < end_date,
-                                    News.is_delete == 0,
-                                    Keywords.keywords.like(f"%{keyword}%")
-                                )
-                                .options(joinedload(News.keywords))
-                            )
-                            if selected_category != "所有分区":
-                                query = query.filter(News.category == selected_category)
-                            related_news = query.all()
-                            if not related_news:
-                                print("未找到相关新闻")
-                                result = {
-                                    "error": "未找到相关新闻",
-                                }
-                                # 设置缓存，避免后续请求重复查询
-                                self.redis_client.setex(cache_key, 60, json.dumps(result))
-                                # 增加热点新闻点击量
-                                self._increment_click_for_keyword(keyword)
-                                print(f"关键词：{keyword} 热度：{self.redis_client.zscore('keyword_click_rank', keyword)}")
-                                return None
-                            # 构建新闻列表
-                            news_results = [
-                                {
-                                    "id": news.id,
-                                    "title": news.title,
-                                    "summary": self._get_summary(news.body),
-                                    "url": news.url,
-                                    "pub_time": str(news.pub_time),
-                                    "category": news.category,
-                                    "keywords": news.keywords[0].keywords if news.keywords else "",
-                                }
-                                for news in related_news
-                            ]
-                            result = {
-                                "news_results": news_results,
-                                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                "is_delete": 0
-                            }
-                            # 缓存1个月
-                            self.redis_client.setex(cache_key, 2592000, json.dumps(result))
-                            print(f"找到相关新闻{len(news_results)}条")
-                            # 增加热点新闻点击量
-                            self._increment_click_for_keyword(keyword)
-                            print(f"关键词：{keyword} 热度：{self.redis_client.zscore('keyword_click_rank', keyword)}")
-                            return news_results
-                    finally:
-                        # 释放锁
-                        self.redis_client.delete(lock_key)
+            bloom_key, pages_key, page_field = self._page_keys(selected_month, keyword, selected_category, cursor,
+                                                               page_size)
+            if not await asyncio.to_thread(self.bloom_filter.check, bloom_key):
+                return {"news": [], "total": 0, "next_cursor": None}
+            page = await asyncio.to_thread(self._get_cached_page, pages_key, page_field)
+            if page:
+                return page
+            lock_key, lock_acquired, page = await asyncio.to_thread(self._acquire_page_lock, pages_key, page_field)
+            if page:
+                return page
+            try:
+                async_db = self.db.get_async_database()
+                candidates = await asyncio.to_thread(self._get_cached_candidates, pages_key)
+                if candidates is None:
+                    candidates = await async_db.run_sync(self._query_candidates, selected_month, keyword,
+                                                         selected_category)
+                    await asyncio.to_thread(self._cache_candidates, pages_key, candidates)
+                page = await async_db.run_sync(self._query_news_page, selected_month, candidates, cursor, page_size)
+                await asyncio.to_thread(self._cache_page, pages_key, page_field, page)
+                return page
+            finally:
+                if lock_acquired:
+                    await asyncio.to_thread(self.redis_client.delete, lock_key)
         except Exception as e:
             print(f"Error during database connection or query: {e}")
-            return "查询时出现错误"
+            return None
+
+    def preheat_news_page(self, selected_month, keyword, selected_category="所有分区", page_size=NEWS_PAGE_SIZE):
+        """
+        预热某月关键词新闻的候选列表与第一页，已缓存时延长过期时间
+        :return: 同 get_news_page 的第一页
+        """
+        page = self.get_news_page(selected_month, keyword, selected_category, None, page_size)
+        if page and page["news"]:
+            _, pages_key, _ = self._page_keys(selected_month, keyword, selected_category, None, page_size)
+            self._track_pages_key(pages_key)
+        return page
+
+    def _page_keys(self, selected_month, keyword, selected_category, cursor, page_size):
+        """
+        :return: (布隆过滤器键, 分页缓存哈希键, 哈希字段)
+        """
+        year, month = selected_month[:4], selected_month[5:7]
+        # 同一查询的所有分页存放在一个哈希中，删除缓存时只需删除一个键
+        pages_key = f"news:{year}:{month}:{keyword}:{selected_category}:pages"
+        page_field = f"{page_size}:{cursor or ''}"
+        print(f"新闻分页缓存键: {pages_key} {page_field}")
+        return f"news:{year}:{month}:{keyword}", pages_key, page_field
+
+    def _acquire_page_lock(self, pages_key, page_field):
+        """
+        获取查询该页的分布式锁；锁被占用时等待持有者写入缓存
+        :return: (锁键, 是否获得锁, 等待期间命中的缓存页或 None)
+        """
+        # 设置过期时间10秒防止死锁
+        lock_key = f"lock:{pages_key}:{page_field}"
+        lock_acquired = self.redis_client.set(lock_key, "locked", ex=10, nx=True)
+        if not lock_acquired:
+            print("-----缓存未命中，且锁被其他请求占用，等待中-----")
+            # 等待持有锁的请求写入缓存，锁过期后自行查询
+            while self.redis_client.get(lock_key):
+                time.sleep(0.05)
+                page = self._get_cached_page(pages_key, page_field)
+                if page:
+                    print("-----缓存重新命中，返回缓存数据-----")
+                    return lock_key, lock_acquired, page
+        return lock_key, lock_acquired, None
+
+    def _cache_page(self, pages_key, page_field, page):
+        # 只缓存有新闻的页。能查到新闻说明键已在布隆过滤器中，计数过滤器不重复加入
+        if page["news"]:
+            cached_page = dict(page, news=pack_records(page["news"]))
+            self.cache.hset(pages_key, page_field, dumps_compact(cached_page))
+            self._track_pages_key(pages_key)
+
+    def _track_pages_key(self, pages_key):
+        """
+        设置分页缓存哈希的过期时间，并登记到所在月份的集合中
+        """
+        self.redis_client.expire(pages_key, NEWS_PAGE_CACHE_TTL)
+        _, year, month = pages_key.split(':')[:3]
+        month_pages_key = get_month_pages_key(year, month)
+        self.redis_client.sadd(month_pages_key, pages_key)
+        self.redis_client.expire(month_pages_key, NEWS_PAGE_CACHE_TTL)
+
+    def _get_cached_page(self, pages_key, page_field):
+        cached_page = self.cache.hget(pages_key, page_field)
+        if not cached_page:
+            return None
+        page = json.loads(cached_page)
+        page["news"] = unpack_records(page["news"])
+        return page
+
+    def _get_cached_candidates(self, pages_key):
+        cached_candidates = self.cache.hget(pages_key, CANDIDATES_FIELD)
+        return json.loads(cached_candidates) if cached_candidates else None
+
+    def _cache_candidates(self, pages_key, candidates):
+        # 与分页存放在同一个哈希中，过期与删除都随之一起
+        if candidates["ids"]:
+            self.cache.hset(pages_key, CANDIDATES_FIELD, dumps_compact(candidates))
+            self._track_pages_key(pages_key)
+
+    def _query_candidates(self, session, selected_month, keyword, selected_category):
+        """
+        一次查出某月包含关键词（且属于该分区）的全部新闻，按 (发布时间, id) 倒序排列后整体缓存，
+        之后每一页只在这个列表上定位，不再查询倒排索引与全部候选新闻
+        :return: {"ids": [新闻id, ...], "times": [YYYYmmddHHMMSS 形式的整数发布时间, ...], "weights": [归一化权重, ...]}
+        """
+        start_date = datetime.strptime(selected_month, "%Y-%m")
+        end_date = start_date + relativedelta(months=1)
+        news_ids, weights = self._lookup_keyword(session, keyword, start_date, end_date)
+        # 权重在该月所有相关新闻上一次性归一化
+        weight_by_id = dict(zip(news_ids.tolist(), normalize_weights(weights).tolist()))
+        candidate_ids = list(weight_by_id)
+        rows = []
+        for i in range(0, len(candidate_ids), CHUNK_SIZE):
+            rows.extend(session.execute(
+                news_in_range_query(start_date, end_date, selected_category, (News.id, News.pub_time))
+                .where(News.id.in_(candidate_ids[i:i + CHUNK_SIZE]))
+            ).all())
+        rows.sort(key=lambda row: (row.pub_time, row.id), reverse=True)
+        return {
+            "ids": [row.id for row in rows],
+            "times": [int(row.pub_time.strftime('%Y%m%d%H%M%S')) for row in rows],
+            "weights": [round(weight_by_id[row.id], 3) for row in rows],
+        }
+
+    def _query_news_page(self, session, selected_month, candidates, cursor, page_size):
+        """
+        在按 (发布时间, id) 倒序的候选列表上按游标定位一页，只向数据库查询这一页的新闻
+        """
+        total = len(candidates["ids"])
+        if not total:
+            print("未找到相关新闻")
+            return {"news": [], "total": 0, "next_cursor": None}
+        ids = np.asarray(candidates["ids"], dtype=np.int64)
+        times = np.asarray(candidates["times"], dtype=np.int64)
+        start = 0
+        if cursor:
+            # 游标之前（含游标本身）的条数即本页的起点
+            last_time, last_id = self._decode_cursor(cursor)
+            start = int(np.count_nonzero((times > last_time) | ((times == last_time) & (ids >= last_id))))
+        end = min(start + page_size, total)
+        next_cursor = self._encode_cursor(times[end - 1], ids[end - 1]) if end < total else None
+        page_ids = ids[start:end].tolist()
+        start_date = datetime.strptime(selected_month, "%Y-%m")
+        rows = session.execute(news_page_query(page_ids, limit=len(page_ids), summary_length=SUMMARY_LENGTH + 1,
+                                               time_range=(start_date, start_date + relativedelta(months=1)))
+                               ).all() if page_ids else []
+        page_weights = dict(zip(page_ids, candidates["weights"][start:end]))
+        keyword_names = get_keyword_names(session, page_ids)
+        # 缓存候选列表之后被删除的新闻查不到，直接跳过
+        news_records = [
+            {
+                "id": row.id,
+                "title": row.title,
+                "url": row.url,
+                "pub_time": row.pub_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "category": row.category,
+                "weight": page_weights[row.id],
+                "summary": self._get_summary(row.body_prefix or ""),
+                # 界面只展示前10个关键词，不再缓存整段关键词文本
+                "keywords": keyword_names.get(row.id, ""),
+            }
+            for row in rows
+        ]
+        return {"news": news_records, "total": total, "next_cursor": next_cursor}
+
+    def _encode_cursor(self, pub_time, news_id):
+        return f"{int(pub_time)}_{int(news_id)}"
+
+    def _decode_cursor(self, cursor):
+        pub_time, news_id = cursor.split('_')
+        return int(pub_time), int(news_id)
+
+    def search_news_by_keyword(self, keyword, selected_month, selected_category, page_size=NEWS_PAGE_SIZE):
+        """
+        根据关键词在当前月份范围内搜索新闻
+        :return: 第一页结果（见 get_news_page），后续页通过 get_news_page 的游标继续读取；未找到时返回 None
+        """
+        page = self.get_news_page(selected_month, keyword, selected_category, None, page_size)
+        # 增加热点新闻点击量
+        self._increment_click_for_keyword(keyword)
+        print(f"关键词：{keyword} 热度：{self.redis_client.zscore('keyword_click_rank', keyword)}")
+        if not page or not page["news"]:
+            print("未找到相关新闻")
+            return None
+        print(f"找到相关新闻{page['total']}条")
+        return page
+
+    async def search_news_by_keyword_async(self, keyword, selected_month, selected_category,
+                                           page_size=NEWS_PAGE_SIZE):
+        """
+        search_news_by_keyword 的异步版本
+        """
+        page = await self.get_news_page_async(selected_month, keyword, selected_category, None, page_size)
+        await asyncio.to_thread(self._increment_click_for_keyword, keyword)
+        if not page or not page["news"]:
+            print("未找到相关新闻")
+            return None
+        print(f"找到相关新闻{page['total']}条")
+        return page
+
+    async def search_keywords_async(self, keywords, selected_month, selected_category="所有分区",
+                                    page_size=NEWS_PAGE_SIZE):
+        """
+        在同一事件循环中并发查询多个关键词的第一页新闻
+        :param keywords: 关键词列表
+        :return: {关键词: 第一页结果（见 get_news_page），出错时为 None}
+        """
+        pages = await asyncio.gather(*(
+            self.get_news_page_async(selected_month, keyword, selected_category, None, page_size)
+            for keyword in keywords
+        ))
+        return dict(zip(keywords, pages))
+
+    def _lookup_keyword(self, session, keyword, start_date, end_date):
+        """
+        查询某月包含关键词的新闻，优先读取本地的倒排索引段文件（落后于数据库时先重建），该月没有段文件时回退到数据库
+        :return: (新闻id数组, 权重数组)，按权重降序
+        """
+        result = default_posting_index.lookup(start_date.year, start_date.month, keyword, session)
+        if result is not None:
+            return result
+        postings = find_postings(session, keyword, start_date, end_date)
+        news_ids = np.fromiter((news_id for news_id, _, _ in postings), dtype=np.int64, count=len(postings))
+        weights = np.fromiter((weight or 0.0 for _, _, weight in postings), dtype=np.float64, count=len(postings))
+        order = np.argsort(-weights, kind='stable')
+        return news_ids[order], weights[order]
 
     def _increment_click_for_keyword(self, keyword):
         self.redis_client.zincrby("keyword_click_rank", 1, keyword)
@@ -252,5 +432,8 @@ class NewsService:
         top_keyword = self.redis_client.zrevrange("keyword_click_rank", 0, n - 1, withscores=True)
         return [{"keyword": keyword[0], "clicks": keyword[1]} for keyword in top_keyword]
 
+    async def get_top_keyword_async(self, n):
+        return await asyncio.to_thread(self.get_top_keyword, n)
+
     def _get_summary(self, body):
-        return body[:150] + '...' if len(body) > 150 else body
+        return body[:SUMMARY_LENGTH] + '...' if len(body) > SUMMARY_LENGTH else body
@@ -9,36 +9,57 @@ import math
 from collections import Counter, defaultdict
 
 import jieba
+import numpy as np
 
 
 class TFIDF:
-    def __init__(self, docs):
+    def __init__(self, docs, corpus_stats=None):
         """
         :param docs: 文档列表，每个文档是一个字符串
+        :param corpus_stats: 可选的语料统计信息（CorpusStats），提供时用它计算 IDF，无需重新统计文档频率
         """
         self.docs = docs
+        self.corpus_stats = corpus_stats
         self.num_docs = len(docs)
         self.word_doc_freq = defaultdict(int)
         self.word_freq_in_doc = []
-        self.calculate_word_doc_freq()
+        self.doc_lengths = []
+        self.idf = {}
         self.calculate_word_freq_in_docs()
+        self.calculate_word_doc_freq()
+        self.calculate_idf_table()
 
     def calculate_word_doc_freq(self):
         """
-        计算每个词在多少个文档中出现
+        计算每个词在多少个文档中出现（复用已分词的词频统计）
         """
-        for doc in self.docs:
-            words = set(jieba.cut(doc))
-            for word in words:
+        for word_count in self.word_freq_in_doc:
+            for word in word_count:
                 self.word_doc_freq[word] += 1
 
     def calculate_word_freq_in_docs(self):
         """
-        计算每个文档中每个词的词频
+        计算每个文档中每个词的词频，并缓存文档总词数
         """
         for doc in self.docs:
             word_count = Counter(jieba.cut(doc))
             self.word_freq_in_doc.append(word_count)
+            self.doc_lengths.append(sum(word_count.values()))
+
+    def calculate_idf_table(self):
+        """
+        预先计算所有词的 IDF 值
+        """
+        if self.corpus_stats is not None:
+            self.idf = {
+                word: math.log(self.corpus_stats.num_docs / (1 + self.corpus_stats.doc_freq.get(word, 0)))
+                for word in self.word_doc_freq
+            }
+            return
+        self.idf = {
+            word: math.log(self.num_docs / (1 + doc_freq))
+            for word, doc_freq in self.word_doc_freq.items()
+        }
 
     def calculate_tf(self, word, doc_idx):
         """
@@ -47,9 +68,7 @@ class TFIDF:
         :param doc_idx: 文档索引
         :return: TF 值
         """
-        word_count = self.word_freq_in_doc[doc_idx]
-        total_words = sum(word_count.values())
-        return word_count[word] / total_words
+        return self.word_freq_in_doc[doc_idx][word] / self.doc_lengths[doc_idx]
 
     def calculate_idf(self, word):
         """
@@ -57,8 +76,7 @@ class TFIDF:
         :param word: 词
         :return: IDF 值
         """
-        doc_freq = self.word_doc_freq.get(word, 0)
-        return math.log(self.num_docs / (1 + doc_freq)) if doc_freq > 0 else 0
+        return self.idf.get(word, 0)
 
     def calculate_tfidf(self, word, doc_idx):
         """
@@ -78,12 +96,96 @@ class TFIDF:
         :param top_k: 取前 K 个关键词
         :return: 关键词及其 TF-IDF 权重
         """
-        doc = self.docs[doc_idx]
-        words = jieba.cut(doc)
-        tfidf_scores = {}
-        # print(f"words: {words}")
-        for word in words:
-            tfidf_scores[word] = self.calculate_tfidf(word, doc_idx)
+        word_count = self.word_freq_in_doc[doc_idx]
+        doc_length = self.doc_lengths[doc_idx]
+        tfidf_scores = {
+            word: count / doc_length * self.idf.get(word, 0)
+            for word, count in word_count.items()
+        }
         sorted_words = sorted(tfidf_scores.items(), key=lambda item: item[1], reverse=True)
-        # print(f"sorted_words: {sorted_words}")
         return sorted_words[:top_k]
+
+
+class CorpusTFIDF:
+    def __init__(self, docs, corpus_stats=None, tokenized_docs=None):
+        """
+        语料级 TF-IDF：每个文档只分词一次，构建 CSR 格式的文档-词矩阵，一次向量化计算所有文档的关键词
+        :param docs: 文档列表，每个文档是一个字符串
+        :param corpus_stats: 可选的语料统计信息（CorpusStats），提供时用它计算 IDF
+        :param tokenized_docs: 可选的已分词文档（词列表的列表），提供时不再分词
+        """
+        self.docs = docs
+        self.corpus_stats = corpus_stats
+        self.tokenized_docs = tokenized_docs
+        self.num_docs = len(docs)
+        self.vocabulary = {}
+        self.id2word = []
+        self.build_matrix()
+        self.calculate_idf()
+
+    def build_matrix(self):
+        """
+        构建 CSR 文档-词矩阵（indptr / indices / data），同一文档内按词首次出现的顺序排列
+        """
+        indptr = [0]
+        indices = []
+        data = []
+        tokenized_docs = self.tokenized_docs
+        if tokenized_docs is None:
+            tokenized_docs = (jieba.cut(doc) for doc in self.docs)
+        for words in tokenized_docs:
+            word_count = Counter(words)
+            for word, count in word_count.items():
+                word_id = self.vocabulary.get(word)
+                if word_id is None:
+                    word_id = len(self.id2word)
+                    self.vocabulary[word] = word_id
+                    self.id2word.append(word)
+                indices.append(word_id)
+                data.append(count)
+            indptr.append(len(indices))
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.data = np.asarray(data, dtype=np.float64)
+        # 每个非零元素所在的文档行号
+        self.rows = np.repeat(np.arange(self.num_docs), np.diff(self.indptr))
+
+    def calculate_idf(self):
+        """
+        计算词表中每个词的文档频率与 IDF 值
+        """
+        if self.corpus_stats is not None:
+            self.word_doc_freq = np.array([self.corpus_stats.doc_freq.get(word, 0) for word in self.id2word],
+                                          dtype=np.int64)
+            self.idf = np.log(self.corpus_stats.num_docs / (1 + self.word_doc_freq))
+            return
+        self.word_doc_freq = np.bincount(self.indices, minlength=len(self.id2word))
+        self.idf = np.log(self.num_docs / (1 + self.word_doc_freq))
+
+    def calculate_tfidf_matrix(self):
+        """
+        计算 CSR 矩阵中每个非零元素的 TF-IDF 值
+        :return: 与 self.data 对齐的 TF-IDF 数组
+        """
+        doc_lengths = np.bincount(self.rows, weights=self.data, minlength=self.num_docs)
+        tf = self.data / doc_lengths[self.rows]
+        return tf * self.idf[self.indices]
+
+    def extract_keywords_all(self, top_k=10):
+        """
+        一次向量化计算，提取所有文档中 TF-IDF 权重最高的 top_k 个词
+        :param top_k: 取前 K 个关键词
+        :return: 列表，每个元素为对应文档的 [(关键词, TF-IDF 权重), ...]
+        """
+        results = [[] for _ in range(self.num_docs)]
+        if not self.data.size:
+            return results
+        scores = self.calculate_tfidf_matrix()
+        # 先按文档行、再按权重降序排序（稳定排序，权重相同时保持词首次出现的顺序）
+        order = np.lexsort((-scores, self.rows))
+        rank = np.arange(order.size) - self.indptr[self.rows[order]]
+        order = order[rank < top_k]
+        for row, word_id, score in zip(self.rows[order].tolist(), self.indices[order].tolist(),
+                                       scores[order].tolist()):
+            results[row].append((self.id2word[word_id], score))
+        return results
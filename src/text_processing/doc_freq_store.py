@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:12
+@Auth: Zhang Hongxing
+@File: doc_freq_store.py
+@Note: 按年月持久化的文档频率统计，增量更新，可合并任意月份用于计算 IDF
+"""
+import json
+import os
+from collections import Counter
+from datetime import datetime
+
+import jieba
+from dateutil.relativedelta import relativedelta
+
+from src.data_storage.models import News
+
+DOC_FREQ_DIR = './utils/doc_freq'
+
+
+class CorpusStats:
+    def __init__(self, num_docs=0, doc_freq=None):
+        """
+        语料统计信息
+        :param num_docs: 文档总数
+        :param doc_freq: 每个词出现的文档数
+        """
+        self.num_docs = num_docs
+        self.doc_freq = doc_freq if doc_freq is not None else Counter()
+
+
+class DocFreqStore:
+    def __init__(self, store_dir=DOC_FREQ_DIR, field='title'):
+        """
+        文档频率存储，每个月份一个文件，只对新抓取的新闻增量更新
+        :param store_dir: 存储目录
+        :param field: 统计的新闻字段（与 TF-IDF 使用的字段保持一致）
+        """
+        self.store_dir = store_dir
+        self.field = field
+        self.months = {}
+        if not os.path.exists(self.store_dir):
+            os.makedirs(self.store_dir)
+
+    def _get_month_path(self, year, month):
+        return os.path.join(self.store_dir, f"{self.field}_{int(year):04d}-{int(month):02d}.json")
+
+    def _load_month(self, year, month):
+        key = (int(year), int(month))
+        month_path = self._get_month_path(year, month)
+        mtime = os.path.getmtime(month_path) if os.path.exists(month_path) else None
+        # 删除/清理可能由其他进程完成，文件变化后重新读取
+        if key not in self.months or self.months[key]["mtime"] != mtime:
+            entry = {"num_docs": 0, "last_news_id": 0, "doc_freq": Counter(), "mtime": mtime}
+            if mtime is not None:
+                with open(month_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                entry["num_docs"] = data["num_docs"]
+                entry["last_news_id"] = data["last_news_id"]
+                entry["doc_freq"] = Counter(data["doc_freq"])
+            self.months[key] = entry
+        return self.months[key]
+
+    def _save_month(self, year, month):
+        entry = self._load_month(year, month)
+        month_path = self._get_month_path(year, month)
+        tmp_path = month_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "num_docs": entry["num_docs"],
+                "last_news_id": entry["last_news_id"],
+                "doc_freq": entry["doc_freq"],
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, month_path)
+        entry["mtime"] = os.path.getmtime(month_path)
+
+    def add_documents(self, year, month, news_id_and_texts):
+        """
+        将新文档计入指定月份的统计
+        :param year: 年
+        :param month: 月
+        :param news_id_and_texts: [(新闻id, 文本), ...]，已计入的新闻 id 会被跳过
+        :return: 新计入的文档数
+        """
+        entry = self._load_month(year, month)
+        added = 0
+        for news_id, text in news_id_and_texts:
+            if news_id <= entry["last_news_id"]:
+                continue
+            entry["doc_freq"].update(set(jieba.cut(text or "")))
+            entry["num_docs"] += 1
+            entry["last_news_id"] = news_id
+            added += 1
+        if added:
+            self._save_month(year, month)
+        return added
+
+    def update_from_db(self, db, year, month):
+        """
+        从数据库读取指定月份中尚未统计过的新闻并更新统计
+        :param db: 数据库实例
+        :param year: 年
+        :param month: 月
+        :return: 新计入的文档数
+        """
+        entry = self._load_month(year, month)
+        start_time = datetime(int(year), int(month), 1)
+        end_time = start_time + relativedelta(months=1)
+        column = getattr(News, self.field)
+        with db.get_session() as session:
+            rows = session.query(News.id, column).filter(
+                News.pub_time >= start_time,
+                News.pub_time < end_time,
+                News.is_delete == 0,
+                News.id > entry["last_news_id"]
+            ).order_by(News.id).all()
+        added = self.add_documents(year, month, rows)
+        if added:
+            print(f"{year}-{int(month):02d} 文档频率统计新增 {added} 篇新闻")
+        return added
+
+    def rebuild_month(self, db, year, month):
+        """
+        丢弃指定月份的统计并按当前未删除的新闻重新计算，用于新闻被删除之后
+        :param db: 数据库实例
+        :param year: 年
+        :param month: 月
+        :return: 重新计入的文档数
+        """
+        self.drop_month(year, month)
+        return self.update_from_db(db, year, month)
+
+    def drop_month(self, year, month):
+        """
+        删除指定月份的统计，用于该月数据被整体清理之后
+        :param year: 年
+        :param month: 月
+        """
+        month_path = self._get_month_path(year, month)
+        if os.path.exists(month_path):
+            os.remove(month_path)
+        self.months.pop((int(year), int(month)), None)
+
+    def get_stats(self, year, month):
+        """
+        获取单个月份的统计信息
+        """
+        entry = self._load_month(year, month)
+        return CorpusStats(entry["num_docs"], Counter(entry["doc_freq"]))
+
+    def merge(self, months):
+        """
+        合并任意月份的统计信息，例如一个季度或全部归档
+        :param months: [(年, 月), ...]
+        :return: CorpusStats 实例
+        """
+        stats = CorpusStats()
+        for year, month in months:
+            entry = self._load_month(year, month)
+            stats.num_docs += entry["num_docs"]
+            stats.doc_freq.update(entry["doc_freq"])
+        return stats
+
+    def available_months(self):
+        """
+        列出磁盘上已有统计的月份
+        :return: [(年, 月), ...]
+        """
+        months = []
+        prefix = f"{self.field}_"
+        for filename in os.listdir(self.store_dir):
+            if filename.startswith(prefix) and filename.endswith('.json'):
+                year, month = filename[len(prefix):-len('.json')].split('-')
+                months.append((int(year), int(month)))
+        return sorted(months)
@@ -6,18 +6,27 @@
 @Note:   
 """
 import math
+import os
 import re
 import logging
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import jieba
 import jieba.analyse
-from src.text_processing.TFIDF import TFIDF
+import numpy as np
+from src.text_processing.TFIDF import TFIDF, CorpusTFIDF
+from src.text_processing.rubbish_filter import default_filter as default_rubbish_filter
+from src.text_processing.textrank import TextRank
 
 logging.getLogger('jieba').setLevel(logging.ERROR)
 
 from gensim import corpora, models
 import jieba
 
+LDA_MODEL_DIR = './utils/lda_models'
+textrank_extractor = TextRank()
+
 
 def lda_extract_keywords(text, top_k, num_topics=5):
     """
@@ -46,6 +55,112 @@ def lda_extract_keywords(text, top_k, num_topics=5):
 
 
 
+def _get_lda_model_prefix(model_key, num_topics):
+    model_key = re.sub(r'[\\/:*?"<>|\s]', '_', model_key)
+    return f"{model_key}_{num_topics}_"
+
+
+def _get_lda_model_path(model_key, num_topics, corpus_version):
+    return os.path.join(LDA_MODEL_DIR, f"{_get_lda_model_prefix(model_key, num_topics)}{corpus_version}.model")
+
+
+def _remove_stale_lda_models(model_key, num_topics, keep_path):
+    """
+    删除同一语料旧版本的模型文件（gensim 会把一个模型保存为多个文件）
+    """
+    prefix = _get_lda_model_prefix(model_key, num_topics)
+    keep_name = os.path.basename(keep_path)
+    for filename in os.listdir(LDA_MODEL_DIR):
+        if filename.startswith(prefix) and not filename.startswith(keep_name):
+            os.remove(os.path.join(LDA_MODEL_DIR, filename))
+
+
+def get_corpus_version(news_ids):
+    """
+    语料版本，新闻增删后随之变化，用于判断已保存的模型是否过期
+    :param news_ids: 语料中的新闻 id 列表
+    :return: 版本字符串
+    """
+    if not news_ids:
+        return "0-0"
+    return f"{len(news_ids)}-{max(news_ids)}"
+
+
+def get_lda_model(model_key, tokenized_docs, num_topics=5, passes=10, multicore=False, workers=None, retrain=False,
+                  corpus_version="0-0"):
+    """
+    获取某个语料（如某月某分区）共享的 LDA 模型，同一版本的语料训练过的直接从磁盘加载。
+    :param model_key: 模型键，如 "2024-10_所有分区"
+    :param tokenized_docs: 分词后的文档列表
+    :param num_topics: LDA 模型的主题数
+    :param passes: 训练轮数
+    :param multicore: 是否使用 LdaMulticore 多进程训练
+    :param workers: LdaMulticore 的工作进程数
+    :param retrain: 是否忽略已保存的模型重新训练
+    :param corpus_version: 语料版本（见 get_corpus_version），语料变化后重新训练
+    :return: LDA 模型，词典为 lda_model.id2word
+    """
+    model_path = _get_lda_model_path(model_key, num_topics, corpus_version)
+    if os.path.exists(model_path) and not retrain:
+        print(f"从磁盘加载LDA模型: {model_path}")
+        return models.LdaModel.load(model_path)
+    print(f"开始训练LDA模型: {model_key}")
+    dictionary = corpora.Dictionary(tokenized_docs)
+    corpus = [dictionary.doc2bow(words) for words in tokenized_docs]
+    if multicore:
+        lda_model = models.LdaMulticore(corpus, num_topics=num_topics, id2word=dictionary, passes=passes,
+                                        workers=workers)
+    else:
+        lda_model = models.LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=passes)
+    if not os.path.exists(LDA_MODEL_DIR):
+        os.makedirs(LDA_MODEL_DIR)
+    lda_model.save(model_path)
+    _remove_stale_lda_models(model_key, num_topics, model_path)
+    return lda_model
+
+
+def lda_extract_keywords_by_corpus(texts, top_k, model_key, num_topics=5, multicore=False, tokenized_docs=None,
+                                   corpus_version="0-0"):
+    """
+    在整个语料上共享一个 LDA 模型，按 P(w|d) = Σ P(w|z) * P(z|d) 为每篇文章推断关键词。
+    :param texts: 文章正文列表
+    :param top_k: 选择前 K 个关键词
+    :param model_key: 模型键，如 "2024-10_所有分区"
+    :param num_topics: LDA 模型的主题数
+    :param multicore: 是否使用 LdaMulticore 多进程训练
+    :param tokenized_docs: 可选的已分词文档（[(词, 词性), ...] 列表），提供时不再分词
+    :param corpus_version: 语料版本，语料变化后模型重新训练
+    :return: 与输入顺序一致的关键词列表的列表
+    """
+    if tokenized_docs is None:
+        tokenized_docs = [[word for word in jieba.lcut(text) if len(word) > 1] for text in texts]
+    else:
+        tokenized_docs = [[word for word, _ in pairs if len(word) > 1] for pairs in tokenized_docs]
+    if not any(tokenized_docs):
+        print("输入文本分词后为空！")
+        return [[] for _ in tokenized_docs]
+    lda_model = get_lda_model(model_key, tokenized_docs, num_topics=num_topics, multicore=multicore,
+                              corpus_version=corpus_version)
+    dictionary = lda_model.id2word
+    topic_word = lda_model.get_topics()
+    all_keywords_list = []
+    for words in tokenized_docs:
+        bow = dictionary.doc2bow(words)
+        if not bow:
+            all_keywords_list.append([])
+            continue
+        doc_topic = np.zeros(lda_model.num_topics)
+        for topic_id, prob in lda_model.get_document_topics(bow, minimum_probability=0):
+            doc_topic[topic_id] = prob
+        word_ids = np.array([word_id for word_id, _ in bow])
+        scores = doc_topic @ topic_word[:, word_ids]
+        top_indices = np.argsort(-scores, kind='stable')[:top_k]
+        all_keywords_list.append(
+            [f"{dictionary[int(word_ids[i])]}:{round(float(scores[i]), 3)}" for i in top_indices]
+        )
+    return remove_rubbish_words_many(all_keywords_list)
+
+
 def pagerank_extract_keywords(text, top_k):
     """
     使用 TextRank 提取文本中的关键词。
@@ -64,6 +179,43 @@ def pagerank_extract_keywords(text, top_k):
         return []
 
 
+def pagerank_extract_keywords_from_tokens(tokenized_docs, top_k):
+    """
+    使用 TextRank 从已分词（带词性）的文档中批量提取关键词。
+    :param tokenized_docs: [(词, 词性), ...] 列表的列表
+    :param top_k: 选择前 K 个关键词
+    :return: 与输入顺序一致的格式化关键词列表的列表
+    """
+    docs = [textrank_extractor.filter_tokens(pairs) for pairs in tokenized_docs]
+    all_keywords_list = [
+        [f"{tag}:{round(weight, 3)}" for tag, weight in tags_list_with_weight]
+        for tags_list_with_weight in textrank_extractor.rank_many(docs, top_k)
+    ]
+    return remove_rubbish_words_many(all_keywords_list)
+
+
+def jieba_tfidf_extract_keywords_from_tokens(tokenized_docs, top_k):
+    """
+    使用 jieba 自带的 IDF 词典从已分词的文档中批量提取关键词，计算方式与 jieba.analyse.extract_tags 一致。
+    :param tokenized_docs: [(词, 词性), ...] 列表的列表，应为 jieba.cut 的分词结果（见 token_store.cut_tokenize），
+                           带词性的分词切分方式略有不同，结果会与 extract_tags 有出入
+    :param top_k: 选择前 K 个关键词
+    :return: 与输入顺序一致的关键词列表的列表
+    """
+    tfidf = jieba.analyse.default_tfidf
+    all_keywords_list = []
+    for pairs in tokenized_docs:
+        freq = Counter(
+            word for word, _ in pairs
+            if len(word.strip()) >= 2 and word.lower() not in tfidf.stop_words
+        )
+        total = sum(freq.values())
+        weights = {word: count * tfidf.idf_freq.get(word, tfidf.median_idf) / total for word, count in freq.items()}
+        tags_list_with_weight = sorted(weights.items(), key=lambda x: x[1], reverse=True)[:top_k]
+        all_keywords_list.append([f"{tag}:{weight}" for tag, weight in tags_list_with_weight])
+    return remove_rubbish_words_many(all_keywords_list)
+
+
 def jieba_tfidf_extract_keywords(text, top_k, docs=None):
     """
     提取文本中的关键词。
@@ -97,6 +249,75 @@ def tfidf_extract_keywords(top_k, idx, news_in_selected_month):
     return keywords_list
 
 
+def tfidf_extract_keywords_all(top_k, news_in_selected_month, corpus_stats=None, tokenized_docs=None):
+    """
+    一次性提取当月所有新闻的关键词，每篇新闻标题只分词一次。
+    :param top_k: 选择前 K 个关键词
+    :param news_in_selected_month: 当月新闻列表
+    :param corpus_stats: 可选的语料统计信息，用于跨月份计算 IDF
+    :param tokenized_docs: 可选的已分词标题（[(词, 词性), ...] 列表），提供时不再分词
+    :return: 与新闻顺序一致的关键词列表的列表
+    """
+    docs = [news.title for news in news_in_selected_month]
+    if tokenized_docs is not None:
+        tokenized_docs = [[word for word, _ in pairs] for pairs in tokenized_docs]
+    tfidf_extractor = CorpusTFIDF(docs, corpus_stats, tokenized_docs)
+    all_keywords_list = [
+        [f"{keyword}:{round(weight, 3)}" for keyword, weight in keywords_with_weight]
+        for keywords_with_weight in tfidf_extractor.extract_keywords_all(top_k)
+    ]
+    return remove_rubbish_words_many(all_keywords_list)
+
+
+# 文章数少于该值时直接在当前进程中分词，避免进程间通信的开销
+MIN_PARALLEL_SIZE = 64
+
+_executor = None
+_executor_workers = None
+
+
+def _init_extract_worker():
+    """
+    进程池中每个工作进程只初始化一次 jieba
+    """
+    logging.getLogger('jieba').setLevel(logging.ERROR)
+    jieba.initialize()
+
+
+def _get_executor(max_workers):
+    """
+    获取常驻的进程池，工作进程在多次提取之间复用
+    """
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != max_workers:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_extract_worker)
+        _executor_workers = max_workers
+    return _executor
+
+
+def _tokenize_chunk(tokenize, texts):
+    return [tokenize(text) for text in texts]
+
+
+def batch_tokenize(texts, tokenize, max_workers=None):
+    """
+    将一批文章分块交给进程池并行分词。
+    :param texts: 文章列表
+    :param tokenize: 单篇分词函数（需为模块级函数，以便传给工作进程）
+    :param max_workers: 工作进程数，默认为 CPU 核数
+    :return: 与输入顺序一致的分词结果列表
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(texts) < MIN_PARALLEL_SIZE:
+        return _tokenize_chunk(tokenize, texts)
+    chunk_size = math.ceil(len(texts) / (max_workers * 4))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    results = _get_executor(max_workers).map(_tokenize_chunk, repeat(tokenize), chunks)
+    return [tokens for chunk in results for tokens in chunk]
+
+
 def get_mon_keywords_with_count_list(all_mon_keywords_list, top_k):
     """
     获取关键词及其出现次数的统计列表。
@@ -117,27 +338,20 @@ def remove_rubbish_words(mon_keywords_list):
     :return: 去除无用关键词后的列表
     """
     try:
-        with open('./utils/remove_keywords_list.txt', 'r', encoding='UTF-8') as f:
-            rubbish_word_list = [line.strip() for line in f.readlines()]
-        def is_pure_english(word):
-            return bool(re.match(r'^[a-zA-Z]+$', word))  # 纯英文
-        def is_pure_number(word):
-            return bool(re.match(r'^\d+$', word))  # 纯数字
-        def is_decimal(word):
-            return bool(re.match(r'^\d*\.\d+$', word))  # 小数
-        def is_space(word):
-            return bool(re.match(r'^\s$', word))
-        def is_pure_symbol(word):
-            return bool(re.match(r'^[^\u4e00-\u9fa5a-zA-Z0-9\s]+$', word))
-        mon_keywords_list = [
-            word for word in mon_keywords_list
-            if word.split(":")[0] not in rubbish_word_list
-               and not is_pure_english(word.split(":")[0])
-               and not is_pure_number(word.split(":")[0])
-               and not is_decimal(word.split(":")[0])
-               and not is_space(word.split(":")[0])
-               and not is_pure_symbol(word.split(":")[0])
-        ]
+        mon_keywords_list = default_rubbish_filter.filter(mon_keywords_list)
     except Exception as e:
         print("Error loading rubbish words:", e)
     return mon_keywords_list
+
+
+def remove_rubbish_words_many(keywords_lists):
+    """
+    批量移除多篇文章关键词列表中的无用关键词。
+    :param keywords_lists: 关键词列表的列表
+    :return: 去除无用关键词后的列表的列表
+    """
+    try:
+        keywords_lists = default_rubbish_filter.filter_many(keywords_lists)
+    except Exception as e:
+        print("Error loading rubbish words:", e)
+    return keywords_lists
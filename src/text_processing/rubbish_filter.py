@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 11:05
+@Auth: Zhang Hongxing
+@File: rubbish_filter.py
+@Note: 无用关键词过滤器，词表只在文件修改后重新加载
+"""
+import os
+import re
+
+RUBBISH_WORDS_PATH = './utils/remove_keywords_list.txt'
+
+# 纯英文、纯数字、小数、单个空白字符、纯符号
+RUBBISH_PATTERN = re.compile(
+    r'^(?:[a-zA-Z]+|\d+|\d*\.\d+|\s|[^\u4e00-\u9fa5a-zA-Z0-9\s]+)$'
+)
+
+
+class RubbishWordFilter:
+    def __init__(self, path=RUBBISH_WORDS_PATH):
+        """
+        :param path: 需移除关键词文件的路径
+        """
+        self.path = path
+        self.mtime = None
+        self.rubbish_words = frozenset()
+
+    def _reload_if_changed(self):
+        """
+        文件修改时间变化时才重新读取词表
+        """
+        mtime = os.path.getmtime(self.path)
+        if mtime != self.mtime:
+            with open(self.path, 'r', encoding='UTF-8') as f:
+                self.rubbish_words = frozenset(line.strip() for line in f)
+            self.mtime = mtime
+
+    def is_rubbish(self, word):
+        return word in self.rubbish_words or RUBBISH_PATTERN.match(word) is not None
+
+    def filter(self, keywords_list):
+        """
+        移除无用关键词
+        :param keywords_list: "关键词:权重" 格式的列表
+        :return: 去除无用关键词后的列表
+        """
+        return self.filter_many([keywords_list])[0]
+
+    def filter_many(self, keywords_lists):
+        """
+        一次过滤多篇文章的关键词列表
+        :param keywords_lists: 多个 "关键词:权重" 格式的列表
+        :return: 去除无用关键词后的列表的列表
+        """
+        self._reload_if_changed()
+        return [
+            [item for item in keywords_list if not self.is_rubbish(item.split(":")[0])]
+            for keywords_list in keywords_lists
+        ]
+
+
+default_filter = RubbishWordFilter()
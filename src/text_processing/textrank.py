@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 13:20
+@Auth: Zhang Hongxing
+@File: textrank.py
+@Note: 基于稀疏共现图与向量化幂迭代的 TextRank，可一次处理一整个月的文档
+"""
+import jieba.analyse
+import numpy as np
+
+# 与 jieba.analyse.textrank 的默认参数保持一致
+ALLOW_POS = ('ns', 'n', 'vn', 'v')
+WINDOW_SPAN = 5
+DAMPING = 0.85
+ITERATIONS = 10
+
+
+def build_cooccurrence_graph(docs, span=WINDOW_SPAN):
+    """
+    为一批文档构建共现窗口图，每个文档的词是图中独立的一组节点（块对角）。
+    :param docs: 分词并按词性过滤后的文档列表，被过滤掉的位置以 None 占位，使共现窗口与 jieba 一致
+    :param span: 共现窗口大小
+    :return: (node_words, node_docs, rows, cols, weights)，边以 COO 形式给出且已双向展开、合并重复边
+    """
+    node_words = []
+    node_docs = []
+    sequences = []
+    padding = np.full(span - 1, -1, dtype=np.int64)
+    for doc_idx, tokens in enumerate(docs):
+        local_nodes = {}
+        sequence = np.full(len(tokens), -1, dtype=np.int64)
+        for i, word in enumerate(tokens):
+            if word is None:
+                continue
+            node = local_nodes.get(word)
+            if node is None:
+                node = len(node_words)
+                local_nodes[word] = node
+                node_words.append(word)
+                node_docs.append(doc_idx)
+            sequence[i] = node
+        # 文档之间用 -1 隔开，窗口不会跨越文档
+        sequences.append(sequence)
+        sequences.append(padding)
+    node_docs = np.asarray(node_docs, dtype=np.int64)
+    sequence = np.concatenate(sequences) if sequences else np.empty(0, dtype=np.int64)
+    starts = []
+    ends = []
+    for offset in range(1, span):
+        start, end = sequence[:-offset], sequence[offset:]
+        mask = (start >= 0) & (end >= 0)
+        starts.append(start[mask])
+        ends.append(end[mask])
+    starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+    ends = np.concatenate(ends) if ends else np.empty(0, dtype=np.int64)
+    # 无向图：每条共现边双向各记一次
+    rows = np.concatenate((starts, ends))
+    cols = np.concatenate((ends, starts))
+    num_nodes = max(len(node_words), 1)
+    edge_keys, edge_index = np.unique(rows * num_nodes + cols, return_inverse=True)
+    weights = np.bincount(edge_index.ravel(), minlength=edge_keys.size).astype(np.float64)
+    rows, cols = np.divmod(edge_keys, num_nodes)
+    return node_words, node_docs, rows, cols, weights
+
+
+class TextRank:
+    def __init__(self, span=WINDOW_SPAN, damping=DAMPING, iterations=ITERATIONS, allow_pos=ALLOW_POS):
+        """
+        :param span: 共现窗口大小
+        :param damping: 阻尼因子
+        :param iterations: 幂迭代次数
+        :param allow_pos: 保留的词性
+        """
+        self.span = span
+        self.damping = damping
+        self.iterations = iterations
+        self.allow_pos = frozenset(allow_pos)
+        self.stop_words = jieba.analyse.default_textrank.stop_words
+
+    def filter_tokens(self, word_flag_pairs):
+        """
+        按词性、词长与停用词过滤，被过滤的位置以 None 占位
+        :param word_flag_pairs: [(词, 词性), ...]
+        :return: 过滤后的文档
+        """
+        return [
+            word if flag in self.allow_pos and len(word.strip()) >= 2 and word.lower() not in self.stop_words
+            else None
+            for word, flag in word_flag_pairs
+        ]
+
+    def rank_many(self, docs, top_k=20):
+        """
+        在所有文档组成的块对角图上一次完成幂迭代，返回每个文档的前 top_k 个词
+        :param docs: 过滤后的文档列表
+        :param top_k: 取前 K 个关键词
+        :return: 列表，每个元素为对应文档的 [(关键词, 权重), ...]
+        """
+        results = [[] for _ in docs]
+        node_words, node_docs, rows, cols, weights = build_cooccurrence_graph(docs, self.span)
+        num_nodes = len(node_words)
+        if not num_nodes or not weights.size:
+            return results
+        out_sum = np.bincount(rows, weights=weights, minlength=num_nodes)
+        has_edge = out_sum > 0
+        # 每个文档的初始权重为 1 / 该文档的节点数
+        doc_sizes = np.bincount(node_docs[has_edge], minlength=len(docs))
+        ws = np.where(has_edge, 1.0 / np.maximum(doc_sizes[node_docs], 1), 0.0)
+        transition = weights / out_sum[cols]
+        for _ in range(self.iterations):
+            ws = (1 - self.damping) + self.damping * np.bincount(rows, weights=transition * ws[cols],
+                                                                 minlength=num_nodes)
+        # 与 jieba 相同的按文档归一化
+        nodes = np.flatnonzero(has_edge)
+        docs_of_nodes = node_docs[nodes]
+        scores = ws[nodes]
+        doc_min = np.full(len(docs), np.inf)
+        doc_max = np.full(len(docs), -np.inf)
+        np.minimum.at(doc_min, docs_of_nodes, scores)
+        np.maximum.at(doc_max, docs_of_nodes, scores)
+        min_rank = doc_min[docs_of_nodes] / 10.0
+        scores = (scores - min_rank) / (doc_max[docs_of_nodes] - min_rank)
+        # 按文档、权重降序排序后取每个文档的前 top_k 个
+        order = np.lexsort((-scores, docs_of_nodes))
+        sorted_docs = docs_of_nodes[order]
+        rank = np.arange(order.size) - np.searchsorted(sorted_docs, sorted_docs, side='left')
+        order = order[rank < top_k]
+        for doc_idx, node, score in zip(docs_of_nodes[order].tolist(), nodes[order].tolist(),
+                                        scores[order].tolist()):
+            results[doc_idx].append((node_words[node], score))
+        return results
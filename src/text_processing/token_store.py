@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 14:40
+@Auth: Zhang Hongxing
+@File: token_store.py
+@Note: 按新闻 id 与分词器版本持久化的分词结果，每篇新闻只分词一次
+"""
+import json
+import os
+import struct
+import zlib
+from array import array
+from contextlib import contextmanager
+
+import jieba
+import jieba.posseg
+
+TOKEN_STORE_DIR = './utils/token_store'
+# 记录头：新闻 id、原文 crc32 校验值、词数；之后紧跟 词数 个 int32 词 id
+RECORD_HEADER = struct.Struct('<qIi')
+# 索引记录：新闻 id、词 id 在记录文件中的偏移量、原文 crc32 校验值、词数，与记录同步追加
+INDEX_RECORD = struct.Struct('<qqIi')
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _lock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def posseg_tokenize(text):
+    """
+    带词性的分词，供 TextRank 按词性过滤
+    :return: [(词, 词性), ...]
+    """
+    return [(pair.word, pair.flag) for pair in jieba.posseg.cut(text or "")]
+
+
+def cut_tokenize(text):
+    """
+    不带词性的分词，与 TFIDF 类的分词方式一致
+    :return: [(词, ''), ...]
+    """
+    return [(word, '') for word in jieba.cut(text or "")]
+
+
+# 分词方式变化时修改版本号，旧的分词结果会自动失效
+TOKENIZERS = {
+    'posseg': (posseg_tokenize, f"posseg-{jieba.__version__}-v1"),
+    'cut': (cut_tokenize, f"cut-{jieba.__version__}-v1"),
+}
+
+
+def _checksum(text):
+    return zlib.crc32((text or "").encode('utf-8'))
+
+
+class TokenStore:
+    def __init__(self, field='body', tokenizer='posseg', store_dir=TOKEN_STORE_DIR):
+        """
+        分词结果存储：词表文件 + 追加写入的二进制记录文件 + 记录位置的索引文件
+        :param field: 分词的新闻字段
+        :param tokenizer: 分词方式，见 TOKENIZERS
+        :param store_dir: 存储目录
+        """
+        self.field = field
+        self.tokenize, self.version = TOKENIZERS[tokenizer]
+        self.store_dir = os.path.join(store_dir, f"{field}_{self.version}")
+        self.vocab_path = os.path.join(self.store_dir, 'vocab.jsonl')
+        self.data_path = os.path.join(self.store_dir, 'tokens.bin')
+        self.index_path = os.path.join(self.store_dir, 'index.bin')
+        self.lock_path = os.path.join(self.store_dir, 'write.lock')
+        self.term2id = {}
+        self.id2term = []
+        # 新闻 id -> (记录中词 id 的偏移量, 校验值, 词数)，同一新闻以最后写入的记录为准
+        self.index = {}
+        # 已读入内存的各文件长度，其他进程追加的内容从这里继续读取
+        self.vocab_size = 0
+        self.index_size = 0
+        self.data_size = 0
+        # 从记录文件尾部补读、尚未写入索引文件的索引记录
+        self.unindexed = []
+        if not os.path.exists(self.store_dir):
+            os.makedirs(self.store_dir)
+        self._load()
+        if self.unindexed:
+            with self._write_lock():
+                self._load()
+                self._truncate_tails()
+                self._append_index([])
+
+    @contextmanager
+    def _write_lock(self):
+        """
+        多个进程向同一存储追加时互斥
+        """
+        with open(self.lock_path, 'a+b') as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+    def _load(self):
+        """
+        增量读取其他进程（或上次运行）追加的内容。记录文件只读取索引未覆盖的尾部记录头；
+        词表最后读取，写入顺序是词表、记录、索引，因此已读到的记录引用的词都在词表中
+        """
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                f.seek(self.index_size)
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            for news_id, offset, checksum, length in INDEX_RECORD.iter_unpack(data[:usable]):
+                self.index[news_id] = (offset, checksum, length)
+                self.data_size = max(self.data_size, offset + length * 4)
+            self.index_size += usable
+        if os.path.exists(self.data_path):
+            # 写索引前中断或由旧版本写入时，记录文件末尾有索引中没有的记录，逐个读取记录头补上
+            with open(self.data_path, 'rb') as f:
+                end = f.seek(0, os.SEEK_END)
+                offset = self.data_size
+                while offset + RECORD_HEADER.size <= end:
+                    f.seek(offset)
+                    news_id, checksum, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                    offset += RECORD_HEADER.size
+                    if offset + length * 4 > end:
+                        # 写入中断留下的不完整记录
+                        break
+                    self.index[news_id] = (offset, checksum, length)
+                    self.unindexed.append(INDEX_RECORD.pack(news_id, offset, checksum, length))
+                    offset += length * 4
+                    self.data_size = offset
+        if os.path.exists(self.vocab_path):
+            with open(self.vocab_path, 'rb') as f:
+                f.seek(self.vocab_size)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # 写入中断留下的不完整行
+                        break
+                    word, flag = json.loads(line.decode('utf-8'))
+                    self.term2id[(word, flag)] = len(self.id2term)
+                    self.id2term.append((word, flag))
+                    self.vocab_size += len(line)
+
+    def _truncate_tails(self):
+        """
+        持有写锁时截掉写入中断留下的不完整内容，之后的追加才能对齐
+        """
+        for path, size in ((self.vocab_path, self.vocab_size), (self.data_path, self.data_size),
+                           (self.index_path, self.index_size)):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _append_index(self, index_records):
+        index_records = self.unindexed + index_records
+        if not index_records:
+            return
+        with open(self.index_path, 'ab') as f:
+            f.write(b''.join(index_records))
+            self.index_size = f.tell()
+        self.unindexed = []
+
+    def _read_many(self, news_ids):
+        results = {}
+        with open(self.data_path, 'rb') as f:
+            for news_id in news_ids:
+                offset, _, length = self.index[news_id]
+                f.seek(offset)
+                term_ids = array('i')
+                term_ids.frombytes(f.read(length * 4))
+                results[news_id] = [self.id2term[term_id] for term_id in term_ids]
+        return results
+
+    def _write_many(self, records):
+        """
+        追加写入分词结果，先写词表再写记录，最后写索引，保证引用的词 id 与记录都已落盘
+        :param records: [(新闻id, 原文, [(词, 词性), ...]), ...]
+        """
+        with self._write_lock():
+            # 先读入其他进程已追加的内容，词 id 才不会冲突
+            self._load()
+            self._truncate_tails()
+            new_terms = []
+            encoded = []
+            for news_id, text, pairs in records:
+                checksum = _checksum(text)
+                if news_id in self.index and self.index[news_id][1] == checksum:
+                    # 其他进程已写入
+                    continue
+                term_ids = array('i')
+                for pair in pairs:
+                    term_id = self.term2id.get(pair)
+                    if term_id is None:
+                        term_id = len(self.id2term)
+                        self.term2id[pair] = term_id
+                        self.id2term.append(pair)
+                        new_terms.append(pair)
+                    term_ids.append(term_id)
+                encoded.append((news_id, checksum, term_ids))
+            if new_terms:
+                with open(self.vocab_path, 'ab') as f:
+                    for word, flag in new_terms:
+                        f.write((json.dumps([word, flag], ensure_ascii=False) + '\n').encode('utf-8'))
+                    self.vocab_size = f.tell()
+            if not encoded:
+                self._append_index([])
+                return
+            index_records = []
+            with open(self.data_path, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                for news_id, checksum, term_ids in encoded:
+                    f.write(RECORD_HEADER.pack(news_id, checksum, len(term_ids)))
+                    offset += RECORD_HEADER.size
+                    f.write(term_ids.tobytes())
+                    self.index[news_id] = (offset, checksum, len(term_ids))
+                    index_records.append(INDEX_RECORD.pack(news_id, offset, checksum, len(term_ids)))
+                    offset += len(term_ids) * 4
+                self.data_size = offset
+            self._append_index(index_records)
+
+    def get_or_tokenize(self, news_id_and_texts, tokenize_many=None):
+        """
+        读取分词结果，只对新出现或内容有变化的新闻分词并写入存储
+        :param news_id_and_texts: [(新闻id, 原文), ...]
+        :param tokenize_many: 可选的批量分词函数（如进程池并行分词），默认在当前进程中逐篇分词
+        :return: 与输入顺序一致的 [(词, 词性), ...] 列表
+        """
+        news_id_and_texts = list(news_id_and_texts)
+        missing = [
+            (news_id, text) for news_id, text in news_id_and_texts
+            if news_id not in self.index or self.index[news_id][1] != _checksum(text)
+        ]
+        if missing:
+            print(f"分词缓存未命中 {len(missing)} 篇新闻，开始分词")
+            texts = [text for _, text in missing]
+            if tokenize_many:
+                tokenized = tokenize_many(texts)
+            else:
+                tokenized = [self.tokenize(text) for text in texts]
+            self._write_many([(news_id, text, pairs) for (news_id, text), pairs in zip(missing, tokenized)])
+        tokens = self._read_many({news_id for news_id, _ in news_id_and_texts})
+        return [tokens[news_id] for news_id, _ in news_id_and_texts]
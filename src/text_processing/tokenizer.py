@@ -22,10 +22,18 @@ def text_filter(text):
 def segment(text):
     return jieba.lcut(text)
 
-def bi_mm_segment(text):
-    # 创建词典
+WORD_DICT_DIR = './utils/word_dict'
+# 字典树中表示词语结束的键（单个字符不可能为空串）
+TRIE_END = ''
+
+
+def load_word_dict(folder_path=WORD_DICT_DIR):
+    """
+    读取目录下所有词典文件，每行一个词
+    :param folder_path: 词典目录
+    :return: 词语集合
+    """
     word_dict = set()
-    folder_path = r'U:\THE_WAY_TO_CODE\MonKeyWords\utils\word_dict'
     for filename in os.listdir(folder_path):
         file_path = os.path.join(folder_path, filename)
         if os.path.isfile(file_path):
@@ -34,47 +42,154 @@ def bi_mm_segment(text):
                     word = line.strip()
                     if word:
                         word_dict.add(word)
-    max_len = max(len(word) for word in word_dict)
-    # 分别进行前后最大匹配算法
-    forward_result = fmm_segment(text, max_len, word_dict)
-    backward_result = bmm_segment(text, max_len, word_dict)
-    # 取结果较好的
-    if len(forward_result) < len(backward_result):
-        return forward_result
-    elif len(forward_result) > len(backward_result):
-        return backward_result
-    else:
-        # 如果正向和逆向结果长度相同，选择单字数更少的结果
-        forward_single_count = sum(1 for word in forward_result if len(word) == 1)
-        backward_single_count = sum(1 for word in backward_result if len(word) == 1)
-        return forward_result if forward_single_count < backward_single_count else backward_result
+    return word_dict
 
 
-def fmm_segment(text, max_len, word_dict):
-    result = []
-    while text:
-        sub_text = text[:max_len]
-        for i in range(max_len, 0, -1):
-            if sub_text[:i] in word_dict:
-                result.append(sub_text[:i])
-                text = text[i:]
+class MaxMatchSegmenter:
+    def __init__(self, dict_dir=WORD_DICT_DIR, words=None):
+        """
+        基于字典树的双向最大匹配分词器，词典只在构造时加载一次
+        :param dict_dir: 词典目录
+        :param words: 可选的词语集合，提供时不再读取词典目录
+        """
+        self.forward_trie = {}
+        self.backward_trie = {}
+        self.max_len = 0
+        for word in (load_word_dict(dict_dir) if words is None else words):
+            self.add_word(word)
+
+    def add_word(self, word):
+        """
+        向正向、逆向字典树中加入一个词
+        """
+        node = self.forward_trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[TRIE_END] = True
+        node = self.backward_trie
+        for char in reversed(word):
+            node = node.setdefault(char, {})
+        node[TRIE_END] = True
+        self.max_len = max(self.max_len, len(word))
+
+    def _forward_match(self, text, start):
+        """
+        从 start 开始沿字典树正向匹配，返回最长词的结束位置（无匹配时为单字）
+        """
+        node = self.forward_trie
+        end = start + 1
+        i = start
+        while i < len(text):
+            node = node.get(text[i])
+            if node is None:
                 break
+            i += 1
+            if TRIE_END in node:
+                end = i
+        return end
+
+    def _backward_match(self, text, end):
+        """
+        从 end 开始沿字典树逆向匹配，返回最长词的起始位置（无匹配时为单字）
+        """
+        node = self.backward_trie
+        start = end - 1
+        i = end
+        while i > 0:
+            node = node.get(text[i - 1])
+            if node is None:
+                break
+            i -= 1
+            if TRIE_END in node:
+                start = i
+        return start
+
+    def fmm_spans(self, text):
+        """
+        正向最大匹配，返回每个词的 (起始, 结束) 下标
+        """
+        spans = []
+        i = 0
+        while i < len(text):
+            end = self._forward_match(text, i)
+            spans.append((i, end))
+            i = end
+        return spans
+
+    def bmm_spans(self, text):
+        """
+        逆向最大匹配，返回每个词的 (起始, 结束) 下标
+        """
+        spans = []
+        j = len(text)
+        while j > 0:
+            start = self._backward_match(text, j)
+            spans.append((start, j))
+            j = start
+        return spans[::-1]
+
+    def segment(self, text):
+        """
+        双向最大匹配分词：取词数更少的结果，词数相同时取单字更少的结果
+        :param text: 输入文本
+        :return: 词语列表
+        """
+        forward_spans = self.fmm_spans(text)
+        backward_spans = self.bmm_spans(text)
+        if len(forward_spans) < len(backward_spans):
+            spans = forward_spans
+        elif len(forward_spans) > len(backward_spans):
+            spans = backward_spans
         else:
-            result.append(sub_text[0])
-            text = text[1:]
+            forward_single_count = sum(1 for start, end in forward_spans if end - start == 1)
+            backward_single_count = sum(1 for start, end in backward_spans if end - start == 1)
+            spans = forward_spans if forward_single_count < backward_single_count else backward_spans
+        return [text[start:end] for start, end in spans]
+
+    def segment_many(self, texts):
+        """
+        批量分词
+        :param texts: 文本列表
+        :return: 与输入顺序一致的词语列表的列表
+        """
+        return [self.segment(text) for text in texts]
+
+
+_segmenters = {}
+
+
+def get_segmenter(dict_dir=WORD_DICT_DIR):
+    """
+    获取按词典目录缓存的分词器，同一目录的词典只加载一次
+    """
+    if dict_dir not in _segmenters:
+        _segmenters[dict_dir] = MaxMatchSegmenter(dict_dir)
+    return _segmenters[dict_dir]
+
+
+def bi_mm_segment(text, dict_dir=WORD_DICT_DIR):
+    return get_segmenter(dict_dir).segment(text)
+
+
+def fmm_segment(text, max_len, word_dict):
+    result = []
+    i = 0
+    while i < len(text):
+        length = min(max_len, len(text) - i)
+        while length > 1 and text[i:i + length] not in word_dict:
+            length -= 1
+        result.append(text[i:i + length])
+        i += length
     return result
 
 
 def bmm_segment(text, max_len, word_dict):
     result = []
-    while text:
-        sub_text = text[-max_len:]
-        for i in range(max_len, 0, -1):
-            if sub_text[:i] in word_dict:
-                result.append(sub_text[:i])
-                text = text[:-i]
-                break
-        else:
-            result.append(sub_text[0])
-            text = text[1:]
+    j = len(text)
+    while j > 0:
+        length = min(max_len, j)
+        while length > 1 and text[j - length:j] not in word_dict:
+            length -= 1
+        result.append(text[j - length:j])
+        j -= length
     return result[::-1]
@@ -40,7 +40,7 @@ class MonKeyWords(QWidget):
         # 获取关键词按钮
         self.get_keywords_btn = QPushButton('【🐒直接获取月度关键词！】')
         self.get_keywords_btn.setStyleSheet("font-size: 20px; color: black; font-family: 微软雅黑;")
-        self.get_keywords_btn.clicked.connect(self.views.get_keywords)
+        self.get_keywords_btn.clicked.connect(lambda: self.views.get_keywords())
         # 选择算法
         self.algorithm_combobox = QComboBox()
         self.algorithm_combobox.addItem("jieba提供的TF-IDF")
@@ -143,10 +143,10 @@ class MonKeyWords(QWidget):
     def search_news(self, search_keyword, selected_month):
         # print("正在搜索: ", search_keyword)
         selected_category = self.category_combobox.currentText()
-        news_results = self.views.news_service.search_news_by_keyword(search_keyword, selected_month, selected_category)
+        first_page = self.views.news_service.search_news_by_keyword(search_keyword, selected_month, selected_category)
         if self.current_dialog:
             self.current_dialog.close()
-        if news_results:
+        if first_page:
             dialog = QDialog(self)
             dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
             dialog.resize(1200, 1400)
@@ -165,12 +165,13 @@ class MonKeyWords(QWidget):
             # 显示新闻的浏览器
             text_browser = QTextBrowser(dialog)
             text_browser.setOpenExternalLinks(True)
-            processed_news, original_news = self.format_news_results(search_keyword, selected_month, news_results)
-            text_browser.setHtml(processed_news)
+            # 先显示第一页，其余页在窗口显示后逐页追加
+            titles = self.views.stream_news_pages(text_browser, selected_month, search_keyword, selected_category,
+                                                  first_page=first_page, search=True)
             summary_button = QPushButton('🤖【生成摘要】', dialog)
             summary_button.setStyleSheet("font-size: 20px; color: black; font-family: 微软雅黑;")
             summary_button.clicked.connect(
-                lambda: self.views.generate_summary(original_news, search_keyword))
+                lambda: self.views.generate_summary("".join(titles), search_keyword))
             # 设置布局
             layout = QVBoxLayout(dialog)
             layout.addWidget(month_search_label)
@@ -203,17 +204,18 @@ class MonKeyWords(QWidget):
         font.setFamily("微软雅黑")
         text_browser.setCurrentFont(font)
         # 获取相关的新闻和词频信息
-        processed_news, original_news = self.views.get_news_list(str(keyword.split(':')[0]))
-        if processed_news == "未找到相关新闻":
+        # 先显示第一页，其余页在窗口显示后逐页追加
+        titles = self.views.stream_news_pages(text_browser, date, str(keyword.split(':')[0]))
+        if titles is None:
             QMessageBox.warning(self, "MonKeyWords 🐒", "没有找到与该关键词相关的新闻！")
-        # 设置文本浏览器显示新闻
-        text_browser.setHtml(processed_news)
+            text_browser.setHtml("未找到相关新闻")
+            titles = []
         text_browser.setOpenExternalLinks(True)
         text_browser.setAlignment(Qt.AlignCenter)
         # 创建生成摘要的按钮
         summary_button = QPushButton('🤖【生成摘要】', dialog)
         summary_button.setStyleSheet("font-size: 20px; color: black; font-family: 微软雅黑;")
-        summary_button.clicked.connect(lambda: self.views.generate_summary(original_news, keyword))
+        summary_button.clicked.connect(lambda: self.views.generate_summary("".join(titles), keyword))
         # 设置布局
         layout = QVBoxLayout(dialog)
         layout.addWidget(text_browser)
@@ -222,45 +224,6 @@ class MonKeyWords(QWidget):
         # 显示新的窗口
         dialog.exec_()
 
-    def format_news_results(self, search_keyword, selected_month, news_results):
-        print("关键词: ", search_keyword)
-        print("月份: ", selected_month)
-        html_content = (f'<p style="font-size: 25px; text-align: center; font-family: 微软雅黑;">' +
-                        f"<h3>关键词【{search_keyword}】在【{selected_month.split('-')[0]}】年【{selected_month.split('-')[1]}】月份的相关新闻共有{len(news_results)}条（按时间排序）</h3></p>")
-        # 遍历新闻结果，构建HTML内容
-        original_news = ""
-        index = 1
-        for news in news_results:
-            title = news.get('title', '无标题')
-            summary = news.get('summary', '无摘要')
-            url = news.get('url', '#')
-            pub_time = news.get('pub_time', '未知')
-            pub_time = str(pub_time).split(' ')[0]
-            category = news.get('category', '未知')
-            keywords = news.get('keywords', '未知')
-            if keywords != '未知':
-                keywords = keywords.split(',')
-                for idx, keyword in enumerate(keywords):
-                    keywords[idx] = keyword.split(':')[0]
-                keywords = keywords[:10]
-                keywords = ', '.join(keywords).strip(',')
-            html_content += f"""
-                <div style="margin-bottom: 20px; font-size: 22px;">
-                    <p style="font-size: 28px; text-align: center; font-family: 微软雅黑;">
-                        <a href='{url}' style="color: #1E90FF; text-decoration: none;">{title}</a>
-                    </p>
-                    <p><strong>发布时间：</strong>{str(pub_time).split(' ')[0]}</p>
-                    <p><strong>分区：</strong>{category}</p>
-                    <p><strong>关键词：</strong>{keywords}</p>
-                    <p style="font-size: 22px; font-family: 微软雅黑; color: #333333;">{summary}</p>
-                </div>
-            """
-            original_news += str(index) + '. ' + news.get('title', '无标题')
-            index += 1
-        # print("HTML内容: ", html_content)
-        # print("原始新闻: ", original_news)
-        return html_content, original_news
-
     def show_help_dialog(self):
         help_dialog = QDialog(self)
         help_dialog.setWindowTitle('项目介绍、公式与使用说明')
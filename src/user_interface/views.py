@@ -13,29 +13,64 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
+from PyQt5.QtGui import QPixmap, QTextCursor
 from PyQt5.QtWidgets import QMessageBox, QListWidgetItem, QLabel, QDialog, QVBoxLayout, QDialogButtonBox
 from wordcloud import WordCloud
 
 from Mysql.db_config import DB_PARAMS
-from Redis.redis_config import get_redis_cluster_client
+from Redis.near_cache import get_two_tier_cache
 from ..data_storage.database import Database
 from ..data_storage.models import News, Cloud, Summary
 from ..services.crawl_service import CrawlService
 from ..services.keyword_service import KeywordService
 from ..services.news_service import NewsService
 from ..text_processing.summarize import SparkAIChatSummarizer
+from .workers import run_in_background
+
+NEWS_LIST_HEADER_TEMPLATE = (
+    '<p style="font-size: 25px; text-align: center; font-family: 微软雅黑;">'
+    '<h3>关键词【{keyword}】在【{year}】年【{month}】月份的相关新闻共有{count}条（按关键词相关指数排序）</h3></p>'
+)
+NEWS_ITEM_TEMPLATE = """
+    <div style="margin-bottom: 20px; font-size: 22px;">
+        <p style="font-size: 28px; text-align: center; font-family: 微软雅黑;">
+            <a href="{url}" style="color: #1E90FF; text-decoration: none;">{title}</a>
+        </p>
+        <p><strong>发布时间：</strong>{pub_date}</p>
+        <p><strong>分区：</strong>{category}</p>
+        <p><strong>重要指数：</strong>{weight}</p>
+        <p style="font-size: 22px; font-family: 微软雅黑; color: #333333;">{summary}</p>
+    </div>
+"""
+SEARCH_HEADER_TEMPLATE = (
+    '<p style="font-size: 25px; text-align: center; font-family: 微软雅黑;">'
+    '<h3>关键词【{keyword}】在【{year}】年【{month}】月份的相关新闻共有{count}条（按时间排序）</h3></p>'
+)
+SEARCH_ITEM_TEMPLATE = """
+    <div style="margin-bottom: 20px; font-size: 22px;">
+        <p style="font-size: 28px; text-align: center; font-family: 微软雅黑;">
+            <a href='{url}' style="color: #1E90FF; text-decoration: none;">{title}</a>
+        </p>
+        <p><strong>发布时间：</strong>{pub_date}</p>
+        <p><strong>分区：</strong>{category}</p>
+        <p><strong>关键词：</strong>{keywords}</p>
+        <p style="font-size: 22px; font-family: 微软雅黑; color: #333333;">{summary}</p>
+    </div>
+"""
 
 
 class MonKeyWordsViews:
     def __init__(self, main_window):
         self.main_window = main_window
         self.news_service = NewsService(self.main_window.db)
-        self.keyword_service = KeywordService(self.main_window.db)
+        self.keyword_service = KeywordService(self.main_window.db, self.news_service.bloom_filter)
         self.crawl_service = CrawlService(self.main_window.db)
         self.db_params = DB_PARAMS
         self.db = Database(self.db_params)
-        self.redis_client = get_redis_cluster_client()
+        # 词云与摘要的缓存先查进程内缓存，再查 Redis
+        self.cache = get_two_tier_cache()
+        # 运行中的后台线程
+        self.background_tasks = set()
         # Flask的配置，上传文件夹路径
         self.UPLOAD_FOLDER = 'static/wordclouds'
         # 创建文件夹（如果不存在）
@@ -105,13 +140,34 @@ class MonKeyWordsViews:
     获取关键词
     '''
 
-    def get_keywords(self):
+    def get_keywords(self, on_done=None):
+        """
+        在后台线程中提取关键词，完成后在界面线程中填充关键词列表
+        :param on_done: 填充完成后的回调，参数为带词频的关键词列表
+        """
         algorithm = self.main_window.algorithm_combobox.currentText()
         top_k = self.main_window.keywords_count_spinbox.value()
         selected_month = self.main_window.month_combobox.currentText()
         selected_category = self.main_window.category_combobox.currentText()
-        _, mon_keywords_list_with_count = self.keyword_service.fetch_keywords_by_time(selected_month, selected_category,
-                                                                                      top_k, algorithm)
+        self.main_window.get_keywords_btn.setEnabled(False)
+
+        def on_success(result):
+            self.main_window.get_keywords_btn.setEnabled(True)
+            _, mon_keywords_list_with_count = result
+            self.show_keywords(algorithm, mon_keywords_list_with_count)
+            if on_done is not None:
+                on_done(mon_keywords_list_with_count)
+
+        def on_failure(message):
+            self.main_window.get_keywords_btn.setEnabled(True)
+            print(f"Error while extracting keywords: {message}")
+            QMessageBox.critical(self.main_window, "MonKeyWords 🐒", "提取关键词时出错！")
+
+        run_in_background(self.background_tasks, self.keyword_service.fetch_keywords_by_time,
+                          selected_month, selected_category, top_k, algorithm,
+                          on_success=on_success, on_failure=on_failure)
+
+    def show_keywords(self, algorithm, mon_keywords_list_with_count):
         self.main_window.keywords_label.clear()
         if algorithm == "jieba提供的TF-IDF" or algorithm == "自行编写的TF-IDF（要等较长时间）":
             label = QListWidgetItem('关键词:词频（tf-idf）')
@@ -126,7 +182,6 @@ class MonKeyWordsViews:
             item = QListWidgetItem(keyword)
             item.setData(Qt.UserRole, keyword)
             self.main_window.keywords_label.addItem(item)
-        return mon_keywords_list_with_count
 
     '''
     获取新闻
@@ -134,7 +189,101 @@ class MonKeyWordsViews:
 
     def get_news_list(self, keyword):
         selected_month = self.main_window.month_combobox.currentText()
-        return self.news_service.get_news_list(selected_month, keyword)
+        news_records = self.news_service.get_news_list(selected_month, keyword)
+        if news_records is None:
+            return "查询时出现错误", "查询时出现错误"
+        if not news_records:
+            return "未找到相关新闻", "未找到相关新闻"
+        return self.render_news_list(selected_month, keyword, news_records)
+
+    def render_news_list(self, selected_month, keyword, news_records):
+        """
+        将新闻数据渲染为 HTML
+        :param selected_month: 月份，格式为 "YYYY-MM"
+        :param keyword: 关键词
+        :param news_records: NewsService.get_news_list 返回的新闻字典列表
+        :return: (HTML 文本, 用于生成摘要的编号标题文本)
+        """
+        year, month = selected_month.split('-')[:2]
+        titles = []
+        html = NEWS_LIST_HEADER_TEMPLATE.format(keyword=keyword, year=year, month=month, count=len(news_records))
+        html += self.render_news_items(news_records, NEWS_ITEM_TEMPLATE, titles)
+        return html, "".join(titles)
+
+    def render_news_items(self, news_records, item_template, titles):
+        """
+        渲染一页新闻
+        :param news_records: 新闻字典列表
+        :param item_template: NEWS_ITEM_TEMPLATE 或 SEARCH_ITEM_TEMPLATE
+        :param titles: 已渲染新闻的编号标题列表，本页的标题会追加进去
+        :return: HTML 文本
+        """
+        html_parts = []
+        for news in news_records:
+            html_parts.append(item_template.format(
+                url=news['url'],
+                title=news['title'],
+                pub_date=news['pub_time'].split(' ')[0],
+                category=news['category'] or '未知分区',
+                weight=news.get('weight', ''),
+                keywords=news.get('keywords') or '未知',
+                summary=news['summary']
+            ))
+            titles.append(f"{len(titles) + 1}. {news['title']}")
+        return "".join(html_parts)
+
+    def stream_news_pages(self, text_browser, selected_month, keyword, selected_category="所有分区",
+                          first_page=None, search=False):
+        """
+        首屏只渲染第一页，其余页在后台线程中逐页查询，查到后追加到文本浏览器末尾；文本浏览器销毁后停止查询
+        :param text_browser: 显示新闻的 QTextBrowser
+        :param selected_month: 月份，格式为 "YYYY-MM"
+        :param keyword: 关键词
+        :param selected_category: 分区
+        :param first_page: 已经查询到的第一页，为空时在这里查询
+        :param search: 是否为搜索结果（展示关键词而非重要指数）
+        :return: 已加载新闻的编号标题列表，随后续页的加载而增长；没有相关新闻时返回 None
+        """
+        if first_page is None:
+            first_page = self.news_service.get_news_page(selected_month, keyword, selected_category)
+        if not first_page or not first_page["news"]:
+            return None
+        year, month = selected_month.split('-')[:2]
+        header_template = SEARCH_HEADER_TEMPLATE if search else NEWS_LIST_HEADER_TEMPLATE
+        item_template = SEARCH_ITEM_TEMPLATE if search else NEWS_ITEM_TEMPLATE
+        titles = []
+        text_browser.setHtml(
+            header_template.format(keyword=keyword, year=year, month=month, count=first_page["total"]) +
+            self.render_news_items(first_page["news"], item_template, titles)
+        )
+
+        # 窗口关闭后不再查询后续页
+        stopped = []
+        text_browser.destroyed.connect(lambda: stopped.append(True))
+
+        def load_next_page(cursor):
+            # 在后台线程中查询，界面线程只负责追加渲染
+            if not stopped:
+                run_in_background(self.background_tasks, self.news_service.get_news_page,
+                                  selected_month, keyword, selected_category, cursor, on_success=append_page)
+
+        def append_page(page):
+            if stopped or not page:
+                return
+            try:
+                # 在文档末尾插入，不移动用户当前的阅读位置
+                text_cursor = QTextCursor(text_browser.document())
+                text_cursor.movePosition(QTextCursor.End)
+                text_cursor.insertHtml(self.render_news_items(page["news"], item_template, titles))
+            except RuntimeError:
+                # 窗口已关闭
+                return
+            if page["next_cursor"]:
+                load_next_page(page["next_cursor"])
+
+        if first_page["next_cursor"]:
+            load_next_page(first_page["next_cursor"])
+        return titles
 
     def format_news_results(self, news_results):
         # 格式化新闻显示
@@ -165,15 +314,15 @@ class MonKeyWordsViews:
             cache_key = f"wordcloud:{year}:{month}:{category}:{keywords_num}:{algorithm}"
             print(f"词云缓存键: {cache_key}")
             # 检查Redis缓存
-            cached_image_path = self.redis_client.get(cache_key)
+            cached_image_path = self.cache.get(cache_key)
             if cached_image_path:
                 print("-----从缓存中获取词云图片-----")
                 data = json.loads(cached_image_path)
-                image_path = data['cloud_url']
-            else:
-                print("-----缓存未命中，开始从数据库查询词云-----")
-                # 先检查数据库中是否已存在该类别的词云链接
-                session = self.db.get_session()
+                self.show_word_cloud(date, data['cloud_url'])
+                return
+            print("-----缓存未命中，开始从数据库查询词云-----")
+            # 先检查数据库中是否已存在该类别的词云链接
+            with self.db.get_session() as session:
                 existing_asset = session.query(Cloud).filter_by(
                     year=year,
                     month=month,
@@ -181,69 +330,84 @@ class MonKeyWordsViews:
                     algorithm=algorithm,
                     is_delete=0
                 ).first()
+                image_path = existing_asset.cloud_url if existing_asset else None
+            if image_path:
+                # 如果数据库中有已生成的词云，直接展示
+                print(f"数据库中已存在词云图片：{image_path}")
+                self.cache_word_cloud(cache_key, image_path)
+                self.show_word_cloud(date, image_path)
+                return
+            # 如果数据库中没有，在后台提取关键词后生成新的词云并保存
+            self.get_keywords(on_done=lambda keywords: self.create_word_cloud(
+                keywords, date, category, keywords_num, algorithm, cache_key))
+        except Exception as e:
+            print(f"Error while generating word cloud: {e}")
+            QMessageBox.critical(self.main_window, "MonKeyWords 🐒", "生成词云时出错！")
 
-                if existing_asset:
-                    # 如果数据库中有已生成的词云，直接展示
-                    image_path = existing_asset.cloud_url
-                    print(f"数据库中已存在词云图片：{image_path}")
-                else:
-                    # 如果数据库中没有，生成新的词云并保存
-                    keywords = self.get_keywords()
-                    if not keywords:
-                        QMessageBox.warning(self.main_window, "MonKeyWords 🐒", "没有关键词数据可供生成词云！")
-                        return
-                    keywords_dict = {keyword.split(":")[0]: int(keyword.split(":")[1]) for keyword in keywords}
-                    font_path = './utils/SimHei.ttf'
-                    wordcloud = WordCloud(
-                        font_path=font_path,
-                        width=1000, height=600,
-                        background_color='white',
-                        colormap='tab20'
-                    ).generate_from_frequencies(keywords_dict)
-                    # 生成图片文件名和路径
-                    image_filename = f"{date}_{category}_{algorithm}_{keywords_num}_{time.strftime('%Y%m%d%H%M%S')}.png"
-                    image_path = self.UPLOAD_FOLDER + '/' + image_filename
-                    wordcloud.to_file(image_path)
-                    # 将新的词云路径保存到数据库
-                    asset = Cloud(
-                        year=year,
-                        month=month,
-                        category=category,
-                        keywords_num=keywords_num,
-                        algorithm=algorithm,
-                        cloud_url=image_path
-                    )
-                    print(f"保存图片路径到数据库：{image_path}")
-                    session.add(asset)
-                    session.commit()
-                    session.close()
-                # 将新的词云路径保存到Redis
-                result = {
-                    'cloud_url': image_path,
-                    "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "is_delete": 0
-                }
-                self.redis_client.setex(cache_key, 86400, json.dumps(result))
-            # 显示词云图
-            dialog = QDialog(self.main_window)
-            selected_month = self.main_window.month_combobox.currentText()
-            dialog.setWindowTitle(f"{selected_month} 词云")
-            dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-            dialog.resize(1000, 600)
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull():
-                label = QLabel(dialog)
-                label.setPixmap(pixmap)
-                label.setAlignment(Qt.AlignCenter)
-                layout = QVBoxLayout(dialog)
-                layout.addWidget(label)
-                dialog.setLayout(layout)
-                dialog.exec_()
-            else:
-                QMessageBox.warning(self.main_window, "MonKeyWords 🐒", "词云图片无法加载！")
+    def create_word_cloud(self, keywords, date, category, keywords_num, algorithm, cache_key):
+        try:
+            if not keywords:
+                QMessageBox.warning(self.main_window, "MonKeyWords 🐒", "没有关键词数据可供生成词云！")
+                return
+            year, month = date.split("-")[:2]
+            keywords_dict = {keyword.split(":")[0]: int(keyword.split(":")[1]) for keyword in keywords}
+            font_path = './utils/SimHei.ttf'
+            wordcloud = WordCloud(
+                font_path=font_path,
+                width=1000, height=600,
+                background_color='white',
+                colormap='tab20'
+            ).generate_from_frequencies(keywords_dict)
+            # 生成图片文件名和路径
+            image_filename = f"{date}_{category}_{algorithm}_{keywords_num}_{time.strftime('%Y%m%d%H%M%S')}.png"
+            image_path = self.UPLOAD_FOLDER + '/' + image_filename
+            wordcloud.to_file(image_path)
+            # 将新的词云路径保存到数据库
+            asset = Cloud(
+                year=year,
+                month=month,
+                category=category,
+                keywords_num=keywords_num,
+                algorithm=algorithm,
+                cloud_url=image_path
+            )
+            print(f"保存图片路径到数据库：{image_path}")
+            with self.db.get_session() as session:
+                session.add(asset)
+                session.commit()
+            self.cache_word_cloud(cache_key, image_path)
+            self.show_word_cloud(date, image_path)
         except Exception as e:
             print(f"Error while generating word cloud: {e}")
             QMessageBox.critical(self.main_window, "MonKeyWords 🐒", "生成词云时出错！")
+
+    def cache_word_cloud(self, cache_key, image_path):
+        # 将词云路径保存到Redis
+        result = {
+            'cloud_url': image_path,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "is_delete": 0
+        }
+        self.cache.setex(cache_key, 86400, json.dumps(result))
+
+    def show_word_cloud(self, selected_month, image_path):
+        # 显示词云图
+        dialog = QDialog(self.main_window)
+        dialog.setWindowTitle(f"{selected_month} 词云")
+        dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        dialog.resize(1000, 600)
+        pixmap = QPixmap(image_path)
+        if not pixmap.isNull():
+            label = QLabel(dialog)
+            label.setPixmap(pixmap)
+            label.setAlignment(Qt.AlignCenter)
+            layout = QVBoxLayout(dialog)
+            layout.addWidget(label)
+            dialog.setLayout(layout)
+            dialog.exec_()
+        else:
+            QMessageBox.warning(self.main_window, "MonKeyWords 🐒", "词云图片无法加载！")
+
     """
     生成摘要
     """
@@ -262,7 +426,7 @@ class MonKeyWordsViews:
             cache_key = f"summary:{year}:{month}:{category}:{keywords_num}:{keyword}:{algorithm}"
             print(f"摘要缓存键: {cache_key}")
             # 检查Redis缓存
-            cached_summary_path = self.redis_client.get(cache_key)
+            cached_summary_path = self.cache.get(cache_key)
             if cached_summary_path:
                 print("-----从缓存中获取摘要文本-----")
                 data = json.loads(cached_summary_path)
@@ -313,7 +477,7 @@ class MonKeyWordsViews:
                     "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                     "is_delete": 0
                 }
-                self.redis_client.setex(cache_key, 86400, json.dumps(result))
+                self.cache.setex(cache_key, 86400, json.dumps(result))
                 session.close()
             if summary:
                 self.main_window.show_summary_dialog(keyword, date, summary)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 21:05
+@Auth: Zhang Hongxing
+@File: workers.py
+@Note: 在后台线程中执行耗时的查询与提取，结果通过信号回到界面线程
+"""
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class TaskThread(QThread):
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, fn, *args, parent=None):
+        """
+        执行单个函数的后台线程
+        :param fn: 在后台线程中执行的函数，不能操作界面控件
+        :param args: 函数参数
+        :param parent: 父对象
+        """
+        super().__init__(parent)
+        self.fn = fn
+        self.args = args
+
+    def run(self):
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(result)
+
+
+def run_in_background(tasks, fn, *args, on_success=None, on_failure=None):
+    """
+    在后台线程中执行函数，回调在界面线程中执行
+    :param tasks: 持有运行中线程的集合，线程结束前不会被回收
+    :param fn: 在后台线程中执行的函数
+    :param args: 函数参数
+    :param on_success: 成功时的回调，参数为函数返回值
+    :param on_failure: 失败时的回调，参数为错误信息
+    :return: TaskThread 实例
+    """
+    task = TaskThread(fn, *args)
+    tasks.add(task)
+    if on_success is not None:
+        task.succeeded.connect(on_success)
+    if on_failure is not None:
+        task.failed.connect(on_failure)
+    task.finished.connect(lambda: tasks.discard(task))
+    task.start()
+    return task